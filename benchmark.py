@@ -0,0 +1,615 @@
+#!/usr/bin/env python
+
+"""
+benchmark.py
+    Benchmark every route of controllers.py and auth.py
+    against a generated dataset, and compare with a saved baseline.
+
+    python benchmark.py --items 100000 --output before.json
+    python benchmark.py --items 100000 --baseline before.json
+    python benchmark.py --server --concurrency 16 --workers 2
+    python benchmark.py --server --replicas 2
+    python benchmark.py --database postgresql://localhost/catalog_bench \
+        --email user1@email.com --password user1password
+
+    The dataset is built once per size and seed with generate_catalog,
+        in --workdir, unless --database is given.
+    Routes run in the process through the WSGI test client,
+        and with --server also on a real server, concurrently.
+    Writes (add and edit item, bulk.json and /items/import) change
+        the dataset, they only run with --writes.
+    Not benchmarked: the Google and Facebook logins, they wait for the
+        providers, and the delete POST and deletes of bulk.json,
+        as every request would need a new item to delete.
+    /admin/queries.json answers 403 unless the benchmark user is one
+        of config.ADMIN_EMAILS, the 403 is measured then.
+
+created on 18/October/2026
+
+"""
+
+
+import argparse
+import datetime
+import json
+import math
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import threading
+import time
+import timeit
+from collections import namedtuple
+from multiprocessing import Process
+
+from settings import config
+
+
+# A route to benchmark.
+#     status: expected status code, other ones are counted as errors
+#     heavy: reads the whole catalog, run --heavy-requests times
+#     cookies: e.g. the token of the benchmark user
+Scenario = namedtuple('Scenario', ['name', 'method', 'path', 'data',
+                                   'headers', 'cookies', 'status', 'heavy'])
+
+
+def scenario(name, path, method='GET', data=None, headers=None,
+             cookies=None, status=200, heavy=False):
+    return Scenario(name, method, path, data, headers or {}, cookies or {},
+                    status, heavy)
+
+
+def percentile(values, q):
+    """
+    :param values: sorted list of numbers
+    :param q: percentile, between 0 and 100
+    :return: the nearest rank percentile of values
+    """
+    if not values:
+        return None
+    rank = int(math.ceil(q / 100.0 * len(values)))
+    return values[max(0, min(len(values), rank) - 1)]
+
+
+def summarize(latencies, errors, seconds):
+    """
+    :param latencies: seconds of every successful request
+    :param errors: number of failed requests
+    :param seconds: wall clock time of the run
+    :return: dictionary of throughput and latency in milliseconds
+    """
+    values = sorted(latencies)
+
+    def ms(value):
+        return None if value is None else round(value * 1000, 3)
+
+    return {
+        'requests': len(values),
+        'errors': errors,
+        'throughput': round(len(values) / seconds, 2) if seconds else None,
+        'mean': ms(sum(values) / len(values)) if values else None,
+        'min': ms(values[0]) if values else None,
+        'p50': ms(percentile(values, 50)),
+        'p95': ms(percentile(values, 95)),
+        'p99': ms(percentile(values, 99)),
+        'max': ms(values[-1]) if values else None
+    }
+
+
+def prepare_database(args):
+    """
+    Point config at the benchmark database, before the app is imported.
+    :return: database uri, and True if it has to be generated
+    """
+    if args.database:
+        config.DATABASE_URI = args.database
+        return args.database, False
+    if not os.path.isdir(args.workdir):
+        os.makedirs(args.workdir)
+    path = os.path.join(args.workdir, 'catalog-{}-{}-{}-{}-{}.db'.format(
+        args.users, args.categories, args.items, args.distribution,
+        args.seed))
+    if args.rebuild and os.path.exists(path):
+        os.remove(path)
+    config.DATABASE_URI = 'sqlite:///' + path
+    return config.DATABASE_URI, not os.path.exists(path)
+
+
+def prepare_replicas(args, uri):
+    """
+    Point config at the replicas, before the app is imported.
+    --replicas N copies a SQLite database to N files,
+        the copies are made by copy_replicas().
+    :return: paths of the SQLite replicas
+    """
+    if args.replica_uri:
+        config.DATABASE_REPLICA_URIS = args.replica_uri
+        return []
+    if args.replicas and not uri.startswith('sqlite:///'):
+        raise SystemExit("--replicas copies SQLite databases, "
+                         "use --replica-uri")
+    path = uri[len('sqlite:///'):]
+    paths = ['{}.replica{}'.format(path, i) for i in range(args.replicas)]
+    config.DATABASE_REPLICA_URIS = ['sqlite:///' + p for p in paths]
+    return paths
+
+
+def copy_replicas(uri, paths):
+    for path in paths:
+        shutil.copyfile(uri[len('sqlite:///'):], path)
+
+
+def prepare_client_secrets(args):
+    # The login page shows the Google client id, a stub is enough here.
+    if os.path.exists(config.GOOGLE_CLIENT_SECRETS):
+        return
+    if not os.path.isdir(args.workdir):
+        os.makedirs(args.workdir)
+    path = os.path.join(args.workdir, 'client_secret.json')
+    with open(path, 'w') as f:
+        json.dump({'web': {'client_id': 'benchmark',
+                           'client_secret': 'benchmark',
+                           'auth_uri': 'https://localhost/auth',
+                           'token_uri': 'https://localhost/token',
+                           'redirect_uris': []}}, f)
+    config.GOOGLE_CLIENT_SECRETS = path
+
+
+def generate(args, engine):
+    from sqlalchemy.orm import sessionmaker
+    from catalog_app.api import migrations
+    from catalog_app.api.synthetic import generate_catalog
+    from catalog_app.api.util import utc
+
+    def log(message):
+        print message
+
+    migrations.upgrade(engine, log=log)
+    session = sessionmaker(bind=engine)()
+    try:
+        # A fixed end date, so a seed always builds the same rows.
+        rows, seconds = generate_catalog(
+            session, args.users, args.categories, args.items,
+            distribution=args.distribution, seed=args.seed,
+            end=datetime.datetime(2026, 1, 1, tzinfo=utc),
+            password='password', log=log)
+    finally:
+        session.close()
+    print "Dataset of {} rows generated in {:.1f}s".format(rows, seconds)
+
+
+def login(app, email, password):
+    """
+    Log in through POST /auth/login/.
+    :return: token and expire time cookies of the user
+    """
+    client = app.test_client()
+    client.set_cookie('localhost', 'csrf_token', 'benchmark')
+    response = client.post('/auth/login/', data={
+        'email': email, 'password': password, '_csrf_token': 'benchmark'})
+    if response.status_code != 302:
+        raise SystemExit("Can not log in as {}".format(email))
+    return dict((cookie.name, cookie.value) for cookie in client.cookie_jar
+                if cookie.name in ('token', 'expire_time'))
+
+
+def build_scenarios(session, user, password, cookies, include_writes):
+    """
+    Pick rows of the dataset, and make a scenario for every route.
+    :param session: database session
+    :param user: the benchmark user
+    :param password: password of the user
+    :param cookies: login cookies of the user
+    :param include_writes: add the scenarios writing items
+    :return: a list of Scenario
+    """
+    from sqlalchemy import func, desc
+    from catalog_app.api.models import Category, Item, CatalogVersion
+    from catalog_app.api.util import encode_cursor
+
+    # The largest category, the worst case of the category pages.
+    category_id, count = session.query(
+        Item.category_id, func.count(Item.id)).group_by(
+        Item.category_id).order_by(desc(func.count(Item.id))).first()
+    first_page, next_page, total = Category.item_page(
+        session, category_id, config.PAGE_SIZE)
+    item = first_page[0]
+    own = session.query(Item).filter_by(user_id=user.id).first() or item
+    word = item.title.split()[0]
+    cursor = encode_cursor(*next_page) if next_page else ''
+    etag = '{}-{}'.format(CatalogVersion.CATALOG,
+                          CatalogVersion.get(session,
+                                             CatalogVersion.CATALOG)[0])
+    token = cookies.get('token')
+    ids = ','.join(str(i.id) for i in first_page)
+    admin_status = 200 if user.email in config.ADMIN_EMAILS else 403
+
+    category = '/category/{}/'.format(category_id)
+    detail = '/category/{}/item/{}'.format(item.category_id, item.id)
+    edit = '/category/{}/item/{}/edit'.format(own.category_id, own.id)
+    scenarios = [
+        scenario('main', '/'),
+        scenario('main_logged_in', '/', cookies=cookies),
+        scenario('category', category),
+        scenario('category_next_page',
+                 category + '?cursor={}'.format(cursor)),
+        scenario('item_detail', detail),
+        scenario('search', '/search?q={}'.format(word)),
+        scenario('add_item_form', '/items/', cookies=cookies),
+        scenario('edit_item_form', edit, cookies=cookies),
+        scenario('delete_item_form', '/item/{}/delete/'.format(own.id),
+                 cookies=cookies),
+        scenario('catalog_json', '/catalog.json', heavy=True),
+        scenario('catalog_json_not_modified', '/catalog.json',
+                 headers={'If-None-Match': 'W/"{}"'.format(etag)},
+                 status=304),
+        scenario('catalog_stream_json', '/catalog.stream.json', heavy=True),
+        scenario('catalog_ndjson', '/catalog.ndjson', heavy=True),
+        scenario('item_json', category + 'item.json'),
+        scenario('item_json_next_page',
+                 category + 'item.json?cursor={}'.format(cursor)),
+        scenario('detail_json', detail + '/detail.json'),
+        scenario('search_json', '/search.json?q={}'.format(word)),
+        scenario('batch_json', '/items/batch.json?ids={}'.format(ids)),
+        scenario('batch_json_post', '/items/batch.json', method='POST',
+                 data={'ids': ids}),
+        scenario('metrics', '/metrics'),
+        scenario('admin_queries', '/admin/queries.json', cookies=cookies,
+                 status=admin_status),
+        scenario('login_form', '/auth/login/'),
+        scenario('signup_form', '/auth/signup/'),
+        scenario('login', '/auth/login/', method='POST', status=302,
+                 data={'email': user.email, 'password': password,
+                       '_csrf_token': 'benchmark'},
+                 cookies={'csrf_token': 'benchmark'}),
+    ]
+    if include_writes:
+        scenarios.extend([
+            scenario('add_item', '/items/', method='POST', cookies=cookies,
+                     headers={'Authorization': token},
+                     data={'title': 'benchmark item',
+                           'description': 'written by benchmark.py',
+                           'category': str(category_id)}),
+            scenario('edit_item', edit, method='POST', cookies=cookies,
+                     headers={'Authorization': token},
+                     data={'title': own.title,
+                           'description': 'edited by benchmark.py',
+                           'category': str(own.category_id)}),
+            scenario('bulk_json', '/items/bulk.json', method='POST',
+                     cookies=cookies, headers={'Authorization': token},
+                     data=json.dumps({'operations': [
+                         {'op': 'create', 'title': 'benchmark item',
+                          'category_id': category_id}] * 10 + [
+                         {'op': 'update', 'id': own.id,
+                          'description': 'edited by benchmark.py'}]})),
+            scenario('import_items', '/items/import?format=ndjson',
+                     method='POST', cookies=cookies,
+                     headers={'Authorization': token},
+                     data=''.join(json.dumps({
+                         'title': 'imported by benchmark.py',
+                         'category_id': category_id}) + '\n'
+                         for i in range(100))),
+        ])
+    return scenarios
+
+
+def run_in_process(app, scenarios, args):
+    """
+    Send the requests of every scenario one by one
+        through the WSGI test client.
+    :return: dictionary of results by scenario name
+    """
+    results = {}
+    for s in scenarios:
+        client = app.test_client()
+        for name, value in s.cookies.items():
+            client.set_cookie('localhost', name, value)
+        count = args.heavy_requests if s.heavy else args.requests
+        warmup = min(args.warmup, count)
+
+        def send():
+            # /metrics only answers local addresses.
+            response = client.open(s.path, method=s.method, data=s.data,
+                                   headers=s.headers,
+                                   environ_base={'REMOTE_ADDR': '127.0.0.1'})
+            response.get_data()
+            response.close()
+            return response.status_code
+
+        for i in range(warmup):
+            send()
+        latencies = []
+        errors = 0
+        started = timeit.default_timer()
+        for i in range(count):
+            begin = timeit.default_timer()
+            status = send()
+            if status == s.status:
+                latencies.append(timeit.default_timer() - begin)
+            else:
+                errors += 1
+        results[s.name] = summarize(latencies, errors,
+                                    timeit.default_timer() - started)
+        print_result(s.name, results[s.name])
+    return results
+
+
+def _serve(app, port, args):
+    from catalog_app import server, dispose_engines
+    server.serve(app, port, address='127.0.0.1', workers=args.workers,
+                 threads=args.threads, after_fork=dispose_engines)
+
+
+def _wait_for_port(port, timeout=15):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), 1).close()
+            return
+        except socket.error:
+            time.sleep(0.1)
+    raise SystemExit("Server did not start on port {}".format(port))
+
+
+def run_on_server(app, scenarios, args):
+    """
+    Start the production server, and send the requests of every scenario
+        from args.concurrency threads at once.
+    :return: dictionary of results by scenario name
+    """
+    import requests
+
+    process = Process(target=_serve, args=(app, args.port, args))
+    process.start()
+    try:
+        _wait_for_port(args.port)
+        base = 'http://127.0.0.1:{}'.format(args.port)
+        results = {}
+        for s in scenarios:
+            count = args.heavy_requests if s.heavy else args.requests
+            lock = threading.Lock()
+            latencies = []
+            errors = [0]
+            remaining = [count]
+
+            def worker():
+                http = requests.Session()
+                for name, value in s.cookies.items():
+                    http.cookies.set(name, value)
+                for i in range(args.warmup // args.concurrency):
+                    http.request(s.method, base + s.path, data=s.data,
+                                 headers=s.headers, allow_redirects=False)
+                while True:
+                    with lock:
+                        if remaining[0] <= 0:
+                            return
+                        remaining[0] -= 1
+                    begin = timeit.default_timer()
+                    try:
+                        response = http.request(
+                            s.method, base + s.path, data=s.data,
+                            headers=s.headers, allow_redirects=False)
+                        ok = response.status_code == s.status
+                    except requests.RequestException:
+                        ok = False
+                    elapsed = timeit.default_timer() - begin
+                    with lock:
+                        if ok:
+                            latencies.append(elapsed)
+                        else:
+                            errors[0] += 1
+
+            threads = [threading.Thread(target=worker)
+                       for i in range(args.concurrency)]
+            started = timeit.default_timer()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            results[s.name] = summarize(latencies, errors[0],
+                                        timeit.default_timer() - started)
+            print_result(s.name, results[s.name])
+        return results
+    finally:
+        process.terminate()
+        process.join(config.SERVER_SHUTDOWN_TIMEOUT)
+
+
+def print_result(name, result):
+    def number(value):
+        return '-' if value is None else '{:.2f}'.format(value)
+    print "{:<28} {:>6} {:>4} {:>9} {:>9} {:>9} {:>9}".format(
+        name, result['requests'], result['errors'],
+        number(result['throughput']), number(result['p50']),
+        number(result['p95']), number(result['p99']))
+
+
+def print_header(mode):
+    print
+    print "{} (latency in ms)".format(mode)
+    print "{:<28} {:>6} {:>4} {:>9} {:>9} {:>9} {:>9}".format(
+        'route', 'count', 'err', 'req/s', 'p50', 'p95', 'p99')
+
+
+def compare(report, baseline, threshold):
+    """
+    Print the change of every result from the baseline.
+    A route regressed if its' p95 grew, or its' throughput fell,
+        by more than threshold percent.
+    :return: a list of (mode, route) which regressed
+    """
+    def change(new, old):
+        if new is None or not old:
+            return None
+        return (new - old) * 100.0 / old
+
+    regressions = []
+    for mode, results in sorted(report['results'].items()):
+        old_results = baseline.get('results', {}).get(mode)
+        if not old_results:
+            continue
+        print
+        print "{}, change from baseline in %".format(mode)
+        print "{:<28} {:>9} {:>9} {:>9}".format('route', 'req/s', 'p50',
+                                                'p95')
+        for name, result in sorted(results.items()):
+            old = old_results.get(name)
+            if not old:
+                continue
+            changes = [change(result[key], old[key])
+                       for key in ('throughput', 'p50', 'p95')]
+            regressed = (changes[2] is not None and changes[2] > threshold) \
+                or (changes[0] is not None and changes[0] < -threshold)
+            if regressed:
+                regressions.append((mode, name))
+            print "{:<28} {:>9} {:>9} {:>9}{}".format(
+                name, *['-' if c is None else '{:+.1f}'.format(c)
+                        for c in changes] +
+                ['  REGRESSED' if regressed else ''])
+    return regressions
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            stderr=open(os.devnull, 'w')).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the routes of the catalog app")
+    data = parser.add_argument_group('dataset')
+    data.add_argument('--database', default=None,
+                      help="benchmark an existing database instead")
+    data.add_argument('--email', default=None,
+                      help="user to log in as, with --database")
+    data.add_argument('--password', default=None)
+    data.add_argument('--users', type=int, default=100)
+    data.add_argument('--categories', type=int, default=50)
+    data.add_argument('--items', type=int, default=100000)
+    data.add_argument('--distribution', default='zipf',
+                      choices=('uniform', 'zipf'))
+    data.add_argument('--seed', type=int, default=0)
+    data.add_argument('--workdir', default='/tmp/catalog-benchmark',
+                      help="where generated datasets are kept")
+    data.add_argument('--rebuild', action='store_true',
+                      help="generate the dataset again")
+    data.add_argument('--replicas', type=int, default=0,
+                      help="read from N copies of the SQLite database, "
+                           "writes are not copied to them")
+    data.add_argument('--replica-uri', action='append', default=[],
+                      help="read replica of --database, repeatable")
+    run = parser.add_argument_group('run')
+    run.add_argument('--requests', type=int, default=200,
+                     help="requests per route")
+    run.add_argument('--heavy-requests', type=int, default=5,
+                     help="requests per route reading the whole catalog")
+    run.add_argument('--warmup', type=int, default=10)
+    run.add_argument('--routes', default=None,
+                     help="comma separated route names, all by default")
+    run.add_argument('--writes', action='store_true',
+                     help="also benchmark adding and editing items")
+    run.add_argument('--no-page-cache', action='store_true',
+                     help="render every page, measure the cold path")
+    run.add_argument('--no-in-process', action='store_true',
+                     help="skip the WSGI test client run")
+    run.add_argument('--server', action='store_true',
+                     help="also benchmark a real server")
+    run.add_argument('--concurrency', type=int, default=8)
+    run.add_argument('--workers', type=int, default=2)
+    run.add_argument('--threads', type=int, default=config.SERVER_THREADS)
+    run.add_argument('--port', type=int, default=8766)
+    out = parser.add_argument_group('results')
+    out.add_argument('--output', default=None, help="write results JSON")
+    out.add_argument('--baseline', default=None,
+                     help="results JSON to compare with")
+    out.add_argument('--threshold', type=float, default=10.0,
+                     help="percent change counted as a regression")
+    out.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args(argv)
+
+    uri, missing = prepare_database(args)
+    replica_paths = prepare_replicas(args, uri)
+    prepare_client_secrets(args)
+    if args.no_page_cache:
+        config.PAGE_CACHE_ENABLED = False
+
+    # Imported now, so the engine is made with the benchmark database.
+    from catalog_app import app, engine, DBSession, dispose_engines
+    from catalog_app.api.models import User
+    app.secret_key = config.SECRET_KEY
+    if missing:
+        generate(args, engine)
+    copy_replicas(uri, replica_paths)
+
+    session = DBSession()
+    if args.email:
+        email, password = args.email, args.password
+    else:
+        email = session.query(User.email).filter(
+            User.email.like('synthetic%')).order_by(User.id).limit(1).scalar()
+        password = args.password or 'password'
+    if not email:
+        raise SystemExit("No user to log in as, use --email and --password")
+    user = session.query(User).filter_by(email=email).one()
+    cookies = login(app, email, password)
+    scenarios = build_scenarios(session, user, password, cookies,
+                                args.writes)
+    session.close()
+    dispose_engines()
+    if args.routes:
+        names = set(args.routes.split(','))
+        scenarios = [s for s in scenarios if s.name in names]
+
+    report = {
+        'meta': {
+            'started': datetime.datetime.utcnow().isoformat() + 'Z',
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'database': uri,
+            'dataset': None if args.database else {
+                'users': args.users, 'categories': args.categories,
+                'items': args.items, 'distribution': args.distribution,
+                'seed': args.seed},
+            'requests': args.requests,
+            'heavy_requests': args.heavy_requests,
+            'page_cache': config.PAGE_CACHE_ENABLED,
+            'replicas': len(config.DATABASE_REPLICA_URIS),
+            'writes': args.writes
+        },
+        'results': {}
+    }
+    if not args.no_in_process:
+        print_header('in_process')
+        report['results']['in_process'] = run_in_process(
+            app, scenarios, args)
+    if args.server:
+        report['meta']['server'] = {'concurrency': args.concurrency,
+                                    'workers': args.workers,
+                                    'threads': args.threads}
+        print_header('server')
+        report['results']['server'] = run_on_server(
+            app, scenarios, args)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print
+        print "Results written to {}".format(args.output)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        if regressions and args.fail_on_regression:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+
+"""
+build_assets.py
+    Bundle and minify the JavaScript and CSS of the pages
+    into static/dist/, under names containing the hash of their content,
+    and write static/dist/manifest.json, read by the templates.
+    The built files are compressed too, see compress_static.py.
+    Run it after bower update, and after changing a static file.
+    See also: catalog_app/assets.py
+
+    python build_assets.py
+    python build_assets.py --clean
+
+    Scripts are minified by rjsmin and style sheets by rcssmin,
+    both in requirements.txt.
+
+created on 18/October/2026
+
+"""
+
+
+import argparse
+import os
+import sys
+
+from catalog_app import assets
+from catalog_app.compression import precompress
+from settings import config
+
+
+STATIC_FOLDER = os.path.join(config.BASE_DIR, 'catalog_app', 'static')
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        description="Build the hashed static assets")
+    parser.add_argument('--folder', default=STATIC_FOLDER)
+    parser.add_argument('--clean', action='store_true',
+                        help="remove the files of previous builds")
+    parser.add_argument('--no-compress', action='store_true',
+                        help="do not write .gz copies of the built files")
+    args = parser.parse_args(argv)
+
+    def log(message):
+        print message
+
+    if assets.rjsmin is None or assets.rcssmin is None:
+        log("rjsmin or rcssmin is not installed, "
+            "scripts are not minified and style sheets less")
+    try:
+        assets.build(args.folder, clean=args.clean, log=log)
+    except IOError as e:
+        print "{}, did you run bower update?".format(e)
+        return 1
+    if not args.no_compress:
+        precompress(os.path.join(args.folder, assets.DIST), level=9,
+                    log=log)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
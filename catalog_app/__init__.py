@@ -5,27 +5,73 @@ It also registers blue prints
 
 Attributes:
     engine: object of database engine
-    session: accessible database session
+    replicas: ReplicaSet of the read replicas, read only requests use them
+    session: request scoped database session,
+        removed at the end of every request
     app: Flask app, Tornado can run this app. See also: runserver.py
 """
 
 from flask import Flask
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-
-from catalog_app.api.models import Base
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.orm import scoped_session, sessionmaker
 
 from settings import config
 
 
-engine = create_engine(
-    config.DATABASE_URI
-)
+def create_db_engine(uri):
+    """
+    Create a database engine with the pool settings in settings/config.py
+    :param uri: database uri
+    :return: SQLAlchemy engine
+    """
+    options = {'pool_recycle': config.DB_POOL_RECYCLE}
+    # SQLite uses a connection per thread, it has no pool to size.
+    if not uri.startswith('sqlite'):
+        options.update(pool_size=config.DB_POOL_SIZE,
+                       max_overflow=config.DB_MAX_OVERFLOW,
+                       pool_timeout=config.DB_POOL_TIMEOUT)
+    db_engine = create_engine(uri, **options)
+    if config.DB_POOL_PRE_PING:
+        event.listen(db_engine, 'checkout', _ping_connection)
+    return db_engine
+
+
+def _ping_connection(dbapi_connection, connection_record, connection_proxy):
+    """Test a pooled connection before handing it out.
+    A stale connection makes the pool reconnect instead of
+        failing the request using it.
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("SELECT 1")
+    except Exception:
+        raise exc.DisconnectionError()
+    finally:
+        cursor.close()
+
+
+# The schema is managed by migrations: python migrate.py upgrade
+engine = create_db_engine(config.DATABASE_URI)
+
+# Read only requests are spread over the replicas, if there are any.
+# See also: catalog_app/routing.py
+from catalog_app.routing import ReplicaSet, RoutingSession
+replicas = ReplicaSet([create_db_engine(uri)
+                       for uri in config.DATABASE_REPLICA_URIS],
+                      config.DATABASE_REPLICA_SELECTION)
+
+# Every request gets its own session, created the first time it is used.
+DBSession = sessionmaker(bind=engine, class_=RoutingSession,
+                         replicas=replicas)
+session = scoped_session(DBSession)
 
-Base.metadata.create_all(engine)
 
-DBSession = sessionmaker(bind=engine)
-session = DBSession()
+def dispose_engines():
+    """Close the connections of the primary and of the replicas.
+    A forked process must call it, its' connections belong to the parent.
+    """
+    engine.dispose()
+    replicas.dispose()
 
 
 # Blueprint
@@ -41,3 +87,47 @@ from catalog_app.api.controllers import basic
 app = Flask(__name__)
 app.register_blueprint(basic)
 app.register_blueprint(auth)
+
+from catalog_app import routing
+routing.init_app(app)
+
+# Request metrics, served on /metrics. See also: catalog_app/metrics.py
+from catalog_app import metrics
+metrics.init_app(app, engine)
+for replica in replicas.engines:
+    metrics.init_engine(replica)
+
+# Query timings by fingerprint, served on /admin/queries.json
+# See also: catalog_app/query_log.py
+from catalog_app import query_log
+query_log.init_engine(engine)
+for replica in replicas.engines:
+    query_log.init_engine(replica)
+
+# gzip of responses, registered last so it runs first after a request.
+# See also: catalog_app/compression.py
+from catalog_app import compression
+compression.init_app(app)
+
+# Hashed static assets of the templates. See also: catalog_app/assets.py
+from catalog_app import assets
+assets.init_app(app)
+
+
+@app.teardown_request
+def remove_session(exception=None):
+    """Finish the session of the request.
+    Commit if the request succeeded, roll back if it failed,
+        then return the connection to the pool.
+    """
+    if not session.registry.has():
+        return
+    try:
+        if exception is None:
+            session.commit()
+        else:
+            session.rollback()
+    except Exception:
+        session.rollback()
+    finally:
+        session.remove()
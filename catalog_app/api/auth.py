@@ -17,11 +17,8 @@ Functions:
 created on 13/June/2014
 """
 
-import os
 import json
 
-import httplib2
-import re
 import requests
 
 from flask import render_template, request, Blueprint, \
@@ -29,20 +26,21 @@ from flask import render_template, request, Blueprint, \
 from oauth2client.client import flow_from_clientsecrets, FlowExchangeError
 
 from catalog_app import session
+from catalog_app.api import http_client
+from catalog_app.api.id_token import verify_id_token, InvalidIdToken, \
+    KeySetUnavailable
 from catalog_app.api.models import User
 from util import check_password, encrypt_password, \
+    password_needs_rehash, HashingPoolBusy, \
     generate_token, generate_csrf_token
 from settings import config
 
 
-# Debug info. Check log files in /var/log/apache2
-print '!!!DEBUG-INFO added by grader!!! Current Working Directory: ' + os.getcw
-
 # Client_ID for Google + login.
 # Please make sure that you have downloaded and placed
 #     client_secret.json properly. Please read README file.
 CLIENT_ID = json.loads(
-    open('settings/client_secret.json', 'r').read())['web']['client_id']
+    open(config.GOOGLE_CLIENT_SECRETS, 'r').read())['web']['client_id']
 
 auth = Blueprint('auth', __name__, url_prefix='/auth')
 
@@ -100,10 +98,21 @@ def login(cached_email=None):
             flash("You've signed up with social service. ")
             return render_template('login.html', cached_email=email)
 
-        # Password incorrect.
-        if not check_password(password, user.password, user.salt):
-            flash("Invalid email address or password. ")
-            return render_template('login.html', cached_email=email)
+        try:
+            # Password incorrect.
+            if not check_password(password, user.password, user.salt):
+                flash("Invalid email address or password. ")
+                return render_template('login.html', cached_email=email)
+
+            # Upgrade a password hashed with old settings,
+            #     now that we know the plain password.
+            if password_needs_rehash(user.password):
+                user.password, user.salt = encrypt_password(password)
+                session.add(user)
+                session.commit()
+        except HashingPoolBusy:
+            flash("Too many people are logging in. Please try again. ")
+            return render_template('login.html', cached_email=email), 503
 
         # Generate JSON web token for user.
         # As long as client has non-expired and valid token,
@@ -173,7 +182,11 @@ def signup():
         else:
             user = User(email=email.strip())
         # Store encrypted password and salt in the database
-        user.password, user.salt = encrypt_password(password)
+        try:
+            user.password, user.salt = encrypt_password(password)
+        except HashingPoolBusy:
+            flash("Too many people are signing up. Please try again. ")
+            return render_template('signup.html', cached_email=email), 503
         session.add(user)
         session.commit()
 
@@ -209,7 +222,7 @@ def gconnect():
         # Create oauth login flow based on client_secret.json
         # Please make sure that you have downloaded and placed
         #     client_secret.json properly. Please read README file.
-        oauth_flow = flow_from_clientsecrets('settings/client_secret.json',
+        oauth_flow = flow_from_clientsecrets(config.GOOGLE_CLIENT_SECRETS,
                                              scope='')
         oauth_flow.redirect_uri = 'postmessage'
         credentials = oauth_flow.step2_exchange(code)
@@ -220,22 +233,52 @@ def gconnect():
         return response
     # Get an access_token from Goolge OAuth provider
     access_token = credentials.access_token
-    url = ('https://www.googleapis.'
-           'com/oauth2/v1/tokeninfo?access_token=%s'
-           % access_token)
-    h = httplib2.Http()
-    result = json.loads(h.request(url, 'GET')[1])
-    if result.get('error') is not None:
-        flash("Google plus connection Error.")
-        response = make_response(
-            json.dumps(result.get('error')), 500
-        )
-        response.headers['Content-Type'] = 'application/json'
-        return response
+
+    # Verify the signed ID token locally with Google's cached keys.
+    # Google's tokeninfo endpoint is asked only if that can not be done.
+    claims = None
+    raw_id_token = (credentials.token_response or {}).get('id_token')
+    if raw_id_token:
+        try:
+            claims = verify_id_token(raw_id_token, CLIENT_ID)
+        except InvalidIdToken:
+            flash("Google plus connection Error.")
+            response = make_response(
+                json.dumps("Invalid ID token"), 401
+            )
+            response.headers['Content-Type'] = 'application/json'
+            return response
+        except KeySetUnavailable:
+            claims = None
+
+    if claims is not None:
+        token_user_id = claims['sub']
+        token_client_id = claims['aud']
+    else:
+        try:
+            result = http_client.get_json(
+                config.GOOGLE_OAUTH_API_URL + '/tokeninfo',
+                params={'access_token': access_token})
+        except (requests.RequestException, ValueError):
+            flash("Google plus connection Error.")
+            response = make_response(
+                json.dumps("Google does not respond"), 502
+            )
+            response.headers['Content-Type'] = 'application/json'
+            return response
+        if result.get('error') is not None:
+            flash("Google plus connection Error.")
+            response = make_response(
+                json.dumps(result.get('error')), 500
+            )
+            response.headers['Content-Type'] = 'application/json'
+            return response
+        token_user_id = result['user_id']
+        token_client_id = result['issued_to']
 
     # Get user id stored in Google
     gplus_id = credentials.id_token['sub']
-    if result['user_id'] != gplus_id:
+    if token_user_id != gplus_id:
         flash("Google plus connection Error.")
         response = make_response(
             json.dumps("Token's user ID doesn't match"), 401
@@ -244,7 +287,7 @@ def gconnect():
         return response
 
     # Make sure client id is correct
-    if result['issued_to'] != CLIENT_ID:
+    if token_client_id != CLIENT_ID:
         response = make_response(
             json.dumps("Token's client ID doesn't match"), 401
         )
@@ -252,12 +295,24 @@ def gconnect():
         response.headers['Content-Type'] = 'application/json'
         return response
 
-    # Retrieve user info. stored in Google
-    userinfo_url = 'https://www.googleapis.com/oauth2/v1/userinfo'
-    params = {'access_token': credentials.access_token, 'alt': 'json'}
-    answer = requests.get(userinfo_url, params=params)
+    # A verified ID token carries the email, with the 'email' scope.
+    if claims is not None and claims.get('email') and \
+            claims.get('email_verified') in (True, 'true'):
+        data = claims
+    else:
+        # Retrieve user info. stored in Google
+        params = {'access_token': credentials.access_token, 'alt': 'json'}
+        try:
+            data = http_client.get_json(
+                config.GOOGLE_OAUTH_API_URL + '/userinfo', params=params)
+        except (requests.RequestException, ValueError):
+            flash("Google plus connection Error.")
+            response = make_response(
+                json.dumps("Google does not respond"), 502
+            )
+            response.headers['Content-Type'] = 'application/json'
+            return response
 
-    data = json.loads(answer.text)
     email = data['email']
     user = User.get_by_email(session, email.strip())
 
@@ -297,12 +352,14 @@ def gdisconnect():
         return response
 
     # Request to disconnect.
-    url = 'https://accounts.google.com/o/oauth2/revoke?token=%s' % access_token
-    h = httplib2.Http()
-    result = h.request(url, 'GET')[0]
+    try:
+        status = http_client.get(config.GOOGLE_REVOKE_URL,
+                                 params={'token': access_token}).status_code
+    except requests.RequestException:
+        status = None
 
     # The user is successfully disconnected.
-    if result['status'] == '200':
+    if status == 200:
         response = make_response(
             json.dumps('Successfully disconnected'), 200
         )
@@ -328,26 +385,16 @@ def fconnect():
     userinfo = json.loads(request.data)
     user_access_token = userinfo.get('access_token')
 
-    # To verify user's access token, we need to get our app token first.
-    url = ('https://graph.facebook.com/oauth/access_token?'
-           'client_id={}&client_secret={}'
-           '&grant_type=client_credentials'
-           .format(config.FACEBOOK_CLIENT_ID,
-                   config.FACEBOOK_CLIENT_SECRET))
     try:
-        h = httplib2.Http()
-        result = h.request(url, 'GET')[1]
-        app_token = re.search(r'(access_token=)(.+?$)', result).group(2)
-
-        print app_token
+        # To verify user's access token, we need to get our app token first.
+        # It is cached, so usually this does not leave the process.
+        app_token = http_client.get_facebook_app_token()
 
         # Using app token, we can verify user's access token
-        url = ('https://graph.facebook.com/debug_token'
-               '?input_token={}&access_token={}'
-               .format(user_access_token, app_token))
-
-        h = httplib2.Http()
-        result = json.loads(h.request(url, 'GET')[1])
+        result = http_client.get_json(
+            config.FACEBOOK_GRAPH_URL + '/debug_token',
+            params={'input_token': user_access_token,
+                    'access_token': app_token})
         user_data = result.get("data")
 
         # If the user's token is valid to the app token,
@@ -0,0 +1,488 @@
+"""bulk.py
+This module loads categories and items in bulk, from CSV or NDJSON.
+Rows are streamed and written in batches, all in one transaction:
+    COPY FROM STDIN on PostgreSQL, executemany on other databases.
+Foreign keys of a batch are checked with one query,
+    instead of one query per row.
+See also: import_catalog.py, POST /items/import
+
+Record fields:
+    type: 'category' or 'item', guessed from name or title if missing
+    category: id (optional), name
+    item: id (optional), title, description, price,
+        category_id or category (name),
+        user_id, created (ISO 8601 or RFC 1123, now if missing)
+    /catalog.ndjson is a valid NDJSON import.
+    Records with an id already in the database are skipped,
+        so a dump can be imported again into the database it came from.
+        A category id taken by another name is an invalid record.
+
+Classes:
+    BulkImportError: raised when a record is invalid and not skipped
+    ImportReport: counts, rejected records and speed of an import
+
+Functions:
+    read_csv(stream)
+    read_ndjson(stream)
+    read_records(stream, format)
+    write_rows(session, table, rows)
+    reset_sequence(session, table)
+    import_catalog(session, records, user_id=None, trusted=True, ...)
+
+created on 18/October/2026
+"""
+
+
+import csv
+import datetime
+import email.utils
+import io
+import json
+import time
+
+from catalog_app.api.models import User, Category, Item, CatalogVersion, \
+    category_cache
+from catalog_app.api.mutations import _text
+from catalog_app.api.page_cache import page_cache
+from catalog_app.api.util import utc
+from settings import config
+
+
+FORMATS = ('csv', 'ndjson')
+
+_TIME_FORMATS = ('%Y-%m-%dT%H:%M:%S.%f', '%Y-%m-%dT%H:%M:%S',
+                 '%Y-%m-%d %H:%M:%S.%f', '%Y-%m-%d %H:%M:%S')
+
+
+class BulkImportError(Exception):
+    """An invalid record stopped the import, nothing was written.
+        report: ImportReport up to the invalid record
+    """
+
+    def __init__(self, report):
+        Exception.__init__(self, "Invalid record, import rolled back")
+        self.report = report
+
+
+class ImportReport(object):
+    """Counts of an import, and the first max_errors rejected records."""
+
+    def __init__(self, max_errors=100):
+        self.max_errors = max_errors
+        self.categories = 0
+        self.items = 0
+        self.skipped = 0
+        self.rejected = 0
+        self.errors = []
+        self.started = time.time()
+        self.seconds = 0.0
+
+    def reject(self, line, message):
+        self.rejected += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'line': line, 'message': message})
+
+    def finish(self):
+        self.seconds = time.time() - self.started
+
+    @property
+    def rows_per_second(self):
+        rows = self.categories + self.items
+        return int(rows / self.seconds) if self.seconds else rows
+
+    @property
+    def serialize(self):
+        """
+        :return: make a dictionary out of the attributes
+        """
+        return {
+            'categories': self.categories,
+            'items': self.items,
+            'skipped': self.skipped,
+            'rejected': self.rejected,
+            'errors': self.errors,
+            'seconds': round(self.seconds, 3),
+            'rows_per_second': self.rows_per_second
+        }
+
+
+def read_csv(stream):
+    """
+    :param stream: file object of UTF-8 CSV with a header row
+    :return: an iterator of (line number, record dictionary),
+        the record is None if the row is not valid UTF-8 or CSV
+    """
+    # Counted here, reader.line_num misses a line with a NUL byte.
+    lines = [0]
+
+    def counted():
+        for line in stream:
+            lines[0] += 1
+            yield line
+    reader = csv.DictReader(counted())
+    try:
+        reader.fieldnames
+    except csv.Error:
+        # Without a header no row can be read.
+        yield lines[0], None
+        return
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error:
+            # The reader goes on with the next line.
+            yield lines[0], None
+            continue
+        try:
+            record = dict((key, value.decode('utf-8'))
+                          for key, value in row.items()
+                          if key is not None and value not in (None, ''))
+        except UnicodeDecodeError:
+            record = None
+        yield lines[0], record
+
+
+def read_ndjson(stream):
+    """
+    :param stream: file object of UTF-8 JSON objects, one per line
+    :return: an iterator of (line number, record dictionary),
+        the record is None if the line is not a JSON object
+    """
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        if not isinstance(record, dict):
+            record = None
+        yield line_number, record
+
+
+def read_records(stream, format):
+    """
+    :param stream: file object
+    :param format: 'csv' or 'ndjson'
+    :return: an iterator of (line number, record dictionary)
+    """
+    if format == 'csv':
+        return read_csv(stream)
+    if format == 'ndjson':
+        return read_ndjson(stream)
+    raise ValueError("Unknown format {}".format(format))
+
+
+def _copy_value(value):
+    # PostgreSQL COPY text format
+    if value is None:
+        return '\\N'
+    if isinstance(value, datetime.datetime):
+        value = value.isoformat()
+    elif not isinstance(value, basestring):
+        value = str(value)
+    if isinstance(value, unicode):
+        value = value.encode('utf-8')
+    return value.replace('\\', '\\\\').replace('\t', '\\t') \
+        .replace('\n', '\\n').replace('\r', '\\r')
+
+
+def write_rows(session, table, rows):
+    """
+    Insert rows with one statement in the transaction of session.
+    :param session: accessible database session
+    :param table: SQLAlchemy table, e.g. Item.__table__
+    :param rows: a list of dictionaries, all with the same keys
+    """
+    if not rows:
+        return
+    connection = session.connection()
+    if connection.dialect.name != 'postgresql':
+        connection.execute(table.insert(), rows)
+        return
+    columns = sorted(rows[0])
+    preparer = connection.dialect.identifier_preparer
+    buf = io.BytesIO()
+    for row in rows:
+        buf.write('\t'.join(_copy_value(row[c]) for c in columns))
+        buf.write('\n')
+    buf.seek(0)
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert('COPY {} ({}) FROM STDIN'.format(
+            preparer.format_table(table),
+            ', '.join(preparer.quote(c) for c in columns)), buf)
+    finally:
+        cursor.close()
+
+
+def reset_sequence(session, table):
+    """
+    Move the id sequence of table after its' largest id,
+        after rows were written with explicit ids.
+    Only PostgreSQL has sequences to move.
+    :param session: accessible database session
+    :param table: SQLAlchemy table with an id column
+    """
+    connection = session.connection()
+    if connection.dialect.name != 'postgresql':
+        return
+    name = connection.dialect.identifier_preparer.format_table(table)
+    connection.execute(
+        "SELECT setval(pg_get_serial_sequence('{0}', 'id'), "
+        "coalesce(max(id), 0) + 1, false) FROM {0}".format(name))
+
+
+def _parse_time(value):
+    if value is None:
+        return None
+    if isinstance(value, (int, long, float)):
+        return datetime.datetime.fromtimestamp(value, utc)
+    for time_format in _TIME_FORMATS:
+        try:
+            return datetime.datetime.strptime(value, time_format).replace(
+                tzinfo=utc)
+        except ValueError:
+            pass
+    # The format of the created field in the JSON end-points
+    parsed = email.utils.parsedate_tz(value)
+    if parsed is None:
+        raise ValueError("Invalid time {}".format(value))
+    return datetime.datetime.fromtimestamp(
+        email.utils.mktime_tz(parsed), utc)
+
+
+def _record_type(record):
+    if 'type' in record:
+        return record['type']
+    if 'title' in record:
+        return 'item'
+    if 'name' in record:
+        return 'category'
+    return None
+
+
+def _optional_int(record, key):
+    value = record.get(key)
+    return None if value in (None, '') else int(value)
+
+
+def _batches(records, size):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class _Import(object):
+    """State of one import_catalog call."""
+
+    def __init__(self, session, user_id, trusted, report):
+        self.session = session
+        self.user_id = user_id
+        self.trusted = trusted
+        self.report = report
+        self.now = datetime.datetime.now(utc)
+        # Categories are few, all of them are read once.
+        self.category_names = {}
+        self.category_ids = {}
+        for id, name in session.query(Category.id, Category.name):
+            self.category_names.setdefault(name, id)
+            self.category_ids[id] = name
+        self.user_ids = set()
+        # Explicit item ids of the import, and those found in the database.
+        self.item_ids = set()
+        self.written_categories = set()
+        self.explicit_category_ids = False
+        self.explicit_item_ids = False
+
+    def add_category(self, line, record):
+        if not self.trusted:
+            self.report.reject(line, "Categories can not be uploaded")
+            return
+        try:
+            name = _text(record, 'name')
+        except ValueError as e:
+            self.report.reject(line, str(e))
+            return
+        if not name:
+            self.report.reject(line, "Category name is required")
+            return
+        try:
+            id = _optional_int(record, 'id')
+        except (TypeError, ValueError, OverflowError):
+            self.report.reject(line, "Invalid category id")
+            return
+        if id is None and name in self.category_names:
+            # Importing the same file twice does not repeat categories.
+            self.report.skipped += 1
+            return
+        if id is not None and id in self.category_ids:
+            if self.category_ids[id] == name:
+                self.report.skipped += 1
+            else:
+                self.report.reject(line, "Category {} exists as {}".format(
+                    id, self.category_ids[id]))
+            return
+        values = {'name': name, 'created': self.now}
+        if id is not None:
+            values['id'] = id
+            self.explicit_category_ids = True
+        # One statement per category, as its' id is needed at once.
+        result = self.session.connection().execute(
+            Category.__table__.insert().values(**values))
+        id = result.inserted_primary_key[0]
+        self.category_names.setdefault(name, id)
+        self.category_ids[id] = name
+        self.written_categories.add(id)
+        self.report.categories += 1
+
+    def item_row(self, line, record):
+        """
+        :return: the row of an item record, None if it is rejected
+        """
+        try:
+            # NDJSON fields can be any JSON value.
+            title = _text(record, 'title')
+            description = _text(record, 'description')
+            price = _text(record, 'price')
+            category = _text(record, 'category')
+        except ValueError as e:
+            self.report.reject(line, str(e))
+            return None
+        if not title:
+            self.report.reject(line, "Item title is required")
+            return None
+        try:
+            # Uploaded items get new ids, like items created in a form.
+            id = _optional_int(record, 'id') if self.trusted else None
+            category_id = _optional_int(record, 'category_id')
+            user_id = _optional_int(record, 'user_id') \
+                if self.trusted else None
+            created = _parse_time(record.get('created')) or self.now
+        except (TypeError, ValueError, OverflowError) as e:
+            self.report.reject(line, str(e))
+            return None
+        if category_id is None:
+            category_id = self.category_names.get(category)
+        if category_id is None:
+            self.report.reject(line, "Item category is required")
+            return None
+        row = {
+            'title': title,
+            'description': description,
+            'price': price,
+            'category_id': category_id,
+            'user_id': user_id if user_id is not None else self.user_id,
+            'created': created
+        }
+        if id is not None:
+            row['id'] = id
+        return row
+
+    def check_users(self, rows):
+        unknown = set(row['user_id'] for row in rows
+                      if row['user_id'] is not None) - self.user_ids
+        if unknown:
+            self.user_ids.update(id for (id,) in self.session.query(
+                User.id).filter(User.id.in_(unknown)))
+
+    def check_items(self, rows):
+        unknown = set(row['id'] for row in rows
+                      if 'id' in row) - self.item_ids
+        if unknown:
+            self.item_ids.update(id for (id,) in self.session.query(
+                Item.id).filter(Item.id.in_(unknown)))
+
+    def add_batch(self, batch):
+        rows = []
+        for line, record in batch:
+            record_type = record and _record_type(record)
+            if record is None:
+                self.report.reject(line, "Unreadable record")
+            elif record_type == 'category':
+                self.add_category(line, record)
+            elif record_type == 'item':
+                row = self.item_row(line, record)
+                if row is not None:
+                    rows.append((line, row))
+            else:
+                self.report.reject(line, "Not a category or an item")
+        self.check_users([row for line, row in rows])
+        self.check_items([row for line, row in rows])
+        valid = []
+        with_ids = []
+        for line, row in rows:
+            if 'id' in row and row['id'] in self.item_ids:
+                self.report.skipped += 1
+            elif row['category_id'] not in self.category_ids:
+                self.report.reject(line, "Category {} does not exist".format(
+                    row['category_id']))
+            elif row['user_id'] is not None and \
+                    row['user_id'] not in self.user_ids:
+                self.report.reject(line, "User {} does not exist".format(
+                    row['user_id']))
+            elif 'id' in row:
+                with_ids.append(row)
+                self.item_ids.add(row['id'])
+                self.written_categories.add(row['category_id'])
+            else:
+                valid.append(row)
+                self.written_categories.add(row['category_id'])
+        # Every row of a statement has the same columns.
+        write_rows(self.session, Item.__table__, valid)
+        write_rows(self.session, Item.__table__, with_ids)
+        self.explicit_item_ids = self.explicit_item_ids or bool(with_ids)
+        self.report.items += len(valid) + len(with_ids)
+
+
+def import_catalog(session, records, user_id=None, trusted=True,
+                   skip_invalid=False, batch_size=None):
+    """
+    Load categories and items, and commit them in one transaction.
+    Then the category cache and the page cache are cleared,
+        other processes see the import after their TTLs.
+    Raise BulkImportError and roll back if a record is invalid,
+        unless skip_invalid is True.
+    :param session: accessible database session
+    :param records: an iterator of (line number, record), see read_records
+    :param user_id: owner of items without a user_id field
+    :param trusted: False for uploads:
+        categories are refused, and items are owned by user_id
+    :param skip_invalid: reject invalid records, and import the others
+    :param batch_size: records written per statement,
+        config.BULK_IMPORT_BATCH_SIZE if None
+    :return: ImportReport
+    """
+    report = ImportReport(max_errors=config.BULK_IMPORT_MAX_ERRORS)
+    state = _Import(session, user_id, trusted, report)
+    try:
+        for batch in _batches(records,
+                              batch_size or config.BULK_IMPORT_BATCH_SIZE):
+            state.add_batch(batch)
+            if report.rejected and not skip_invalid:
+                raise BulkImportError(report)
+        if state.explicit_category_ids:
+            reset_sequence(session, Category.__table__)
+        if state.explicit_item_ids:
+            reset_sequence(session, Item.__table__)
+        if state.written_categories:
+            CatalogVersion.bump(session,
+                                category_ids=state.written_categories)
+        session.commit()
+    except:
+        session.rollback()
+        report.finish()
+        raise
+    report.finish()
+    if report.categories:
+        category_cache.invalidate()
+    if report.categories or report.items:
+        page_cache.clear()
+    return report
@@ -7,46 +7,113 @@ Attributes:
     basic: Flask blueprint instance which bind / url
 
 Functions:
+    authenticate()
     showMain()
     showItemList(category_id)
     showItemDetail(category_id, item_id)
+    searchItems()
     addItem()
+    importItems()
+    changeItems()
     editItem(category_id, item_id)
     deleteItem(item_id)
     getAllContent()
+    streamAllContent()
+    streamAllContentNdjson()
     getJsonItemList(category_id)
     getJsonItemDetail(category_id, item_id)
+    getJsonItemBatch()
+    getJsonSearch()
+    getJsonQueries()
 
 created on 13/June/2014
 """
 import json
 
-from flask import render_template, Blueprint, request,\
-    redirect, url_for, flash, jsonify, make_response
+from flask import render_template, Blueprint, request, g,\
+    redirect, url_for, flash, jsonify, make_response, json as flask_json,\
+    Response, stream_with_context
 
-from catalog_app import session
-from catalog_app.api.models import User, Category, Item
-from util import validate_token
+from catalog_app import session, query_log
+from catalog_app.api.models import User, Category, Item, CatalogVersion
+from catalog_app.api.bulk import import_catalog, read_records, \
+    BulkImportError, FORMATS
+from catalog_app.api.mutations import apply_mutations, MODES
+from catalog_app.api.page_cache import cached_page, invalidate_pages
+from catalog_app.routing import read_only
+from util import authenticate_token, encode_cursor, decode_cursor, utc
+from settings import config
 
 
 basic = Blueprint('basic', __name__)
 
 
+def _load_user(user_id):
+    return User.get_row_by_id(session, user_id)
+
+
+@basic.before_request
+def authenticate():
+    """Resolve the user of the request once, before any handler runs.
+        g.token: JSON web token in the cookie, None if logged out
+        g.user_data: user data in the token, False if not authenticated
+        g.current_user: UserRow of the authenticated user, or None
+    """
+    g.token = request.cookies.get('token')
+    expire_time = request.cookies.get('expire_time')
+    # When user send POST request,
+    #     we get a token again from HTTP header, not from cookie
+    if request.method == "POST":
+        token = request.headers.get('Authorization')
+    else:
+        token = g.token
+    g.user_data, g.current_user = authenticate_token(token, expire_time,
+                                                     _load_user)
+
+
+def _page_args():
+    """Read keyset pagination arguments from the query string.
+        ?limit=number of items&cursor=next cursor of the previous page
+    :return: limit, (created, id) to start after or None,
+        and False if the cursor is not valid
+    """
+    limit = request.args.get('limit', config.PAGE_SIZE, type=int)
+    limit = max(1, min(limit, config.PAGE_SIZE_MAX))
+    cursor = request.args.get('cursor')
+    if not cursor:
+        return limit, None, True
+    after = decode_cursor(cursor)
+    return limit, after, after is not None
+
+
+def _search_args():
+    """Read search arguments from the query string.
+        ?q=words&page=page number&limit=number of items
+    :return: query, page, limit,
+        and False if the page is beyond config.SEARCH_MAX_RESULTS
+    """
+    query = request.args.get('q', u'').strip()
+    limit = request.args.get('limit', config.PAGE_SIZE, type=int)
+    limit = max(1, min(limit, config.PAGE_SIZE_MAX))
+    page = max(1, request.args.get('page', 1, type=int))
+    return query, page, limit, (page - 1) * limit < config.SEARCH_MAX_RESULTS
+
+
+def _has_next_page(page, limit, more):
+    return more and page * limit < config.SEARCH_MAX_RESULTS
+
+
 @basic.route('/')
+@cached_page('main')
 def showMain():
     """Render the main page contain all categories and most recent items
         GET /
     """
     # Check if user is authenticated
-    token = request.cookies.get('token')
-    expire_time = request.cookies.get('expire_time')
-    user_data = None
-    if token:
-        user_data = validate_token(token, expire_time)
+    user_data = g.user_data
 
     # SQL model method which retrieve all categories.
-    categories = Category.get_all(session, order_by=Category.name,
-                                  ascending=True)
+    categories = Category.get_all_cached(session, order_by='name')
     # SQL model method which retrieve most recent 10 items.
     items = Item.get_recent(session, limit=10)
     # Show user a different view which contains 'add item' link
@@ -56,6 +123,7 @@ def showMain():
 
 
 @basic.route('/category/<int:category_id>/')
+@cached_page('category:{category_id}')
 def showItemList(category_id):
     """Render the page contain all categories
            and all items in a selected category
@@ -64,30 +132,37 @@ def showItemList(category_id):
             GET /category/1/ shows a list of items in category 1
     """
     # Check if user is authenticated
-    token = request.cookies.get('token')
-    expire_time = request.cookies.get('expire_time')
-    user_data = None
-    if token:
-        user_data = validate_token(token, expire_time)
+    user_data = g.user_data
 
     # SQL model method which retrieve all categories.
-    categories = Category.get_all(session, order_by=Category.created,
-                                  ascending=True)
+    categories = Category.get_all_cached(session, order_by='created')
 
+    # An invalid cursor shows the first page.
+    limit, after, valid = _page_args()
     # SQL model method which retrieve a category row by its' id.
-    category = Category.get_by_id(session, category_id)
+    category = Category.get_cached_by_id(session, category_id)
+    next_cursor = None
+    item_count = 0
     if category:
-        # SQL model method which retrieve all items in their category's id.
-        items = Category.item_set(session, category.id)
+        # SQL model method which retrieve a page of items
+        #     in their category's id.
+        items, next_page, item_count = Category.item_page(
+            session, category.id, limit, after=after)
+        if next_page:
+            next_cursor = encode_cursor(*next_page)
     else:
         items = []
     # Show user a different view which contains 'add item' link
     #     if user_data is not None, which means an authenticated user.
     return render_template('show_item_list.html', categories=categories,
-                           category=category, items=items, user=user_data)
+                           category=category, items=items,
+                           item_count=item_count, limit=limit,
+                           is_first_page=after is None,
+                           next_cursor=next_cursor, user=user_data)
 
 
 @basic.route('/category/<int:category_id>/item/<int:item_id>')
+@cached_page('item:{item_id}')
 def showItemDetail(category_id, item_id):
     """Render the detail page of a selected item
         GET /category/category id/item/item id
@@ -95,12 +170,8 @@ def showItemDetail(category_id, item_id):
             GET /category/1/item/2 shows the detail of the item 2
                 in the category 1
     """
-    token = request.cookies.get('token')
-    expire_time = request.cookies.get('expire_time')
-    user_data = None
-    if token:
-        user_data = validate_token(token, expire_time)
-    category = Category.get_by_id(session, category_id)
+    user_data = g.user_data
+    category = Category.get_cached_by_id(session, category_id)
     item = Item.get_by_id(session, item_id)
     # Show user a different view which contains 'edit' and 'delete' link
     #     if user_data is not None, which means an authenticated user.
@@ -108,6 +179,38 @@ def showItemDetail(category_id, item_id):
                            category=category, item=item, user=user_data)
 
 
+@basic.route('/search')
+def searchItems():
+    """Render the items matching a full-text search, best match first
+        GET /search?q=words&page=page number
+        Example:
+            GET /search?q=soccer+ball shows the items about soccer balls
+    """
+    user_data = g.user_data
+    categories = Category.get_all_cached(session, order_by='name')
+    query, page, limit, valid = _search_args()
+    items, more = [], False
+    if valid:
+        items, more = Item.search(session, query, limit,
+                                  offset=(page - 1) * limit)
+    return render_template('search.html', categories=categories,
+                           items=items, query=query, page=page, limit=limit,
+                           has_next_page=_has_next_page(page, limit, more),
+                           user=user_data)
+
+
+def _form_category_id():
+    """Read the category field of an item form.
+    :return: id of an existing category,
+        or None if the field is not the id of one
+    """
+    value = request.form.get('category', '')
+    if not value.isdigit():
+        return None
+    category = Category.get_cached_by_id(session, int(value))
+    return category.id if category is not None else None
+
+
 @basic.route('/items/', methods=['GET', 'POST'])
 def addItem():
     """
@@ -121,25 +224,20 @@ def addItem():
                 category (required)
             Created date are default saved as timestamp
     """
-    token = request.cookies.get('token')
-    expire_time = request.cookies.get('expire_time')
     # Only authenticated user can add a new item
-    if not token:
+    if not g.token:
         flash("Please login.")
         return redirect(url_for('auth.login'))
 
     if request.method == "GET":
-        user_data = validate_token(token, expire_time)
-        categories = Category.get_all(session)
+        user_data = g.user_data
+        categories = Category.get_all_cached(session)
         return render_template('add_item.html',
                                categories=categories, user=user_data)
 
     if request.method == "POST":
-        # When user send POST request,
-        #     we get a token again from HTTP header, not from cookie
-        token = request.headers.get('Authorization')
         # Only authenticated user can add a new item
-        user_data = validate_token(token, expire_time)
+        user_data = g.user_data
         if not user_data:
             response = make_response(
                 json.dumps({
@@ -153,7 +251,7 @@ def addItem():
         # Get title, description, and category_id from the form.
         title = request.form.get('title')
         description = request.form.get('description')
-        category_id = request.form.get('category')
+        category_id = _form_category_id()
 
         # In the form in HTML title field is required.
         # No title means the user use another way to send POST request
@@ -167,11 +265,23 @@ def addItem():
             response.headers['Content-Type'] = 'application/json'
             return response
 
+        if category_id is None:
+            response = make_response(
+                json.dumps({
+                    "message": "Please choose a category",
+                    "redirect": url_for('basic.addItem')
+                }), 400
+            )
+            response.headers['Content-Type'] = 'application/json'
+            return response
+
         # Create a new item row with the fields user has inputted
         item = Item(title=title, description=description,
                     category_id=category_id, user_id=user_data.get("id"))
         session.add(item)
+        CatalogVersion.bump(session, category_ids=[category_id])
         session.commit()
+        invalidate_pages('main', 'category:{}'.format(category_id))
         # Redirect to the detail page, so user can check their input.
         response = make_response(
             json.dumps({
@@ -184,6 +294,146 @@ def addItem():
         return response
 
 
+def _upload_format(upload):
+    """
+    :param upload: uploaded file, or None for the request body
+    :return: 'csv', 'ndjson', or None if it is unknown
+    """
+    format = request.args.get('format')
+    if not format and upload is not None and upload.filename:
+        format = upload.filename.rsplit('.', 1)[-1].lower()
+    if not format:
+        format = {'text/csv': 'csv',
+                  'application/x-ndjson': 'ndjson'}.get(request.mimetype)
+    return format if format in FORMATS else None
+
+
+@basic.route('/items/import', methods=['POST'])
+def importItems():
+    """
+        POST /items/import?format=csv or ndjson:
+            Create many items at once from CSV or NDJSON,
+                sent as the file field of a form or as the request body.
+            Every item is owned by the user, categories must exist.
+            Nothing is created if a record is invalid.
+            Record fields:
+                title (required)
+                description
+                price
+                category_id or category (name of the category, required)
+                created
+    """
+    user_data = g.user_data
+    if not user_data:
+        response = make_response(
+            json.dumps({
+                "message": "Please login",
+                "redirect": url_for('auth.login')
+            }), 401
+        )
+        response.headers['Content-Type'] = 'application/json'
+        return response
+
+    upload = request.files.get('file')
+    format = _upload_format(upload)
+    if format is None:
+        response = make_response(
+            json.dumps({
+                "status": "fail",
+                "message": "Send CSV or NDJSON"
+            }), 400
+        )
+        response.headers['Content-Type'] = 'application/json'
+        return response
+
+    stream = upload.stream if upload is not None else request.stream
+    try:
+        report = import_catalog(session, read_records(stream, format),
+                                user_id=user_data.get("id"), trusted=False)
+    except BulkImportError as e:
+        result = e.report.serialize
+        result["status"] = "fail"
+        result["message"] = str(e)
+        response = make_response(json.dumps(result), 400)
+        response.headers['Content-Type'] = 'application/json'
+        return response
+
+    result = report.serialize
+    result["status"] = "success"
+    response = make_response(json.dumps(result), 200)
+    response.headers['Content-Type'] = 'application/json'
+    return response
+
+
+@basic.route('/items/bulk.json', methods=['POST'])
+def changeItems():
+    """
+        POST /items/bulk.json:
+            Create, update and delete many items of the user
+                in one transaction.
+            Body, JSON:
+                mode: "atomic" (default), nothing is applied
+                    if an operation is rejected,
+                    or "partial", the valid operations are applied
+                operations: a list of at most
+                    config.BULK_MUTATION_MAX_OPERATIONS of
+                    {"op": "create", "title", "description", "price",
+                        "category_id"}
+                    {"op": "update", "id", fields to change}
+                    {"op": "delete", "id"}
+            The result of every operation is returned in the same order.
+    """
+    user_data = g.user_data
+    if not user_data:
+        response = make_response(
+            json.dumps({
+                "message": "Please login",
+                "redirect": url_for('auth.login')
+            }), 401
+        )
+        response.headers['Content-Type'] = 'application/json'
+        return response
+
+    body = request.get_json(force=True, silent=True)
+    operations = isinstance(body, dict) and body.get('operations')
+    mode = isinstance(body, dict) and body.get('mode', 'atomic')
+    if not isinstance(operations, list) or mode not in MODES or \
+            len(operations) > config.BULK_MUTATION_MAX_OPERATIONS:
+        response = make_response(
+            json.dumps({
+                "status": "fail",
+                "message": "Send a JSON object with a mode of {} and "
+                           "at most {} operations".format(
+                               ' or '.join(MODES),
+                               config.BULK_MUTATION_MAX_OPERATIONS)
+            }), 400
+        )
+        response.headers['Content-Type'] = 'application/json'
+        return response
+
+    results, applied = apply_mutations(session, operations,
+                                       user_data.get("id"),
+                                       atomic=mode == 'atomic')
+    rejected = sum(1 for r in results if r['status'] == 'rejected')
+    if rejected and mode == 'atomic':
+        status, code = "fail", 400
+    elif rejected:
+        status, code = "partial", 200
+    else:
+        status, code = "success", 200
+    response = make_response(
+        json.dumps({
+            "status": status,
+            "mode": mode,
+            "applied": applied,
+            "rejected": rejected,
+            "results": results
+        }), code
+    )
+    response.headers['Content-Type'] = 'application/json'
+    return response
+
+
 @basic.route('/category/<int:category_id>/item/<int:item_id>/edit',
              methods=['GET', 'POST'])
 def editItem(category_id, item_id):
@@ -197,17 +447,15 @@ def editItem(category_id, item_id):
                 description
                 category (required)
     """
-    token = request.cookies.get('token')
-    expire_time = request.cookies.get('expire_time')
     # Only authorized user can see an edit item page
-    if not token:
+    if not g.token:
         flash("You are not authorized.")
         return redirect(url_for('basic.showMain'))
 
     if request.method == "GET":
 
         # Only authorized user can see an edit item page
-        user_data = validate_token(token, expire_time)
+        user_data = g.user_data
         if not user_data:
             flash("You are not authorized.")
             return redirect(url_for('basic.showMain'))
@@ -219,17 +467,14 @@ def editItem(category_id, item_id):
             flash("You are not authorized.")
             return redirect(url_for('basic.showMain'))
 
-        categories = Category.get_all(session)
+        categories = Category.get_all_cached(session)
         item = Item.get_by_id(session, item_id)
         return render_template('edit_item.html',
                                categories=categories, item=item)
 
     if request.method == "POST":
-        # When user send POST request,
-        #     we get a token again from HTTP header, not from cookie
-        token = request.headers.get('Authorization')
         # Only authorized user can edit this item
-        user_data = validate_token(token, expire_time)
+        user_data = g.user_data
         if not user_data:
             response = make_response(
                 json.dumps({
@@ -245,7 +490,7 @@ def editItem(category_id, item_id):
         item = Item.get_by_id(session, item_id)
         title = request.form.get('title')
         description = request.form.get('description')
-        new_category_id = request.form.get('category')
+        new_category_id = _form_category_id()
 
         # In the form in HTML title field is required.
         # No title means the user use another way to send POST request
@@ -261,10 +506,22 @@ def editItem(category_id, item_id):
             response.headers['Content-Type'] = 'application/json'
             return response
 
+        if new_category_id is None:
+            response = make_response(
+                json.dumps({
+                    "message": "Please choose a category",
+                    "redirect": url_for('basic.editItem',
+                                        category_id=category_id,
+                                        item_id=item_id)
+                }), 400
+            )
+            response.headers['Content-Type'] = 'application/json'
+            return response
+
         # Only authorized user can edit item
         # Authorized user id must be the same as
         #     the user's id who created the item before.
-        user = User.get_by_id(session, user_data.get("id"))
+        user = g.current_user
         if not User.is_authorized(session, user.id, item_id):
             response = make_response(
                 json.dumps({
@@ -277,11 +534,18 @@ def editItem(category_id, item_id):
             response.headers['Content-Type'] = 'application/json'
             return response
 
+        # Both the old and the new category of the item changed.
+        CatalogVersion.bump(session, category_ids=[item.category_id,
+                                                   new_category_id])
+        old_category_id = item.category_id
         item.title = title
         item.description = description
         item.category_id = new_category_id
         session.add(item)
         session.commit()
+        invalidate_pages('main', 'item:{}'.format(item_id),
+                         'category:{}'.format(old_category_id),
+                         'category:{}'.format(new_category_id))
 
         response = make_response(
             json.dumps({
@@ -303,16 +567,14 @@ def deleteItem(item_id):
         POST /item/item id/delete:
             Delete the selected item from database
     """
-    token = request.cookies.get('token')
-    expire_time = request.cookies.get('expire_time')
     # Only authorized user can see an edit item page
-    if not token:
+    if not g.token:
         flash("You are not authorized.")
         return redirect(url_for('basic.showMain'))
 
     if request.method == "GET":
         # Only authorized user can see a delete item page
-        user_data = validate_token(token, expire_time)
+        user_data = g.user_data
         if not user_data:
             flash("You are not authorized.")
             return redirect(url_for('basic.showMain'))
@@ -321,13 +583,10 @@ def deleteItem(item_id):
         return render_template('delete_item.html', item=item, user=user_data)
 
     if request.method == "POST":
-        # When user send POST request,
-        #     we get a token again from HTTP header, not from cookie
-        token = request.headers.get('Authorization')
         # Get item to delete
         item = Item.get_by_id(session, item_id)
         # Only authorized user can delete this item
-        user_data = validate_token(token, expire_time)
+        user_data = g.user_data
         if not user_data:
             response = make_response(
                 json.dumps({
@@ -343,7 +602,7 @@ def deleteItem(item_id):
         # Only authorized user can delete an item
         # Authorized user id must be the same as
         #     the user's id who created the item before.
-        user = User.get_by_id(session, user_data.get("id"))
+        user = g.current_user
         if not User.is_authorized(session, user.id, item_id):
             response = make_response(
                 json.dumps({
@@ -356,8 +615,12 @@ def deleteItem(item_id):
             response.headers['Content-Type'] = 'application/json'
             return response
 
+        CatalogVersion.bump(session, category_ids=[item.category_id])
+        category_id = item.category_id
         session.delete(item)
         session.commit()
+        invalidate_pages('main', 'item:{}'.format(item_id),
+                         'category:{}'.format(category_id))
 
         response = make_response(
             json.dumps({
@@ -369,28 +632,178 @@ def deleteItem(item_id):
         return response
 
 
+def _validators(scope):
+    """Get ETag and Last-Modified of a JSON end-point
+        from the write counter it depends on, without reading any item.
+    :param scope: CatalogVersion scope
+    :return: etag, last_modified
+    """
+    version, modified = CatalogVersion.get(session, scope)
+    etag = '{}-{}'.format(scope.replace(':', '-'), version)
+    if modified is not None:
+        if modified.tzinfo is not None:
+            modified = modified.astimezone(utc).replace(tzinfo=None)
+        modified = modified.replace(microsecond=0)
+    return etag, modified
+
+
+def _not_modified(etag, last_modified):
+    """
+    :return: True if the copy of the client is still current
+    """
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified:
+        return last_modified <= request.if_modified_since
+    return False
+
+
+def _set_validators(response, etag, last_modified):
+    """Let clients and shared caches revalidate the response."""
+    response.headers['ETag'] = 'W/"{}"'.format(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.cache_control.public = True
+    response.cache_control.max_age = config.JSON_CACHE_MAX_AGE
+    return response
+
+
 # JSON end-point
 @basic.route('/catalog.json')
 def getAllContent():
-    categories = Category.get_all(session, order_by=Category.name,
-                                  ascending=True)
-    categories_list = [c.serialize for c in categories]
-    for c in categories_list:
-        c["items"] = [i.serialize for i in Category.item_set(session, c["id"])]
+    etag, last_modified = _validators(CatalogVersion.CATALOG)
+    if _not_modified(etag, last_modified):
+        return _set_validators(Response(status=304), etag, last_modified)
+    # SQL model method which retrieve all categories and their items
+    #     with two queries in total.
+    categories_list = []
+    for category, items in Category.get_all_with_items(session):
+        c = category.serialize
+        c["items"] = [i.serialize for i in items]
+        categories_list.append(c)
     result = {
         "status": "success",
         "type": "collection",
         "collection_type": "categories",
         "categories": categories_list
         }
-    return jsonify(result)
+    return _set_validators(jsonify(result), etag, last_modified)
+
+
+def _chunked(pieces, size=16384):
+    """Join small strings into chunks of about size bytes,
+        so a streaming response is not written a few bytes at a time.
+    """
+    buf = []
+    length = 0
+    for piece in pieces:
+        buf.append(piece)
+        length += len(piece)
+        if length >= size:
+            yield ''.join(buf)
+            buf = []
+            length = 0
+    if buf:
+        yield ''.join(buf)
+
+
+@basic.route('/catalog.stream.json')
+def streamAllContent():
+    """Same document as /catalog.json, written while rows are read.
+        Memory stays flat no matter how large the catalog is.
+    """
+    etag, last_modified = _validators(CatalogVersion.CATALOG)
+    if _not_modified(etag, last_modified):
+        return _set_validators(Response(status=304), etag, last_modified)
+
+    def generate():
+        yield ('{"status": "success", "type": "collection", '
+               '"collection_type": "categories", "categories": [')
+        current_id = None
+        first_item = True
+        for category, item in Item.iter_by_category(
+                session, batch_size=config.STREAM_BATCH_SIZE):
+            if category.id != current_id:
+                if current_id is not None:
+                    yield ']},'
+                current_id = category.id
+                first_item = True
+                # Open the category object, its' items follow.
+                yield flask_json.dumps(category.serialize)[:-1]
+                yield ', "items": ['
+            if item is not None:
+                if not first_item:
+                    yield ','
+                first_item = False
+                yield flask_json.dumps(item.serialize)
+        if current_id is not None:
+            yield ']}'
+        yield ']}'
+
+    response = Response(stream_with_context(_chunked(generate())),
+                        mimetype='application/json')
+    return _set_validators(response, etag, last_modified)
+
+
+@basic.route('/catalog.ndjson')
+def streamAllContentNdjson():
+    """Newline delimited JSON flavor of /catalog.json.
+        Every category line is followed by the lines of its' items.
+    """
+    etag, last_modified = _validators(CatalogVersion.CATALOG)
+    if _not_modified(etag, last_modified):
+        return _set_validators(Response(status=304), etag, last_modified)
+
+    def generate():
+        current_id = None
+        for category, item in Item.iter_by_category(
+                session, batch_size=config.STREAM_BATCH_SIZE):
+            if category.id != current_id:
+                current_id = category.id
+                row = category.serialize
+                row["type"] = "category"
+                yield flask_json.dumps(row) + '\n'
+            if item is not None:
+                row = item.serialize
+                row["type"] = "item"
+                yield flask_json.dumps(row) + '\n'
+
+    response = Response(stream_with_context(_chunked(generate())),
+                        mimetype='application/x-ndjson')
+    return _set_validators(response, etag, last_modified)
 
 
 @basic.route('/category/<int:category_id>/item.json')
 def getJsonItemList(category_id):
-    category = Category.get_by_id(session, category_id)
+    """
+        GET /category/category id/item.json?limit=50&cursor=next cursor
+        Items are paginated by (created, id),
+            follow "next" to get the next page.
+    """
+    limit, after, valid = _page_args()
+    if not valid:
+        response = make_response(
+            json.dumps({
+                "status": "fail",
+                "message": "Invalid cursor"
+            }), 400
+        )
+        response.headers['Content-Type'] = 'application/json'
+        return response
+
+    etag, last_modified = _validators(
+        CatalogVersion.category_scope(category_id))
+    if _not_modified(etag, last_modified):
+        return _set_validators(Response(status=304), etag, last_modified)
+
+    category = Category.get_cached_by_id(session, category_id)
+    next_cursor = None
+    item_count = 0
     if category:
-        items = Category.item_set(session, category.id)
+        items, next_page, item_count = Category.item_page(
+            session, category.id, limit, after=after)
+        if next_page:
+            next_cursor = encode_cursor(*next_page)
     else:
         items = []
 
@@ -399,20 +812,199 @@ def getJsonItemList(category_id):
         "type": "collection",
         "collection_type": "items",
         "category": category.serialize,
-        "items": [i.serialize for i in items]
+        "items": [i.serialize for i in items],
+        "total": item_count,
+        "next": next_cursor,
+        "next_url": next_cursor and url_for(
+            'basic.getJsonItemList', category_id=category_id,
+            limit=limit, cursor=next_cursor)
         }
-    return jsonify(result)
+    return _set_validators(jsonify(result), etag, last_modified)
 
 
 @basic.route('/category/<int:category_id>/item/<int:item_id>/detail.json')
 def getJsonItemDetail(category_id, item_id):
-    category = Category.get_by_id(session, category_id)
+    # Every write of an item bumps the counter of its' category,
+    #     the one it is in now, which the URL may not name.
+    item_category_id = Item.get_category_id(session, item_id)
+    if item_category_id is Item.MISSING:
+        response = make_response(
+            json.dumps({
+                "status": "fail",
+                "message": "No such item"
+            }), 404
+        )
+        response.headers['Content-Type'] = 'application/json'
+        return response
+    # An item without a category is only counted by the whole catalog.
+    if item_category_id is None:
+        scope = CatalogVersion.CATALOG
+    else:
+        scope = CatalogVersion.category_scope(item_category_id)
+    etag, last_modified = _validators(scope)
+    if _not_modified(etag, last_modified):
+        return _set_validators(Response(status=304), etag, last_modified)
+
+    category = None
+    if item_category_id is not None:
+        category = Category.get_cached_by_id(session, item_category_id)
     item = Item.get_by_id(session, item_id)
     result = {
         "status": "success",
         "type": "attributes",
         "attributes_type": "item",
-        "category": category.serialize,
+        "category": category.serialize if category else None,
         "item": item.serialize
     }
+    return _set_validators(jsonify(result), etag, last_modified)
+
+
+def _batch_ids():
+    """Read item ids of a batch, from the query string or a form.
+        ids=1,2,3 or ids=1&ids=2&ids=3
+    :return: a list of ids in the requested order,
+        or None if an id is not a number
+    """
+    ids = []
+    for value in request.values.getlist('ids'):
+        for id in value.split(','):
+            id = id.strip()
+            if not id:
+                continue
+            if not id.isdigit():
+                return None
+            ids.append(int(id))
+    return ids
+
+
+@basic.route('/items/batch.json', methods=['GET', 'POST'])
+@read_only
+def getJsonItemBatch():
+    """
+        GET /items/batch.json?ids=1,2,3
+        POST /items/batch.json with the form field ids=1,2,3,
+            for lists too long for a URL
+        Items and their categories, in the requested order,
+            loaded with one query. An id without an item gets
+            "status": "not_found".
+        At most config.BATCH_MAX_ITEMS ids per request.
+    """
+    ids = _batch_ids()
+    if ids is None or len(ids) > config.BATCH_MAX_ITEMS:
+        response = make_response(
+            json.dumps({
+                "status": "fail",
+                "message": "Send at most {} numeric ids".format(
+                    config.BATCH_MAX_ITEMS)
+            }), 400
+        )
+        response.headers['Content-Type'] = 'application/json'
+        return response
+
+    # Every write of an item bumps the counter of the catalog.
+    etag, last_modified = _validators(CatalogVersion.CATALOG)
+    if request.method == 'GET' and _not_modified(etag, last_modified):
+        return _set_validators(Response(status=304), etag, last_modified)
+
+    found = Item.get_by_ids(session, ids)
+    items = []
+    for id in ids:
+        item = found.get(id)
+        if item is None:
+            items.append({"id": id, "status": "not_found"})
+            continue
+        items.append({
+            "id": id,
+            "status": "found",
+            "category": item.category.serialize if item.category else None,
+            "item": item.serialize
+        })
+    result = {
+        "status": "success",
+        "type": "collection",
+        "collection_type": "items",
+        "items": items,
+        "not_found": [id for id in ids if id not in found]
+        }
+    response = jsonify(result)
+    if request.method == 'GET':
+        return _set_validators(response, etag, last_modified)
+    return response
+
+
+@basic.route('/search.json')
+def getJsonSearch():
+    """
+        GET /search.json?q=words&page=page number&limit=50
+        Items are ranked by relevance, follow "next_url" for the next page.
+    """
+    query, page, limit, valid = _search_args()
+    if not valid:
+        response = make_response(
+            json.dumps({
+                "status": "fail",
+                "message": "Page is out of range"
+            }), 400
+        )
+        response.headers['Content-Type'] = 'application/json'
+        return response
+
+    items, more = Item.search(session, query, limit,
+                              offset=(page - 1) * limit)
+    has_next_page = _has_next_page(page, limit, more)
+    result = {
+        "status": "success",
+        "type": "collection",
+        "collection_type": "items",
+        "query": query,
+        "page": page,
+        "items": [i.serialize for i in items],
+        "next_url": has_next_page and url_for(
+            'basic.getJsonSearch', q=query, page=page + 1, limit=limit)
+        or None
+        }
+    return jsonify(result)
+
+
+@basic.route('/admin/queries.json')
+def getJsonQueries():
+    """
+        GET /admin/queries.json?order=total, max, mean or count&limit=50
+        Query timings of the process serving the request, by fingerprint.
+        Only answered to the users in config.ADMIN_EMAILS
+    """
+    user = g.current_user
+    if user is None:
+        response = make_response(
+            json.dumps({
+                "message": "Please login",
+                "redirect": url_for('auth.login')
+            }), 401
+        )
+        response.headers['Content-Type'] = 'application/json'
+        return response
+    if user.email not in config.ADMIN_EMAILS:
+        response = make_response(
+            json.dumps({
+                "status": "fail",
+                "message": "Only administrators can see this page"
+            }), 403
+        )
+        response.headers['Content-Type'] = 'application/json'
+        return response
+
+    order = request.args.get('order', 'total')
+    if order not in query_log.ORDERS:
+        order = 'total'
+    limit = request.args.get('limit', config.PAGE_SIZE, type=int)
+    result = {
+        "status": "success",
+        "type": "collection",
+        "collection_type": "queries",
+        "order": order,
+        "threshold_ms": config.SLOW_QUERY_THRESHOLD_MS,
+        "since": query_log.stats.since,
+        "queries": query_log.stats.report(order=order,
+                                          limit=max(1, limit))
+        }
     return jsonify(result)
@@ -0,0 +1,91 @@
+"""http_client.py
+This module contains the outbound HTTP client of the OAuth flows.
+Connections to the providers are kept alive in a pool,
+    and every request has a connect and a read timeout,
+    so a slow provider can not hold a worker for long.
+
+Attributes:
+    http: requests session shared by every outbound request
+
+Functions:
+    get(url, params=None)
+    get_json(url, params=None)
+    get_facebook_app_token()
+
+created on 18/October/2026
+"""
+
+
+import json
+import threading
+import time
+import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from settings import config
+
+
+http = requests.Session()
+http.mount('https://', HTTPAdapter(pool_connections=config.HTTP_POOL_HOSTS,
+                                   pool_maxsize=config.HTTP_POOL_SIZE))
+http.mount('http://', HTTPAdapter(pool_connections=config.HTTP_POOL_HOSTS,
+                                  pool_maxsize=config.HTTP_POOL_SIZE))
+
+
+def get(url, params=None):
+    """
+    Send a GET request on a pooled connection.
+    Raise requests.RequestException on a timeout or a connection error.
+    :param url:
+    :param params: dictionary of query string arguments
+    :return: requests.Response
+    """
+    return http.get(url, params=params,
+                    timeout=(config.HTTP_CONNECT_TIMEOUT,
+                             config.HTTP_READ_TIMEOUT))
+
+
+def get_json(url, params=None):
+    """
+    Send a GET request and decode the JSON response body.
+    Raise requests.RequestException on a timeout or a connection error,
+        ValueError if the body is not JSON.
+    :param url:
+    :param params: dictionary of query string arguments
+    :return: decoded response body
+    """
+    return json.loads(get(url, params=params).text)
+
+
+_facebook_app_token = {'token': None, 'expires': 0}
+_facebook_app_token_lock = threading.Lock()
+
+
+def get_facebook_app_token():
+    """
+    Get our app access token from Facebook (client credentials grant).
+    The token is cached for FACEBOOK_APP_TOKEN_TTL seconds,
+        so a login does not wait for it every time.
+    :return: app access token
+    """
+    if _facebook_app_token['expires'] > time.time():
+        return _facebook_app_token['token']
+    with _facebook_app_token_lock:
+        if _facebook_app_token['expires'] > time.time():
+            return _facebook_app_token['token']
+        response = get(config.FACEBOOK_GRAPH_URL + '/oauth/access_token',
+                       params={'client_id': config.FACEBOOK_CLIENT_ID,
+                               'client_secret': config.FACEBOOK_CLIENT_SECRET,
+                               'grant_type': 'client_credentials'})
+        response.raise_for_status()
+        # Older Graph API versions answer with a query string, newer with JSON.
+        try:
+            token = json.loads(response.text)['access_token']
+        except ValueError:
+            token = urlparse.parse_qs(response.text)['access_token'][0]
+        _facebook_app_token['token'] = token
+        _facebook_app_token['expires'] = \
+            time.time() + config.FACEBOOK_APP_TOKEN_TTL
+        return token
@@ -0,0 +1,157 @@
+"""id_token.py
+This module verifies Google ID tokens locally,
+    instead of asking Google's tokeninfo endpoint on every login.
+The signature is checked against Google's signing keys (JWKS),
+    which are cached and refreshed after a TTL or on an unknown key id.
+
+Classes:
+    InvalidIdToken: raised when a token is forged, expired or not for us
+    KeySetUnavailable: raised when the signing keys can not be loaded
+    KeySet: cached JSON web key set
+
+Attributes:
+    google_keys: KeySet of Google's signing keys
+
+Functions:
+    verify_id_token(token, audience, key_set=google_keys)
+
+created on 18/October/2026
+"""
+
+
+import base64
+import binascii
+import json
+import threading
+import time
+
+import requests
+import rsa
+
+from catalog_app.api import http_client
+from settings import config
+
+
+GOOGLE_ISSUERS = ('accounts.google.com', 'https://accounts.google.com')
+
+
+class InvalidIdToken(Exception):
+    """The ID token must be rejected."""
+
+
+class KeySetUnavailable(Exception):
+    """The signing keys could not be loaded, the token was not checked."""
+
+
+def _b64decode(data):
+    data = str(data)
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+
+def _b64int(data):
+    return int(binascii.hexlify(_b64decode(data)), 16)
+
+
+class KeySet(object):
+    """RSA public keys of a JWKS document, by key id.
+    Keys are reloaded when they are older than ttl seconds,
+        or when a token names an unknown key, at most every
+        min_refresh seconds so unknown key ids can not flood the provider.
+    uri is fetched over HTTP, or read from disk if it starts with file://
+    """
+
+    def __init__(self, uri, ttl, min_refresh):
+        self.uri = uri
+        self.ttl = ttl
+        self.min_refresh = min_refresh
+        self._keys = {}
+        self._loaded = 0
+        self._lock = threading.Lock()
+
+    def _load(self):
+        try:
+            if self.uri.startswith('file://'):
+                with open(self.uri[len('file://'):]) as f:
+                    document = json.load(f)
+            else:
+                document = http_client.get_json(self.uri)
+            keys = {}
+            for key in document['keys']:
+                if key.get('kty') != 'RSA':
+                    continue
+                keys[key['kid']] = rsa.PublicKey(_b64int(key['n']),
+                                                 _b64int(key['e']))
+        except (requests.RequestException, IOError, ValueError,
+                KeyError, TypeError) as e:
+            raise KeySetUnavailable(str(e))
+        self._keys = keys
+        self._loaded = time.time()
+
+    def get(self, kid):
+        """
+        :param kid: key id in the token header
+        :return: rsa.PublicKey, or None if there is no such key
+        """
+        age = time.time() - self._loaded
+        if age < self.ttl and (kid in self._keys or age < self.min_refresh):
+            return self._keys.get(kid)
+        with self._lock:
+            age = time.time() - self._loaded
+            if age >= self.ttl or \
+                    (kid not in self._keys and age >= self.min_refresh):
+                self._load()
+        return self._keys.get(kid)
+
+
+google_keys = KeySet(config.GOOGLE_JWKS_URI,
+                     ttl=config.GOOGLE_JWKS_TTL,
+                     min_refresh=config.GOOGLE_JWKS_MIN_REFRESH)
+
+
+def verify_id_token(token, audience, key_set=google_keys,
+                    issuers=GOOGLE_ISSUERS):
+    """
+    Verify the signature, audience, issuer and expiry of an ID token.
+    Raise InvalidIdToken if the token must be rejected,
+        KeySetUnavailable if it could not be checked.
+    :param token: encoded ID token
+    :param audience: our OAuth client id
+    :param key_set: KeySet of the issuer
+    :param issuers: accepted values of the iss claim
+    :return: claims of the token
+    """
+    try:
+        signing_input, signature = str(token).rsplit('.', 1)
+        header, payload = signing_input.split('.')
+        header = json.loads(_b64decode(header))
+        claims = json.loads(_b64decode(payload))
+        signature = _b64decode(signature)
+    except (ValueError, TypeError, UnicodeError):
+        raise InvalidIdToken("Malformed token")
+    if not isinstance(header, dict) or not isinstance(claims, dict):
+        raise InvalidIdToken("Malformed token")
+
+    if header.get('alg') != 'RS256':
+        raise InvalidIdToken("Unexpected algorithm")
+    key = key_set.get(header.get('kid'))
+    if key is None:
+        raise InvalidIdToken("Unknown signing key")
+    try:
+        rsa.verify(signing_input, signature, key)
+    except rsa.VerificationError:
+        raise InvalidIdToken("Invalid signature")
+
+    now = time.time()
+    leeway = config.ID_TOKEN_LEEWAY
+    if claims.get('aud') != audience:
+        raise InvalidIdToken("Token is not for this client")
+    if claims.get('iss') not in issuers:
+        raise InvalidIdToken("Unexpected issuer")
+    try:
+        if float(claims['exp']) + leeway < now:
+            raise InvalidIdToken("Token expired")
+        if float(claims.get('iat', 0)) - leeway > now:
+            raise InvalidIdToken("Token used before issued")
+    except (KeyError, TypeError, ValueError):
+        raise InvalidIdToken("Invalid time claims")
+    return claims
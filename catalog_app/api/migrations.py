@@ -0,0 +1,238 @@
+"""migrations.py
+This module contains versioned, forward-only schema migrations.
+The version applied last is recorded in the schema_version table.
+Run them with: python migrate.py upgrade
+
+Every migration runs in one transaction with its' schema_version row,
+    so a failed migration leaves nothing behind and can run again.
+pysqlite commits on its' own before DDL statements, so on SQLite
+    its' transaction handling is turned off during upgrade,
+    and the transaction is opened with an explicit BEGIN.
+Databases without transactional DDL, such as MySQL, keep the DDL
+    of a failed migration: it must be undone by hand before a rerun.
+
+Attributes:
+    MIGRATIONS: list of (version, description, function), in order
+
+Functions:
+    migration(version, description)
+    current_version(connection)
+    upgrade(engine, target=None)
+
+created on 18/October/2026
+"""
+
+
+import datetime
+
+from sqlalchemy import MetaData, Table, Column, ForeignKey, Index, \
+    Integer, String, DateTime, select
+
+
+MIGRATIONS = []
+
+_metadata = MetaData()
+
+schema_version = Table(
+    'schema_version', _metadata,
+    Column('version', Integer, primary_key=True),
+    Column('description', String),
+    Column('applied', DateTime(timezone=True))
+)
+
+
+def migration(version, description):
+    """
+    Register a migration function.
+    Every function takes an open connection, and runs in a transaction.
+    :param version: number of the schema version the function upgrades to
+    :param description:
+    """
+    def register(function):
+        if MIGRATIONS and MIGRATIONS[-1][0] >= version:
+            raise ValueError(
+                "Migration {} is out of order".format(version))
+        MIGRATIONS.append((version, description, function))
+        return function
+    return register
+
+
+def current_version(connection):
+    """
+    :param connection: database connection
+    :return: the latest applied version, 0 for an empty database
+    """
+    schema_version.create(connection, checkfirst=True)
+    version = connection.execute(
+        select([schema_version.c.version]).order_by(
+            schema_version.c.version.desc()).limit(1)).scalar()
+    return version or 0
+
+
+def upgrade(engine, target=None, log=None):
+    """
+    Apply every migration newer than the current version.
+    :param engine: database engine
+    :param target: version to stop at, the latest one if None
+    :param log: function called with a message for every migration
+    :return: the version of the database after upgrade
+    """
+    connection = engine.connect()
+    dbapi_connection = connection.connection.connection
+    sqlite = connection.dialect.name == 'sqlite'
+    if sqlite:
+        isolation_level = dbapi_connection.isolation_level
+        dbapi_connection.isolation_level = None
+    try:
+        version = current_version(connection)
+        for number, description, function in MIGRATIONS:
+            if number <= version:
+                continue
+            if target is not None and number > target:
+                break
+            if log:
+                log("Applying {}: {}".format(number, description))
+            transaction = connection.begin()
+            if sqlite:
+                connection.execute("BEGIN")
+            try:
+                function(connection)
+                connection.execute(schema_version.insert().values(
+                    version=number, description=description,
+                    applied=datetime.datetime.utcnow()))
+                transaction.commit()
+            except:
+                transaction.rollback()
+                raise
+            version = number
+        return version
+    finally:
+        if sqlite:
+            dbapi_connection.isolation_level = isolation_level
+        connection.close()
+
+
+@migration(1, "create user, category and item tables")
+def create_base_tables(connection):
+    # The tables as they were first created by Base.metadata.create_all.
+    # Databases created that way already have them, so check first.
+    metadata = MetaData()
+    Table('user', metadata,
+          Column('id', Integer, primary_key=True),
+          Column('email', String, nullable=False),
+          Column('password', String),
+          Column('salt', String),
+          Column('name', String),
+          Column('picture', String),
+          Column('created', DateTime(timezone=True)))
+    Table('category', metadata,
+          Column('id', Integer, primary_key=True),
+          Column('name', String, nullable=False),
+          Column('created', DateTime(timezone=True)))
+    Table('item', metadata,
+          Column('id', Integer, primary_key=True),
+          Column('title', String, nullable=False),
+          Column('description', String),
+          Column('price', String),
+          Column('category_id', Integer, ForeignKey('category.id')),
+          Column('user_id', Integer, ForeignKey('user.id')),
+          Column('created', DateTime(timezone=True)))
+    metadata.create_all(connection, checkfirst=True)
+
+
+@migration(2, "index item lookups and make user email unique")
+def add_lookup_indexes(connection):
+    metadata = MetaData()
+    item = Table('item', metadata,
+                 Column('id', Integer),
+                 Column('category_id', Integer),
+                 Column('user_id', Integer),
+                 Column('created', DateTime(timezone=True)))
+    user = Table('user', metadata,
+                 Column('email', String))
+    # Category.item_set, Item.get_recent and the owner of an item
+    Index('ix_item_category_id', item.c.category_id).create(connection)
+    Index('ix_item_created', item.c.created).create(connection)
+    Index('ix_item_user_id', item.c.user_id).create(connection)
+    # Keyset pagination of Category.item_page
+    Index('ix_item_category_created_id', item.c.category_id,
+          item.c.created, item.c.id).create(connection)
+    # User.get_by_email, an email belongs to one user
+    Index('ux_user_email', user.c.email, unique=True).create(connection)
+
+
+@migration(3, "add write counters of the catalog and categories")
+def add_catalog_version(connection):
+    metadata = MetaData()
+    catalog_version = Table(
+        'catalog_version', metadata,
+        Column('scope', String, primary_key=True),
+        Column('version', Integer, nullable=False),
+        Column('modified', DateTime(timezone=True)))
+    category = Table('category', metadata,
+                     Column('id', Integer))
+    catalog_version.create(connection)
+    # Categories written later get their row from a bump.
+    now = datetime.datetime.utcnow()
+    rows = [{'scope': 'catalog', 'version': 1, 'modified': now}]
+    rows.extend({'scope': 'category:{}'.format(c.id), 'version': 1,
+                 'modified': now}
+                for c in connection.execute(select([category.c.id])))
+    connection.execute(catalog_version.insert(), rows)
+
+
+# Titles weigh more than descriptions in the ranking of Item.search.
+_POSTGRES_SEARCH = [
+    "ALTER TABLE item ADD COLUMN search_vector tsvector",
+    """CREATE FUNCTION item_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('english',
+                                  coalesce(NEW.title, '')), 'A') ||
+            setweight(to_tsvector('english',
+                                  coalesce(NEW.description, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql""",
+    """CREATE TRIGGER item_search_vector_update
+    BEFORE INSERT OR UPDATE OF title, description ON item
+    FOR EACH ROW EXECUTE PROCEDURE item_search_vector_update()""",
+    # Fire the trigger once for the items already there.
+    "UPDATE item SET title = title",
+    "CREATE INDEX ix_item_search_vector ON item USING gin(search_vector)",
+]
+
+# External content FTS5 table, the text is only stored in item.
+_SQLITE_SEARCH = [
+    """CREATE VIRTUAL TABLE item_search USING fts5(
+        title, description, content='item', content_rowid='id')""",
+    """CREATE TRIGGER item_search_insert AFTER INSERT ON item BEGIN
+        INSERT INTO item_search(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END""",
+    """CREATE TRIGGER item_search_delete AFTER DELETE ON item BEGIN
+        INSERT INTO item_search(item_search, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END""",
+    """CREATE TRIGGER item_search_update
+    AFTER UPDATE OF title, description ON item BEGIN
+        INSERT INTO item_search(item_search, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO item_search(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END""",
+    "INSERT INTO item_search(item_search) VALUES ('rebuild')",
+]
+
+
+@migration(4, "index item titles and descriptions for full-text search")
+def add_item_search(connection):
+    # PostgreSQL keeps a tsvector column with a GIN index,
+    #     SQLite an FTS5 table, both in sync through triggers.
+    # Other databases have no index, Item.search scans the items there.
+    statements = {
+        'postgresql': _POSTGRES_SEARCH,
+        'sqlite': _SQLITE_SEARCH
+    }.get(connection.dialect.name, [])
+    for statement in statements:
+        connection.execute(statement)
@@ -7,17 +7,32 @@ Attributes:
     User: Class of user data table
     Category: Class of category data table
     Item: Class of item data table
+    UserRow: Class of an immutable copy of a user
+    CategoryRow: Class of an immutable cached category
+    CategoryCache: Class of the in-process category cache
+    category_cache: the category cache shared by every request
+    CatalogVersion: Class of write counters of the catalog and categories
 
 created on 13/June/2014
 """
 
 
 import datetime
+import re
+import threading
+import time
+from collections import namedtuple
 
-from sqlalchemy import asc, desc
-from sqlalchemy import Column, ForeignKey, Integer, String, DateTime
+from sqlalchemy import asc, desc, and_, or_, func, event, text
+from sqlalchemy import Column, ForeignKey, Index, Integer, String, DateTime
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, joinedload, object_session, \
+    Session
+
+from catalog_app.api.util import utc
+from catalog_app.routing import replica_may_lag
+from settings import config
 
 
 Base = declarative_base()
@@ -26,6 +41,10 @@ Base = declarative_base()
 class User(Base):
 
     __tablename__ = 'user'
+    # Indexes are created by migrations. See also: migrations.py
+    __table_args__ = (
+        Index('ux_user_email', 'email', unique=True),
+    )
 
     id = Column(Integer, primary_key=True)
     email = Column(String, nullable=False)
@@ -50,6 +69,18 @@ class User(Base):
             user = None
         return user
 
+    @classmethod
+    def get_row_by_id(cls, session, id):
+        """
+        :param session: accessible database session
+        :param id: user id
+        :return: a UserRow of the user id, or None
+        """
+        user = cls.get_by_id(session, id)
+        if user is None:
+            return None
+        return UserRow(user.id, user.name, user.email)
+
     @classmethod
     def get_by_email(cls, session, email):
         """
@@ -80,6 +111,12 @@ class User(Base):
             return False
 
 
+class UserRow(namedtuple('UserRow', ['id', 'name', 'email'])):
+    """Read only copy of a user row, safe to share between threads."""
+
+    __slots__ = ()
+
+
 class Category(Base):
 
     __tablename__ = 'category'
@@ -109,6 +146,33 @@ class Category(Base):
             categories = session.query(Category).all()
         return categories
 
+    @classmethod
+    def get_all_cached(cls, session, order_by='name'):
+        """
+        Categories rarely change, so they are served from category_cache.
+        :param session: accessible database session, used on a cache miss
+        :param order_by: 'name' or 'created'
+        :return: a tuple of CategoryRow
+        """
+        snapshot = category_cache.get(session)
+        if order_by == 'created':
+            return snapshot.by_created
+        return snapshot.by_name
+
+    @classmethod
+    def get_cached_by_id(cls, session, id):
+        """
+        :param session: accessible database session, used on a cache miss
+        :param id:
+        :return: a CategoryRow of the given category id, or None
+        """
+        row = category_cache.get(session).by_id.get(id)
+        if row is None and cls.get_by_id(session, id) is not None:
+            # Created by another process after the snapshot was taken.
+            category_cache.invalidate()
+            row = category_cache.get(session).by_id.get(id)
+        return row
+
     @classmethod
     def get_by_id(cls, session, id):
         """
@@ -138,6 +202,92 @@ class Category(Base):
             items = []
         return items
 
+    @classmethod
+    def item_page(cls, session, category_id, limit, after=None):
+        """
+        Keyset pagination of the items in a category, ordered by
+            (created, id). Every page costs one index backed query
+            no matter how deep it is.
+        :param session: accessible database session
+        :param category_id:
+        :param limit: the number of items in a page
+        :param after: (created, id) of the last item of the previous page,
+            None for the first page
+        :return: a list of items, (created, id) of the last item
+            if there is a next page or None,
+            and the number of items in the category
+        """
+        # The number of items comes back with the page in one round trip.
+        total = session.query(func.count(Item.id)).filter(
+            Item.category_id == category_id).as_scalar()
+        query = session.query(Item, total).filter(
+            Item.category_id == category_id)
+        if after is not None:
+            created, id = after
+            query = query.filter(or_(
+                Item.created > created,
+                and_(Item.created == created, Item.id > id)))
+        rows = query.order_by(
+            asc(Item.created), asc(Item.id)).limit(limit + 1).all()
+        if rows:
+            item_count = rows[0][1]
+        elif after is None:
+            item_count = 0
+        else:
+            # A page past the end has no row to carry the count.
+            item_count = cls.item_count(session, category_id)
+        items = [item for item, _ in rows]
+        if len(items) > limit:
+            items = items[:limit]
+            return items, (items[-1].created, items[-1].id), item_count
+        return items, None, item_count
+
+    @classmethod
+    def item_count(cls, session, category_id):
+        """
+        :param session: accessible database session
+        :param category_id:
+        :return: the number of items in the given category
+        """
+        return session.query(Item).filter(
+            Item.category_id == category_id).count()
+
+    @classmethod
+    def get_all_with_items(cls, session):
+        """
+        Load every category and every item with two queries,
+            instead of one item query per category.
+        :param session: accessible database session
+        :return: a list of (category, items) pairs ordered by category name
+        """
+        Category = cls
+        categories = session.query(Category).order_by(
+            asc(Category.name)).all()
+        items_by_category = {}
+        items = session.query(Item).filter(
+            Item.category_id != None).order_by(Item.category_id, Item.id)
+        for item in items:
+            items_by_category.setdefault(item.category_id, []).append(item)
+        return [(category, items_by_category.get(category.id, []))
+                for category in categories]
+
+    @property
+    def serialize(self):
+        """
+        :return: make a dictionary out of the attributes
+        """
+        return {
+            'id': self.id,
+            'name': self.name,
+            'created': self.created
+        }
+
+
+class CategoryRow(namedtuple('CategoryRow', ['id', 'name', 'created'])):
+    """Read only copy of a category row, safe to share between threads."""
+
+    __slots__ = ()
+
     @property
     def serialize(self):
         """
@@ -150,9 +300,114 @@ class Category(Base):
         }
 
 
+CategorySnapshot = namedtuple(
+    'CategorySnapshot',
+    ['version', 'expires', 'by_name', 'by_created', 'by_id'])
+
+
+class CategoryCache(object):
+    """In-process cache of all categories.
+    A snapshot is replaced, never modified, when it expires after ttl
+        seconds or when a category write bumps the version.
+    A hit costs an attribute read and a dict lookup.
+    A snapshot read from a replica which may lag is used once, not kept.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def get(self, session):
+        """
+        :param session: accessible database session, used on a miss
+        :return: the current CategorySnapshot
+        """
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == self.version \
+                and snapshot.expires > time.time():
+            self.hits += 1
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and snapshot.version == self.version \
+                    and snapshot.expires > time.time():
+                self.hits += 1
+                return snapshot
+            self.misses += 1
+            version = self.version
+            rows = tuple(
+                CategoryRow(c.id, c.name, c.created)
+                for c in session.query(Category).order_by(
+                    asc(Category.name), asc(Category.id)))
+            snapshot = CategorySnapshot(
+                version=version,
+                expires=time.time() + self.ttl,
+                by_name=rows,
+                by_created=tuple(sorted(
+                    rows, key=lambda c: (c.created, c.id))),
+                by_id=dict((c.id, c) for c in rows))
+            if not replica_may_lag():
+                self._snapshot = snapshot
+            return snapshot
+
+    def invalidate(self):
+        """Drop the current snapshot, the next get reloads it."""
+        self.version += 1
+
+    def stats(self):
+        """
+        :return: counters for monitoring
+        """
+        snapshot = self._snapshot
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'version': self.version,
+            'size': len(snapshot.by_id) if snapshot else 0
+        }
+
+
+category_cache = CategoryCache(ttl=config.CATEGORY_CACHE_TTL)
+
+
+def _category_written(mapper, connection, target):
+    # Invalidate once the write is committed,
+    #     so no other request can cache the old rows again.
+    session = object_session(target)
+    if session is not None:
+        session._category_written = True
+
+
+def _invalidate_categories(session):
+    if getattr(session, '_category_written', False):
+        session._category_written = False
+        category_cache.invalidate()
+
+
+def _forget_category_writes(session, previous_transaction):
+    session._category_written = False
+
+
+for _event in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(Category, _event, _category_written)
+event.listen(Session, 'after_commit', _invalidate_categories)
+event.listen(Session, 'after_soft_rollback', _forget_category_writes)
+
+
 class Item(Base):
 
     __tablename__ = 'item'
+    __table_args__ = (
+        Index('ix_item_category_id', 'category_id'),
+        Index('ix_item_created', 'created'),
+        Index('ix_item_user_id', 'user_id'),
+        Index('ix_item_category_created_id',
+              'category_id', 'created', 'id'),
+    )
 
     id = Column(Integer, primary_key=True)
     title = Column(String, nullable=False)
@@ -169,18 +424,116 @@ class Item(Base):
     created = Column(DateTime(timezone=True),
                      default=datetime.datetime.utcnow())
 
+    # Returned by get_category_id for an id without an item,
+    #     an item without a category gets None.
+    MISSING = object()
+
     @classmethod
     def get_recent(cls, session, limit=10):
         """
         :param session: accessible database session
         :param limit: the number of rows to retrieve
-        :return: most recent items by their 'created' column
+        :return: a list of most recent items by their 'created' column,
+            their categories are loaded in the same query
         """
         Item = cls
-        items = session.query(Item).order_by(
-            desc(Item.created), desc(Item.id)).limit(limit)
+        items = session.query(Item).options(
+            joinedload(Item.category)).order_by(
+            desc(Item.created), desc(Item.id)).limit(limit).all()
         return items
 
+    @classmethod
+    def iter_by_category(cls, session, batch_size=1000):
+        """
+        Stream every category and its items through a server side cursor.
+        Rows are fetched batch_size at a time,
+            so memory does not grow with the number of rows.
+        :param session: accessible database session
+        :param batch_size: the number of rows fetched per round trip
+        :return: an iterator of (category, item) pairs ordered by
+            category name, item is None for an empty category
+        """
+        Item = cls
+        rows = session.query(Category, Item).outerjoin(
+            Item, Item.category_id == Category.id).order_by(
+            asc(Category.name), Category.id, Item.id).execution_options(
+            stream_results=True).yield_per(batch_size)
+        return rows
+
+    @classmethod
+    def search(cls, session, query, limit, offset=0):
+        """
+        Full-text search of item titles and descriptions, best match first.
+        Matches are found through the index of migration 4:
+            a tsvector column with a GIN index on PostgreSQL,
+            the item_search FTS5 table on SQLite.
+        Only the ids of one page are ranked and read,
+            then their items are loaded with one more query.
+        :param session: accessible database session
+        :param query: text the user searched for
+        :param limit: the number of items of a page
+        :param offset: the number of better matches to skip
+        :return: a list of items of the page, their categories loaded,
+            and True if there are more matches after the page
+        """
+        Item = cls
+        terms = _search_terms(query)
+        if not terms:
+            return [], False
+        params = {'limit': limit + 1, 'offset': offset}
+        dialect = session.get_bind().dialect.name
+        if dialect == 'postgresql':
+            sql = _POSTGRES_SEARCH
+            params['query'] = ' '.join(terms)
+        elif dialect == 'sqlite':
+            sql = _SQLITE_SEARCH
+            # Quoted terms are never read as FTS5 operators.
+            params['query'] = ' '.join(
+                u'"{}"'.format(term) for term in terms)
+        else:
+            sql = _SCAN_SEARCH
+            params['query'] = u'%{}%'.format(' '.join(terms))
+        ids = [row[0] for row in session.execute(text(sql), params)]
+        more = len(ids) > limit
+        ids = ids[:limit]
+        if not ids:
+            return [], False
+        items = session.query(Item).options(
+            joinedload(Item.category)).filter(Item.id.in_(ids)).all()
+        position = dict((id, i) for i, id in enumerate(ids))
+        items.sort(key=lambda item: position[item.id])
+        return items, more
+
+    @classmethod
+    def get_by_ids(cls, session, ids):
+        """
+        Load many items and their categories with one IN query.
+        :param session: accessible database session
+        :param ids: item ids
+        :return: a dictionary of item id to item, missing ids are left out
+        """
+        Item = cls
+        ids = set(ids)
+        if not ids:
+            return {}
+        items = session.query(Item).options(
+            joinedload(Item.category)).filter(Item.id.in_(ids)).all()
+        return dict((item.id, item) for item in items)
+
+    @classmethod
+    def get_category_id(cls, session, id):
+        """
+        :param session: accessible database session
+        :param id:
+        :return: category id of the item, None if it has no category,
+            or Item.MISSING if there is no such item
+        """
+        Item = cls
+        row = session.query(Item.category_id).filter(Item.id == id).first()
+        if row is None:
+            return Item.MISSING
+        return row.category_id
+
     @classmethod
     def get_by_id(cls, session, id):
         """
@@ -209,3 +562,134 @@ class Item(Base):
             'user_id': self.user_id,
             'created': self.created
         }
+
+
+_SEARCH_TERM = re.compile(r'\w+', re.UNICODE)
+
+# Titles are weighted A on PostgreSQL, and 10 times descriptions on SQLite.
+_POSTGRES_SEARCH = """
+    SELECT id FROM item, plainto_tsquery('english', :query) query
+    WHERE search_vector @@ query
+    ORDER BY ts_rank(search_vector, query) DESC, id DESC
+    LIMIT :limit OFFSET :offset"""
+
+_SQLITE_SEARCH = """
+    SELECT rowid FROM item_search WHERE item_search MATCH :query
+    ORDER BY bm25(item_search, 10.0, 1.0), rowid DESC
+    LIMIT :limit OFFSET :offset"""
+
+_SCAN_SEARCH = """
+    SELECT id FROM item
+    WHERE lower(title) LIKE lower(:query)
+        OR lower(description) LIKE lower(:query)
+    ORDER BY id DESC
+    LIMIT :limit OFFSET :offset"""
+
+
+def _search_terms(query):
+    """
+    :param query: text the user searched for
+    :return: a list of the words in it, at most config.SEARCH_MAX_TERMS
+    """
+    if not query:
+        return []
+    return _SEARCH_TERM.findall(query)[:config.SEARCH_MAX_TERMS]
+
+
+class CatalogVersion(Base):
+    """Write counters of the whole catalog and of every category.
+    The JSON end-points derive ETag and Last-Modified from them,
+        so a conditional request is answered without reading any item.
+    Every write of an item or a category bumps them in its' transaction.
+    """
+
+    __tablename__ = 'catalog_version'
+
+    scope = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    modified = Column(DateTime(timezone=True))
+
+    CATALOG = 'catalog'
+
+    @staticmethod
+    def category_scope(category_id):
+        """
+        :param category_id:
+        :return: scope name of the category
+        """
+        return 'category:{}'.format(int(category_id))
+
+    @classmethod
+    def get(cls, session, scope):
+        """
+        :param session: accessible database session
+        :param scope: CatalogVersion.CATALOG or a category_scope
+        :return: (version, modified) of the scope,
+            (0, None) if it was never written
+        """
+        CatalogVersion = cls
+        row = session.query(CatalogVersion.version,
+                            CatalogVersion.modified).filter(
+            CatalogVersion.scope == scope).first()
+        if row is None:
+            return 0, None
+        return row.version, row.modified
+
+    @classmethod
+    def bump(cls, session, category_ids=()):
+        """
+        Count a write to the catalog and to the given categories.
+        :param session: accessible database session, of the write
+        :param category_ids: categories whose items were written
+        """
+        scopes = [cls.category_scope(c) for c in category_ids
+                  if c not in (None, '')]
+        _bump_scopes(session.connection(), [cls.CATALOG] + scopes)
+
+
+def _bump_scopes(connection, scopes):
+    now = datetime.datetime.now(utc)
+    # Sorted, so concurrent writers lock the rows in the same order.
+    for scope in sorted(set(scopes)):
+        if _update_scope(connection, scope, now) == 0:
+            _insert_scope(connection, scope, now)
+
+
+def _update_scope(connection, scope, now):
+    """
+    :return: the number of rows updated, 0 if the scope has no row
+    """
+    table = CatalogVersion.__table__
+    result = connection.execute(
+        table.update().where(table.c.scope == scope).values(
+            version=table.c.version + 1, modified=now))
+    return result.rowcount
+
+
+def _insert_scope(connection, scope, now):
+    """Create the row of a scope which is written for the first time.
+    Another transaction may create it meanwhile, then the UPDATE is
+        repeated on its row instead of failing the write.
+    On PostgreSQL the INSERT runs in a SAVEPOINT, as a failed statement
+        aborts the whole transaction. SQLite only undoes the statement,
+        and pysqlite would commit the transaction before a SAVEPOINT.
+    """
+    table = CatalogVersion.__table__
+    insert = table.insert().values(scope=scope, version=1, modified=now)
+    try:
+        if connection.dialect.name == 'sqlite':
+            connection.execute(insert)
+        else:
+            with connection.begin_nested():
+                connection.execute(insert)
+    except IntegrityError:
+        _update_scope(connection, scope, now)
+
+
+def _category_version_written(mapper, connection, target):
+    _bump_scopes(connection, [CatalogVersion.CATALOG,
+                              CatalogVersion.category_scope(target.id)])
+
+
+for _event in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(Category, _event, _category_version_written)
@@ -0,0 +1,278 @@
+"""mutations.py
+This module creates, updates and deletes many items of a user at once,
+    in one transaction. See also: POST /items/bulk.json
+Every operation is checked first, the ownership of all the items
+    they touch with one query, then they are applied with a few
+    batched statements: multi-row INSERTs, an UPDATE sent with
+    executemany for every set of changed fields, and DELETE ... IN.
+Modes:
+    atomic: nothing is applied if an operation is rejected
+    partial: the valid operations are applied, the others are reported
+
+Functions:
+    apply_mutations(session, operations, user_id, atomic=True, ...)
+
+created on 18/October/2026
+"""
+
+
+import datetime
+
+from sqlalchemy import bindparam
+
+from catalog_app.api.models import Category, Item, CatalogVersion
+from catalog_app.api.page_cache import invalidate_pages
+from catalog_app.api.util import utc
+from settings import config
+
+
+ACTIONS = ('create', 'update', 'delete')
+MODES = ('atomic', 'partial')
+# Fields an operation can set
+FIELDS = ('title', 'description', 'price', 'category_id')
+
+
+def _int(operation, key):
+    value = operation.get(key)
+    if isinstance(value, bool) or value is None:
+        raise ValueError("{} is required".format(key))
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError("{} must be a number".format(key))
+
+
+def _text(operation, key):
+    value = operation.get(key)
+    if value is None or isinstance(value, basestring):
+        return value
+    if isinstance(value, (int, long, float)) and not isinstance(value, bool):
+        return unicode(value)
+    raise ValueError("{} must be a string".format(key))
+
+
+def _changes(operation):
+    """
+    :return: dictionary of the fields the operation sets
+    """
+    changes = {}
+    for key in FIELDS:
+        if key not in operation:
+            continue
+        if key == 'category_id':
+            changes[key] = _int(operation, key)
+        else:
+            changes[key] = _text(operation, key)
+    if 'title' in changes and not changes['title']:
+        raise ValueError("title is required")
+    return changes
+
+
+def _parse(operations):
+    """
+    :return: a result and the parsed operation of every operation,
+        the parsed operation is None if it is rejected
+    """
+    results = []
+    parsed = []
+    seen = set()
+    for index, operation in enumerate(operations):
+        result = {'index': index}
+        results.append(result)
+        parsed.append(None)
+        if not isinstance(operation, dict):
+            result.update(status='rejected',
+                          message="An operation must be an object")
+            continue
+        action = result['op'] = operation.get('op')
+        try:
+            if action not in ACTIONS:
+                raise ValueError("op must be one of {}".format(
+                    ', '.join(ACTIONS)))
+            id = None
+            changes = {}
+            if action != 'create':
+                id = result['id'] = _int(operation, 'id')
+                if id in seen:
+                    raise ValueError("The item is changed by another "
+                                     "operation of the batch")
+                seen.add(id)
+            if action == 'create':
+                changes = _changes(operation)
+                if not changes.get('title'):
+                    raise ValueError("title is required")
+                if changes.get('category_id') is None:
+                    raise ValueError("category_id is required")
+            elif action == 'update':
+                changes = _changes(operation)
+                if not changes:
+                    raise ValueError("Nothing to update")
+        except ValueError as e:
+            result.update(status='rejected', message=str(e))
+            continue
+        parsed[index] = (action, id, changes)
+    return results, parsed
+
+
+def _check(session, user_id, results, parsed):
+    """Reject operations on items of other users, or missing ones,
+        and operations with missing categories.
+    :return: dictionary of item id to category id, of the items touched
+    """
+    item_ids = set(p[1] for p in parsed if p and p[1] is not None)
+    owners = {}
+    if item_ids:
+        # Ownership of every item with one query
+        for id, owner, category_id in session.query(
+                Item.id, Item.user_id, Item.category_id).filter(
+                Item.id.in_(item_ids)):
+            owners[id] = owner, category_id
+    category_ids = set(p[2]['category_id'] for p in parsed
+                       if p and 'category_id' in p[2])
+    existing = set()
+    if category_ids:
+        existing = set(id for (id,) in session.query(Category.id).filter(
+            Category.id.in_(category_ids)))
+
+    for index, operation in enumerate(parsed):
+        if operation is None:
+            continue
+        action, id, changes = operation
+        message = None
+        if id is not None and id not in owners:
+            message = "Item not found"
+        elif id is not None and owners[id][0] != user_id:
+            message = "You are not authorized"
+        elif 'category_id' in changes and \
+                changes['category_id'] not in existing:
+            message = "Category not found"
+        if message:
+            results[index].update(status='rejected', message=message)
+            parsed[index] = None
+    return dict((id, category_id)
+                for id, (owner, category_id) in owners.items())
+
+
+def _insert_items(connection, rows, batch_size):
+    """
+    Insert rows with multi-row INSERTs.
+    :return: ids of the new rows, in the same order
+    """
+    table = Item.__table__
+    dialect = connection.dialect.name
+    ids = []
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        if dialect == 'postgresql':
+            # Rows are returned in the order of VALUES.
+            result = connection.execute(
+                table.insert().values(batch).returning(table.c.id))
+            ids.extend(id for (id,) in result)
+        elif dialect == 'sqlite':
+            # SQLite has one writer, one statement gets consecutive ids.
+            last = connection.execute(table.insert().values(batch)).lastrowid
+            ids.extend(range(last - len(batch) + 1, last + 1))
+        else:
+            for row in batch:
+                ids.append(connection.execute(
+                    table.insert(), row).inserted_primary_key[0])
+    return ids
+
+
+def _update_items(connection, updates, batch_size):
+    """
+    :param updates: a list of (id, changes)
+    """
+    table = Item.__table__
+    groups = {}
+    for id, changes in updates:
+        row = dict(changes, _id=id)
+        groups.setdefault(tuple(sorted(changes)), []).append(row)
+    # The SET clause is made of the keys of the rows.
+    statement = table.update().where(table.c.id == bindparam('_id'))
+    for rows in groups.values():
+        for start in range(0, len(rows), batch_size):
+            connection.execute(statement, rows[start:start + batch_size])
+
+
+def _delete_items(connection, ids, batch_size):
+    table = Item.__table__
+    for start in range(0, len(ids), batch_size):
+        connection.execute(table.delete().where(
+            table.c.id.in_(ids[start:start + batch_size])))
+
+
+def apply_mutations(session, operations, user_id, atomic=True,
+                    batch_size=None):
+    """
+    Apply operations on the items of a user, and commit them.
+    An operation is a dictionary:
+        {"op": "create", "title": ..., "description": ...,
+            "price": ..., "category_id": ...}
+        {"op": "update", "id": item id, and the fields to change}
+        {"op": "delete", "id": item id}
+    An item can only be changed by one operation of a call.
+    :param session: accessible database session
+    :param operations: a list of operations
+    :param user_id: the user applying them, owner of the new items
+    :param atomic: apply nothing if an operation is rejected
+    :param batch_size: rows written per statement,
+        config.BULK_MUTATION_BATCH_SIZE if None
+    :return: a result of every operation, in the same order:
+        {"index": ..., "op": ..., "id": ..., "status": created, updated,
+            deleted, rejected with a "message",
+            or skipped when an atomic call is rejected}
+        and the number of operations applied
+    """
+    batch_size = batch_size or config.BULK_MUTATION_BATCH_SIZE
+    results, parsed = _parse(operations)
+    categories = _check(session, user_id, results, parsed)
+    rejected = any(p is None for p in parsed)
+    if not any(parsed) or (atomic and rejected):
+        for result in results:
+            result.setdefault('status', 'skipped')
+        return results, 0
+
+    now = datetime.datetime.now(utc)
+    creates, updates, deletes = [], [], []
+    changed = set()
+    for index, operation in enumerate(parsed):
+        if operation is None:
+            continue
+        action, id, changes = operation
+        if action == 'create':
+            row = dict(title=None, description=None, price=None)
+            row.update(changes, user_id=user_id, created=now)
+            creates.append((index, row))
+        elif action == 'update':
+            updates.append((id, changes))
+        else:
+            deletes.append(id)
+        if id is not None:
+            changed.add(categories[id])
+        if 'category_id' in changes:
+            changed.add(changes['category_id'])
+
+    try:
+        # Bumped first: on SQLite it takes the write lock for the inserts.
+        CatalogVersion.bump(session, category_ids=sorted(changed))
+        connection = session.connection()
+        _delete_items(connection, deletes, batch_size)
+        _update_items(connection, updates, batch_size)
+        ids = _insert_items(connection, [row for i, row in creates],
+                            batch_size)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+
+    for (index, row), id in zip(creates, ids):
+        results[index].update(id=id, status='created')
+    for index, operation in enumerate(parsed):
+        if operation and operation[0] != 'create':
+            results[index]['status'] = operation[0] + 'd'
+    tags = ['main'] + ['category:{}'.format(c) for c in changed] + \
+        ['item:{}'.format(id) for id, changes in updates] + \
+        ['item:{}'.format(id) for id in deletes]
+    invalidate_pages(*tags)
+    return results, len(creates) + len(updates) + len(deletes)
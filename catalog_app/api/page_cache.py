@@ -0,0 +1,176 @@
+"""page_cache.py
+This module caches rendered HTML pages,
+    so most page views are served without a query or a template render.
+A page is cached per route, arguments, query string,
+    and whether the visitor is logged in.
+Writes invalidate exactly the pages they change by tag,
+    other processes see them after PAGE_CACHE_TTL seconds.
+A client which wrote lately is never served from the cache,
+    and pages read from a replica which may lag are not cached.
+    See also: catalog_app/routing.py
+
+Classes:
+    PageCache: LRU of rendered pages bounded by their total size
+
+Attributes:
+    page_cache: PageCache shared by every request
+
+Functions:
+    cached_page(*tags)
+    invalidate_pages(*tags)
+
+created on 18/October/2026
+"""
+
+
+import functools
+import threading
+import time
+from collections import OrderedDict
+
+from flask import request, g, session as flask_session
+
+from catalog_app.api.models import category_cache
+from catalog_app.routing import sticky_request, replica_may_lag
+from settings import config
+
+
+class PageCache(object):
+    """Least recently used cache of rendered pages.
+    The oldest pages are evicted when the bodies exceed max_bytes.
+    Every page has tags, invalidate(tag) drops all pages with the tag.
+    generation counts the invalidations, a page rendered before one
+        is not stored, as it may show the data the write changed.
+    """
+
+    def __init__(self, max_bytes, ttl):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0
+        self._pages = OrderedDict()
+        self._tags = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        :param key:
+        :return: cached body, or None
+        """
+        with self._lock:
+            page = self._pages.pop(key, None)
+            if page is None or page[2] <= time.time():
+                if page is not None:
+                    self._forget(key, page)
+                self.misses += 1
+                return None
+            self._pages[key] = page
+            self.hits += 1
+            return page[0]
+
+    def set(self, key, body, tags, generation=None):
+        """
+        :param key:
+        :param body: rendered page
+        :param tags: names of the data the page shows
+        :param generation: self.generation before the page was rendered,
+            the page is dropped if pages were invalidated since
+        """
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            page = self._pages.pop(key, None)
+            if page is not None:
+                self._forget(key, page)
+            self._pages[key] = (body, tags, time.time() + self.ttl)
+            self.size += len(body)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while self.size > self.max_bytes:
+                old_key, old_page = self._pages.popitem(last=False)
+                self._forget(old_key, old_page)
+
+    def invalidate(self, *tags):
+        """Drop every page with one of the tags."""
+        with self._lock:
+            self.generation += 1
+            for tag in tags:
+                for key in self._tags.pop(tag, ()):
+                    page = self._pages.pop(key, None)
+                    if page is not None:
+                        self._forget(key, page)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._pages.clear()
+            self._tags.clear()
+            self.size = 0
+
+    def _forget(self, key, page):
+        # The page is already out of self._pages.
+        self.size -= len(page[0])
+        for tag in page[1]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def stats(self):
+        """
+        :return: counters for monitoring
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'pages': len(self._pages),
+            'bytes': self.size
+        }
+
+
+page_cache = PageCache(config.PAGE_CACHE_MAX_BYTES, config.PAGE_CACHE_TTL)
+
+
+def cached_page(*tags):
+    """
+    Decorator caching the rendered page of a view.
+    A tag can use the view arguments: 'category:{category_id}'
+    The view must run after basic.authenticate, which sets g.user_data.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(**kwargs):
+            # A pending flash message is rendered once, never cached.
+            # A client which wrote lately must see its' write.
+            if not config.PAGE_CACHE_ENABLED or \
+                    '_flashes' in flask_session or sticky_request():
+                return view(**kwargs)
+            # Pages list the categories, a category write changes them all.
+            key = (request.endpoint, tuple(sorted(kwargs.items())),
+                   request.query_string, bool(g.user_data),
+                   category_cache.version)
+            body = page_cache.get(key)
+            if body is not None:
+                return body
+            # Read before the view, a write while it renders is not lost.
+            generation = page_cache.generation
+            body = view(**kwargs)
+            if isinstance(body, basestring) and \
+                    '_flashes' not in flask_session and \
+                    not replica_may_lag():
+                page_cache.set(key, body,
+                               [tag.format(**kwargs) for tag in tags],
+                               generation)
+            return body
+        return wrapper
+    return decorator
+
+
+def invalidate_pages(*tags):
+    """Drop the cached pages of data changed by a write."""
+    page_cache.invalidate(*tags)
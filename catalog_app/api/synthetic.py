@@ -0,0 +1,191 @@
+"""synthetic.py
+This module generates synthetic users, categories and items
+    for load and capacity testing, written with bulk inserts.
+The same seed and options generate the same rows.
+See also: generate_catalog.py, catalog_app/api/bulk.py
+
+Functions:
+    category_sampler(category_ids, distribution, exponent, rng)
+    description_lengths(distribution, mean, maximum, rng)
+    generate_catalog(session, users, categories, items, ...)
+
+created on 18/October/2026
+"""
+
+
+import bisect
+import datetime
+import math
+import random
+import time
+
+from catalog_app.api.bulk import write_rows, reset_sequence
+from catalog_app.api.models import User, Category, Item, CatalogVersion, \
+    category_cache
+from catalog_app.api.page_cache import page_cache
+from catalog_app.api.util import encrypt_password, utc
+from settings import config
+
+
+DISTRIBUTIONS = ('uniform', 'zipf')
+LENGTH_DISTRIBUTIONS = ('fixed', 'uniform', 'lognormal')
+
+_SYLLABLES = ('ka', 'lo', 'mi', 'ne', 'ru', 'ta', 'vi', 'so', 'pe', 'da',
+              'gri', 'bel', 'tor', 'shan', 'qua', 'zen', 'fal', 'mor')
+
+
+def category_sampler(category_ids, distribution, exponent, rng):
+    """
+    :param category_ids: a list of category ids
+    :param distribution: 'uniform', or 'zipf':
+        the n-th largest category gets a share of items
+        proportional to 1 / n ** exponent
+    :param exponent: exponent of the zipf distribution
+    :param rng: random.Random
+    :return: a function returning the category id of the next item
+    """
+    if distribution == 'uniform':
+        return lambda: rng.choice(category_ids)
+    ranked = list(category_ids)
+    # Which category is the largest one is random too.
+    rng.shuffle(ranked)
+    cumulative = []
+    total = 0.0
+    for rank in range(1, len(ranked) + 1):
+        total += 1.0 / rank ** exponent
+        cumulative.append(total)
+    return lambda: ranked[bisect.bisect(cumulative, rng.random() * total)]
+
+
+def description_lengths(distribution, mean, maximum, rng):
+    """
+    :param distribution: 'fixed', 'uniform' between 0 and 2 * mean,
+        or 'lognormal' with a long tail of long descriptions
+    :param mean: mean number of characters
+    :param maximum: longest description
+    :param rng: random.Random
+    :return: a function returning the length of the next description
+    """
+    if distribution == 'fixed':
+        return lambda: min(mean, maximum)
+    if distribution == 'uniform':
+        return lambda: min(rng.randint(0, 2 * mean), maximum)
+    sigma = 1.0
+    mu = math.log(max(mean, 1)) - sigma ** 2 / 2
+    return lambda: min(int(rng.lognormvariate(mu, sigma)), maximum)
+
+
+def _words(rng, count):
+    words = set()
+    while len(words) < count:
+        words.add(''.join(rng.choice(_SYLLABLES)
+                          for i in range(rng.randint(1, 4))))
+    return sorted(words)
+
+
+def _corpus(words, size, rng):
+    # Descriptions are slices of one long text,
+    #     much faster than picking words for every item.
+    return ' '.join(rng.choice(words) for i in range(size // 5))
+
+
+def _write_batches(session, table, rows, batch_size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            write_rows(session, table, batch)
+            batch = []
+    write_rows(session, table, batch)
+
+
+def generate_catalog(session, users, categories, items,
+                     distribution='zipf', exponent=1.1,
+                     length_distribution='lognormal', description_mean=200,
+                     description_max=5000, days=365, end=None, seed=0,
+                     password='password', batch_size=None, log=None):
+    """
+    Add synthetic rows and commit them in one transaction.
+    Users and categories get ids after the largest existing ones,
+        users are named synthetic<id>@example.com.
+    :param session: accessible database session
+    :param users: number of users, all of them with the same password
+    :param categories: number of categories
+    :param items: number of items
+    :param distribution: items per category, see category_sampler
+    :param exponent: exponent of the zipf distribution
+    :param length_distribution: see description_lengths
+    :param description_mean: mean length of descriptions
+    :param description_max: longest description
+    :param days: items are created in the days before end
+    :param end: latest created time, midnight UTC today if None
+    :param seed: seed of the random generator
+    :param password: password of every user, hashed once
+    :param batch_size: rows written per statement,
+        config.BULK_IMPORT_BATCH_SIZE if None
+    :param log: function called with a progress message
+    :return: number of rows written, and seconds it took
+    """
+    started = time.time()
+    rng = random.Random(seed)
+    batch_size = batch_size or config.BULK_IMPORT_BATCH_SIZE
+    log = log or (lambda message: None)
+    if end is None:
+        end = datetime.datetime.now(utc).replace(
+            hour=0, minute=0, second=0, microsecond=0)
+    span = days * 24 * 60 * 60
+
+    def created():
+        return end - datetime.timedelta(seconds=rng.random() * span)
+
+    first_user = (session.query(User.id).order_by(
+        User.id.desc()).limit(1).scalar() or 0) + 1
+    first_category = (session.query(Category.id).order_by(
+        Category.id.desc()).limit(1).scalar() or 0) + 1
+
+    encrypted, salt = encrypt_password(password)
+    user_ids = range(first_user, first_user + users)
+    _write_batches(session, User.__table__, (
+        {'id': id, 'name': 'synthetic{}'.format(id),
+         'email': 'synthetic{}@example.com'.format(id),
+         'password': encrypted, 'salt': salt, 'picture': None,
+         'created': created()}
+        for id in user_ids), batch_size)
+    category_ids = range(first_category, first_category + categories)
+    _write_batches(session, Category.__table__, (
+        {'id': id, 'name': 'category{}'.format(id), 'created': created()}
+        for id in category_ids), batch_size)
+    reset_sequence(session, User.__table__)
+    reset_sequence(session, Category.__table__)
+    log("{} users and {} categories written".format(users, categories))
+
+    words = _words(rng, 2000)
+    corpus = _corpus(words, max(1024 * 1024, 2 * description_max), rng)
+    next_category = category_sampler(category_ids, distribution, exponent,
+                                     rng)
+    next_length = description_lengths(length_distribution,
+                                      description_mean, description_max, rng)
+    written = 0
+    while written < items and user_ids and category_ids:
+        rows = []
+        for i in range(min(batch_size, items - written)):
+            length = next_length()
+            start = rng.randrange(len(corpus) - length)
+            rows.append({
+                'title': '{} {} {}'.format(rng.choice(words).capitalize(),
+                                           rng.choice(words), written + i),
+                'description': corpus[start:start + length],
+                'price': '{:.2f}'.format(rng.random() * 1000),
+                'category_id': next_category(),
+                'user_id': rng.choice(user_ids),
+                'created': created()
+            })
+        write_rows(session, Item.__table__, rows)
+        written += len(rows)
+        log("{} items written".format(written))
+
+    CatalogVersion.bump(session, category_ids=category_ids)
+    session.commit()
+    category_cache.invalidate()
+    page_cache.clear()
+    return users + categories + written, time.time() - started
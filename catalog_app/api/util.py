@@ -1,36 +1,171 @@
 """util.py
 This module contains helper functions.
 
+Classes:
+    HashingPool: bounded pool of workers which hash passwords
+    HashingPoolBusy: raised when the hashing pool queue is full
+    LRUCache: thread safe least recently used cache
+
+Attributes:
+    hash_pool: HashingPool used by encrypt_password and check_password
+    verified_tokens: LRUCache of tokens which passed validate_token
+
 Functions:
     encrypt_password(password)
     check_password(password, encrypted_password, salt)
+    password_needs_rehash(encrypted_password)
     generate_token(user)
     validate_token(token, expire_time)
+    authenticate_token(token, expire_time, load_user)
+    encode_cursor(created, id)
+    decode_cursor(cursor)
 
 created on 13/June/2014
 """
 
 
+import os
 import string
 import random
+import threading
 import time
 import uuid
+import base64
+import binascii
+import datetime
 import hashlib
+import hmac
+import multiprocessing
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
+
 import jwt
 
 import settings.config
 
 
+class HashingPoolBusy(Exception):
+    """Too many passwords are waiting to be hashed."""
+
+
+class HashingPool(object):
+    """Bounded pool of threads or processes which hash passwords.
+    A slow key derivation function runs here instead of
+        the request thread, at most workers at a time.
+    When queue_limit more are waiting, HashingPoolBusy is raised
+        at once, so a login storm fails fast instead of piling up.
+    The caller still waits for the hash. Only the production server,
+        which runs WSGI calls on threads, keeps its' IOLoop free meanwhile.
+        The development server runs them on the IOLoop, so a login
+        stalls it as before. See also: catalog_app/server.py
+    """
+
+    def __init__(self, workers, queue_limit, processes=False, timeout=30):
+        self.workers = workers
+        self.processes = processes
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(workers + queue_limit)
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        # Created on first use in every process:
+        #     the threads of a pool made before a fork do not run in the child.
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    if self.processes:
+                        self._pool = multiprocessing.Pool(self.workers)
+                    else:
+                        self._pool = ThreadPool(self.workers)
+                    self._pid = os.getpid()
+        return self._pool
+
+    def run(self, function, *args):
+        """
+        Run function(*args) on the pool and wait for the result.
+        The slot is released when the function returns, not when the
+            caller stops waiting, so a timed out hash still counts.
+        :return: return value of the function
+        """
+        if not self._slots.acquire(False):
+            raise HashingPoolBusy()
+        try:
+            result = self._get_pool().apply_async(
+                _call, (function,) + args,
+                callback=lambda outcome: self._slots.release())
+        except:
+            self._slots.release()
+            raise
+        try:
+            succeeded, value = result.get(self.timeout)
+        except multiprocessing.TimeoutError:
+            raise HashingPoolBusy()
+        if not succeeded:
+            raise value
+        return value
+
+
+def _call(function, *args):
+    # Runs on the pool. It never raises, so the callback which
+    #     releases the slot is called after errors too.
+    try:
+        return True, function(*args)
+    except Exception as e:
+        return False, e
+
+
+hash_pool = HashingPool(settings.config.PASSWORD_POOL_WORKERS,
+                        settings.config.PASSWORD_POOL_QUEUE,
+                        processes=settings.config.PASSWORD_POOL_PROCESSES,
+                        timeout=settings.config.PASSWORD_HASH_TIMEOUT)
+
+
+def _sha256(password, salt):
+    # Hash of passwords stored before key derivation was introduced.
+    return hashlib.sha256(password + salt).hexdigest()
+
+
+def _pbkdf2_sha256(password, salt, iterations):
+    return binascii.hexlify(
+        hashlib.pbkdf2_hmac('sha256', password, salt, iterations))
+
+
+def _scrypt(password, salt, n, r, p):
+    return binascii.hexlify(
+        hashlib.scrypt(password, salt=salt, n=n, r=r, p=p))
+
+
+def _hasher_parameters():
+    """
+    :return: name and parameters of the configured hasher
+    """
+    config = settings.config
+    if config.PASSWORD_HASHER == 'scrypt' and hasattr(hashlib, 'scrypt'):
+        return 'scrypt', [config.PASSWORD_SCRYPT_N, config.PASSWORD_SCRYPT_R,
+                          config.PASSWORD_SCRYPT_P]
+    return 'pbkdf2_sha256', [config.PASSWORD_PBKDF2_ITERATIONS]
+
+
 def encrypt_password(password):
     """
     Get plain password
     Return encrypted password and salt
+    The encrypted password stores the hasher and its' parameters:
+        pbkdf2_sha256$iterations$salt$hash
+        scrypt$n$r$p$salt$hash
+    Raise HashingPoolBusy if too many passwords are being hashed.
     :param password:
     :return encrypted_password, salt:
     """
     salt = uuid.uuid4().hex
-    encrypted_password = hashlib.sha256(password.encode('utf-8') + salt)\
-        .hexdigest()
+    name, parameters = _hasher_parameters()
+    function = _scrypt if name == 'scrypt' else _pbkdf2_sha256
+    digest = hash_pool.run(function, password.encode('utf-8'), salt,
+                           *parameters)
+    encrypted_password = '$'.join(
+        [name] + [str(p) for p in parameters] + [salt, digest])
     return encrypted_password, salt
 
 
@@ -38,13 +173,43 @@ def check_password(password, encrypted_password, salt):
     """
     Get user inputted password
     Return True/False whether the password is valid or not
+    Raise HashingPoolBusy if too many passwords are being hashed.
     :param password:
     :param encrypted_password:
-    :param salt:
+    :param salt: salt column, used by legacy SHA-256 passwords
     :return:
     """
-    return encrypted_password ==\
-        hashlib.sha256(password.encode('utf-8') + salt).hexdigest()
+    password = password.encode('utf-8')
+    fields = str(encrypted_password).split('$')
+    try:
+        if len(fields) == 1:
+            digest = _sha256(password, str(salt))
+        elif fields[0] == 'pbkdf2_sha256' and len(fields) == 4:
+            digest = hash_pool.run(_pbkdf2_sha256, password, fields[2],
+                                   int(fields[1]))
+        elif fields[0] == 'scrypt' and len(fields) == 6 \
+                and hasattr(hashlib, 'scrypt'):
+            digest = hash_pool.run(_scrypt, password, fields[4],
+                                   int(fields[1]), int(fields[2]),
+                                   int(fields[3]))
+        else:
+            return False
+    except ValueError:
+        return False
+    return hmac.compare_digest(digest, fields[-1])
+
+
+def password_needs_rehash(encrypted_password):
+    """
+    Get encrypted password
+    Return True if it was not made with the configured hasher
+        and parameters, e.g. a legacy SHA-256 password.
+    :param encrypted_password:
+    :return:
+    """
+    name, parameters = _hasher_parameters()
+    fields = str(encrypted_password).split('$')
+    return fields[0] != name or fields[1:-2] != [str(p) for p in parameters]
 
 
 def generate_token(user):
@@ -93,7 +258,146 @@ def validate_token(token, expire_time):
         return False
 
 
+class LRUCache(object):
+    """Thread safe least recently used cache.
+    Entries can expire at a given time,
+        the oldest entry is evicted when the cache is full.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        :param key:
+        :param default: returned if the key is missing or expired
+        :return: the cached value
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return default
+            value, expires = entry
+            if expires is not None and expires <= time.time():
+                return default
+            # Move the entry to the most recently used end.
+            self._entries[key] = entry
+            return value
+
+    def set(self, key, value, expires=None):
+        """
+        :param key:
+        :param value:
+        :param expires: unix time the entry expires at, never if None
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (value, expires)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+verified_tokens = LRUCache(settings.config.TOKEN_CACHE_SIZE)
+
+
+def authenticate_token(token, expire_time, load_user):
+    """
+    Validate a JSON web token and find its' user,
+        the result is remembered until the token expires.
+    A token seen before skips both the signature check and the user query.
+    :param token:
+    :param expire_time:
+    :param load_user: function which gets a user id,
+        returns the user or None
+    :return: (user data in the token, user), or (False, None)
+    """
+    if not token:
+        return False, None
+    try:
+        if int(time.time()) > int(expire_time):
+            # token expired
+            return False, None
+    except (TypeError, ValueError):
+        return False, None
+    # Only a digest of the token is kept in memory.
+    key = hashlib.sha256(token.encode('utf-8')).hexdigest()
+    entry = verified_tokens.get(key)
+    if entry is not None:
+        return entry
+    user_data = validate_token(token, expire_time)
+    if not user_data:
+        return False, None
+    user = load_user(user_data.get("id"))
+    if user is None:
+        return False, None
+    entry = (user_data, user)
+    verified_tokens.set(key, entry, expires=user_data.get("exp"))
+    return entry
+
+
 def generate_csrf_token():
     token = ''.join(random.choice(string.ascii_uppercase +
                                   string.digits) for x in xrange(32))
     return token
+
+
+class UTC(datetime.tzinfo):
+    """UTC time zone, Python 2 has no built-in one."""
+
+    def utcoffset(self, dt):
+        return datetime.timedelta(0)
+
+    def tzname(self, dt):
+        return "UTC"
+
+    def dst(self, dt):
+        return datetime.timedelta(0)
+
+utc = UTC()
+
+CURSOR_TIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+
+
+def encode_cursor(created, id):
+    """
+    Make an opaque pagination cursor pointing after the given row.
+    :param created: created column of the last row of a page
+    :param id: id of the last row of a page
+    :return: url safe cursor string
+    """
+    if created.tzinfo is not None:
+        created = created.astimezone(utc).replace(tzinfo=None)
+    raw = '{}|{}'.format(created.strftime(CURSOR_TIME_FORMAT), int(id))
+    return base64.urlsafe_b64encode(raw).rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Get a cursor made by encode_cursor,
+    Return None if the cursor is not valid,
+        or (created, id) of the row it points after.
+    :param cursor:
+    :return:
+    """
+    try:
+        raw = base64.urlsafe_b64decode(
+            str(cursor) + '=' * (-len(cursor) % 4))
+        created, id = raw.split('|')
+        created = datetime.datetime.strptime(created, CURSOR_TIME_FORMAT)
+        return created.replace(tzinfo=utc), int(id)
+    except (TypeError, ValueError, UnicodeError):
+        return None
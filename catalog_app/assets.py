@@ -0,0 +1,273 @@
+"""assets.py
+This module builds the static assets of the pages, and finds them.
+build() joins the files of every bundle, minifies JavaScript and CSS,
+    and writes the result to dist/ under a name containing the hash
+    of its' content, listed in dist/manifest.json.
+    A changed file gets a new name, so the hashed files are cached
+    by browsers for a year, without ever being revalidated.
+Templates get the URLs of assets with asset_url(name) and asset_urls(name),
+    which fall back to the source files when nothing was built.
+See also: build_assets.py
+
+Minifiers, in requirements.txt:
+    rjsmin for JavaScript, files are only joined without it
+    rcssmin for CSS, comments and whitespace are removed without it
+
+Attributes:
+    BUNDLES: logical name of every asset, and its' source files
+
+Functions:
+    minify_css(css)
+    minify_js(js)
+    rebase_css_urls(css, source, target)
+    build(folder, bundles=BUNDLES, clean=False, log=None)
+    asset_url(name)
+    asset_urls(name)
+    init_app(app)
+
+created on 18/October/2026
+"""
+
+
+import hashlib
+import json
+import os
+import posixpath
+import re
+import threading
+import time
+
+from flask import request, url_for, current_app
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None
+
+
+# Paths are relative to the static folder.
+BUNDLES = {
+    'app.css': ['components/bootstrap/dist/css/bootstrap.min.css',
+                'components/font-awesome/css/font-awesome.min.css',
+                'style.css'],
+    'app.js': ['components/jquery/dist/jquery.min.js',
+               'components/bootstrap/dist/js/bootstrap.min.js',
+               'auth.js'],
+    'controller.js': ['controller.js'],
+    'google_oauth.js': ['google_oauth.js'],
+    'favicon.ico': ['favicon.ico'],
+}
+DIST = 'dist'
+MANIFEST = DIST + '/manifest.json'
+HASH_LENGTH = 10
+# Hashed files never change, they can be cached for good.
+IMMUTABLE = 'public, max-age=31536000, immutable'
+_HASHED = re.compile(r'^' + DIST + r'/.+\.[0-9a-f]{' + str(HASH_LENGTH) +
+                     r'}(\.[^./]+)?$')
+
+_CSS_TOKEN = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')'
+                        r'|(/\*[\s\S]*?\*/)|(\s+)')
+_CSS_PUNCTUATION = re.compile(r'\s*([{};,])\s*')
+_CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+
+
+def minify_css(css):
+    """
+    :param css: a style sheet
+    :return: the style sheet without comments and extra whitespace,
+        /*! comments */ are kept
+    """
+    if rcssmin is not None:
+        return rcssmin.cssmin(css, keep_bang_comments=True)
+
+    def replace(match):
+        string, comment, space = match.groups()
+        if string:
+            return string
+        if comment:
+            return comment if comment.startswith('/*!') else ''
+        return ' '
+    parts = []
+    # Punctuation is only trimmed between strings.
+    for i, part in enumerate(re.split(r'("(?:\\.|[^"\\])*"'
+                                      r'|\'(?:\\.|[^\'\\])*\')',
+                                      _CSS_TOKEN.sub(replace, css))):
+        parts.append(part if i % 2 else _CSS_PUNCTUATION.sub(r'\1', part))
+    return ''.join(parts).strip()
+
+
+def minify_js(js):
+    """
+    :param js: a script
+    :return: the script minified by rjsmin, or as it is without rjsmin
+    """
+    if rjsmin is not None:
+        return rjsmin.jsmin(js, keep_bang_comments=True)
+    return js
+
+
+def rebase_css_urls(css, source, target):
+    """
+    Rewrite the relative url() of a style sheet moved to another folder.
+    :param css: a style sheet
+    :param source: folder of the style sheet, relative to the static folder
+    :param target: folder it is moved to
+    :return: the style sheet with url() relative to target
+    """
+    def replace(match):
+        url = match.group(2).strip()
+        if url.startswith(('data:', '/', '#')) or ':' in url.split('/')[0]:
+            return match.group(0)
+        path, suffix = re.match(r'([^?#]*)(.*)', url).groups()
+        path = posixpath.relpath(posixpath.normpath(
+            posixpath.join(source, path)), target)
+        return 'url("{}{}")'.format(path, suffix)
+    return _CSS_URL.sub(replace, css)
+
+
+def _bundle(folder, name, sources):
+    """
+    :return: content of the asset name, joined from its' sources
+    """
+    extension = os.path.splitext(name)[1]
+    parts = []
+    for source in sources:
+        with open(os.path.join(folder, source), 'rb') as f:
+            data = f.read()
+        # Minified sources are left as they are.
+        minified = '.min.' in os.path.basename(source)
+        if extension == '.css':
+            data = rebase_css_urls(data, posixpath.dirname(source), DIST)
+            if not minified:
+                data = minify_css(data)
+        elif extension == '.js' and not minified:
+            data = minify_js(data)
+        parts.append(data)
+    if extension == '.js':
+        # A script without a final semicolon must not run into the next.
+        return ';\n'.join(parts)
+    return '\n'.join(parts)
+
+
+def build(folder, bundles=BUNDLES, clean=False, log=None):
+    """
+    Write the hashed file of every bundle and the manifest.
+    :param folder: static folder
+    :param bundles: dictionary of logical name to source files
+    :param clean: remove the hashed files of previous builds,
+        pages cached by clients may still ask for them
+    :param log: function called with a message for every asset
+    :return: the manifest, a dictionary of logical name to hashed path
+    """
+    log = log or (lambda message: None)
+    dist = os.path.join(folder, DIST)
+    if not os.path.isdir(dist):
+        os.makedirs(dist)
+    manifest = {}
+    for name in sorted(bundles):
+        data = _bundle(folder, name, bundles[name])
+        digest = hashlib.sha1(data).hexdigest()[:HASH_LENGTH]
+        base, extension = os.path.splitext(name)
+        path = '{}/{}.{}{}'.format(DIST, base, digest, extension)
+        target = os.path.join(folder, path)
+        if not os.path.exists(target):
+            with open(target, 'wb') as f:
+                f.write(data)
+        manifest[name] = path
+        log("{} -> {} ({} bytes)".format(name, path, len(data)))
+    with open(os.path.join(folder, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    if clean:
+        current = set(os.path.basename(p) for p in manifest.values())
+        for name in os.listdir(dist):
+            if _HASHED.match(DIST + '/' + name) and name not in current:
+                os.remove(os.path.join(dist, name))
+                log("removed {}".format(name))
+    return manifest
+
+
+class Manifest(object):
+    """dist/manifest.json of a static folder,
+        read again when the file changes.
+    """
+
+    def __init__(self, folder):
+        self.path = os.path.join(folder, MANIFEST)
+        self._mtime = None
+        self._paths = {}
+        self._lock = threading.Lock()
+
+    def paths(self):
+        """
+        :return: dictionary of logical name to hashed path,
+            empty if nothing was built
+        """
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return {}
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    with open(self.path) as f:
+                        self._paths = json.load(f)
+                    self._mtime = mtime
+        return self._paths
+
+
+_manifests = {}
+
+
+def _manifest():
+    app = current_app
+    manifest = _manifests.get(app.static_folder)
+    if manifest is None:
+        manifest = _manifests.setdefault(app.static_folder,
+                                         Manifest(app.static_folder))
+    return manifest
+
+
+def asset_urls(name):
+    """
+    :param name: logical name of an asset, a key of BUNDLES
+    :return: URL of its' hashed file,
+        or URLs of its' sources if it was not built
+    """
+    path = _manifest().paths().get(name)
+    if path is not None:
+        return [url_for('static', filename=path)]
+    return [url_for('static', filename=source)
+            for source in BUNDLES.get(name, [name])]
+
+
+def asset_url(name):
+    """
+    :param name: logical name of an asset of one file
+    :return: URL of its' hashed file, or of the file if it was not built
+    """
+    return asset_urls(name)[0]
+
+
+def _cache_hashed(response):
+    if request.endpoint != 'static' or \
+            response.status_code not in (200, 304):
+        return response
+    filename = (request.view_args or {}).get('filename', '')
+    if _HASHED.match(filename):
+        response.headers['Cache-Control'] = IMMUTABLE
+        response.expires = time.time() + 365 * 24 * 60 * 60
+    return response
+
+
+def init_app(app):
+    """
+    Give the templates of app asset_url() and asset_urls(),
+        and let browsers keep hashed assets for a year.
+    :param app: Flask app
+    """
+    app.jinja_env.globals.update(asset_url=asset_url, asset_urls=asset_urls)
+    app.after_request(_cache_hashed)
@@ -0,0 +1,174 @@
+"""compression.py
+This module compresses responses with gzip, for clients which accept it.
+Dynamic responses are compressed as they go out, streamed ones chunk
+    by chunk. Static files are compressed once, at build time,
+    by precompress(): the static view sends file.gz instead of file
+    when it exists and is up to date. See also: compress_static.py
+
+Functions:
+    accepts_gzip()
+    gzip_bytes(data, level)
+    precompress(folder, level=9, min_size=None, log=None)
+    init_app(app)
+
+created on 18/October/2026
+"""
+
+
+import gzip
+import io
+import mimetypes
+import os
+import zlib
+
+from flask import request, send_file, current_app
+from flask.helpers import safe_join
+from werkzeug.exceptions import NotFound
+
+from settings import config
+
+
+# Extensions of static files worth compressing
+STATIC_EXTENSIONS = ('.css', '.js', '.json', '.map', '.svg', '.html',
+                     '.txt', '.eot', '.ttf', '.otf')
+
+
+def accepts_gzip():
+    """
+    :return: True if the client of the request accepts gzip
+    """
+    return request.accept_encodings['gzip'] > 0
+
+
+def gzip_bytes(data, level):
+    """
+    :param data: a byte string
+    :param level: compression level, 1 to 9
+    :return: the gzip file of data
+    """
+    # wbits of 16 + 15 writes a gzip header instead of a zlib one.
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _gzip_chunks(iterable, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    try:
+        for chunk in iterable:
+            # Flushed after every chunk, so clients get rows as they come.
+            data = compressor.compress(chunk) + \
+                compressor.flush(zlib.Z_SYNC_FLUSH)
+            if data:
+                yield data
+        yield compressor.flush()
+    finally:
+        if hasattr(iterable, 'close'):
+            iterable.close()
+
+
+def _compressible(response):
+    return response.mimetype in config.COMPRESS_MIMETYPES
+
+
+def _compress(response):
+    if not _compressible(response):
+        return response
+    response.vary.add('Accept-Encoding')
+    if response.status_code < 200 or response.status_code in (204, 304) \
+            or response.direct_passthrough \
+            or 'Content-Encoding' in response.headers \
+            or not accepts_gzip():
+        return response
+    level = config.COMPRESS_LEVEL
+    if response.is_streamed:
+        response.response = _gzip_chunks(response.response, level)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < config.COMPRESS_MIN_SIZE:
+            return response
+        response.set_data(gzip_bytes(data, level))
+    response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+def send_static_file(filename):
+    """
+        GET /static/filename
+        Sends filename.gz when the client accepts gzip,
+            and it is not older than filename.
+    """
+    app = current_app
+    path = safe_join(app.static_folder, filename)
+    if not os.path.isfile(path):
+        raise NotFound()
+    compressed = path + '.gz'
+    if not accepts_gzip() or not os.path.isfile(compressed) or \
+            os.path.getmtime(compressed) < os.path.getmtime(path):
+        response = app.send_static_file(filename)
+        if response.mimetype in config.COMPRESS_MIMETYPES:
+            response.vary.add('Accept-Encoding')
+        return response
+    response = send_file(compressed,
+                         mimetype=mimetypes.guess_type(filename)[0],
+                         conditional=True,
+                         cache_timeout=app.get_send_file_max_age(filename))
+    response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def precompress(folder, level=9, min_size=None, log=None):
+    """
+    Write file.gz next to every compressible file of folder,
+        unless it is up to date or compressing does not make it smaller.
+    :param folder: static folder
+    :param level: compression level, 1 to 9
+    :param min_size: smaller files are left alone,
+        config.COMPRESS_MIN_SIZE if None
+    :param log: function called with a message for every file written
+    :return: number of files written
+    """
+    if min_size is None:
+        min_size = config.COMPRESS_MIN_SIZE
+    log = log or (lambda message: None)
+    written = 0
+    for directory, dirs, files in os.walk(folder):
+        for name in files:
+            if not name.endswith(STATIC_EXTENSIONS):
+                continue
+            path = os.path.join(directory, name)
+            compressed = path + '.gz'
+            if os.path.isfile(compressed) and \
+                    os.path.getmtime(compressed) >= os.path.getmtime(path):
+                continue
+            with open(path, 'rb') as f:
+                data = f.read()
+            if len(data) < min_size:
+                continue
+            buf = io.BytesIO()
+            # mtime 0 and no name: the same file always gives the same bytes.
+            with gzip.GzipFile(filename='', mode='wb', fileobj=buf,
+                               compresslevel=level, mtime=0) as f:
+                f.write(data)
+            if buf.tell() >= len(data):
+                continue
+            with open(compressed, 'wb') as f:
+                f.write(buf.getvalue())
+            written += 1
+            log("{} {} -> {} bytes".format(
+                os.path.relpath(path, folder), len(data), buf.tell()))
+    return written
+
+
+def init_app(app):
+    """
+    Compress the responses of app, and send precompressed static files.
+    Registered after the other after_request functions,
+        it runs before them: they see the compressed response.
+    :param app: Flask app
+    """
+    if not config.COMPRESS_ENABLED:
+        return
+    app.after_request(_compress)
+    app.view_functions['static'] = send_static_file
@@ -0,0 +1,382 @@
+"""metrics.py
+This module measures every request, and serves the measurements
+    in the Prometheus text format on /metrics.
+Counters are kept per thread and summed when they are read,
+    so recording a request takes no lock.
+Every process counts its' own requests: with runserver.py --production
+    a scrape reports the worker which served it, labeled with its' pid.
+
+Measured per endpoint:
+    requests by method and status, latency, response size,
+    time spent in database queries and in rendering templates,
+    and requests in flight.
+
+Classes:
+    Registry: thread sharded counters and histograms
+    TimedTemplate: Jinja template measuring its' render time
+
+Attributes:
+    registry: Registry of the app
+
+Functions:
+    init_app(app, engine)
+    init_engine(engine)
+    render()
+
+created on 18/October/2026
+"""
+
+
+import bisect
+import os
+import threading
+import time
+import weakref
+from collections import namedtuple
+
+from flask import request, g, Response
+from jinja2 import Template
+from sqlalchemy import event
+
+from settings import config
+
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304,
+                16777216)
+
+# name, type, help and buckets of a histogram
+Family = namedtuple('Family', ['name', 'type', 'help', 'buckets'])
+
+REQUESTS = Family('catalog_http_requests_total', 'counter',
+                  "Requests by endpoint, method and status", None)
+LATENCY = Family('catalog_http_request_duration_seconds', 'histogram',
+                 "Time from the start of a request to its' last byte",
+                 LATENCY_BUCKETS)
+SIZE = Family('catalog_http_response_size_bytes', 'histogram',
+              "Size of response bodies", SIZE_BUCKETS)
+IN_FLIGHT = Family('catalog_http_requests_in_flight', 'gauge',
+                   "Requests being served", None)
+DB_SECONDS = Family('catalog_http_db_seconds_total', 'counter',
+                    "Time spent in database queries", None)
+DB_QUERIES = Family('catalog_http_db_queries_total', 'counter',
+                    "Database queries", None)
+TEMPLATE_SECONDS = Family('catalog_http_template_seconds_total', 'counter',
+                          "Time spent rendering templates, "
+                          "without the queries they run", None)
+FAMILIES = (REQUESTS, LATENCY, SIZE, IN_FLIGHT, DB_SECONDS, DB_QUERIES,
+            TEMPLATE_SECONDS)
+
+
+class Registry(object):
+    """Counters and fixed bucket histograms, sharded by thread.
+    A thread only writes to its' own shard, without a lock;
+        collect() sums the shards of every thread.
+    The shard of a thread which ended is folded into one shard of
+        finished threads, so a thread per request does not grow them.
+    A key is (family name, tuple of label values).
+    """
+
+    def __init__(self):
+        # (weak reference to the thread, its' shard)
+        self._shards = []
+        self._finished = {}
+        self._local = threading.local()
+        # Only taken when a thread records for the first time.
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = {}
+            with self._lock:
+                self._fold_finished()
+                self._shards.append(
+                    (weakref.ref(threading.current_thread()), shard))
+            self._local.shard = shard
+            return shard
+
+    def _fold_finished(self):
+        # Called with self._lock held.
+        # A thread which ended does not write its' shard any more.
+        running = []
+        for thread_ref, shard in self._shards:
+            thread = thread_ref()
+            if thread is not None and thread.is_alive():
+                running.append((thread_ref, shard))
+            else:
+                _add_shard(self._finished, shard)
+        self._shards = running
+
+    def inc(self, family, labels, amount=1):
+        shard = self._shard()
+        key = (family.name, labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    def observe(self, family, labels, value):
+        shard = self._shard()
+        key = (family.name, labels)
+        histogram = shard.get(key)
+        if histogram is None:
+            # A count per bucket, the count above the last one, and the sum
+            histogram = shard[key] = [0] * (len(family.buckets) + 1) + [0.0]
+        histogram[bisect.bisect_left(family.buckets, value)] += 1
+        histogram[-1] += value
+
+    def collect(self):
+        """
+        :return: dictionary of key to the sum of every shard,
+            a number, or a histogram list
+        """
+        totals = {}
+        with self._lock:
+            self._fold_finished()
+            shards = [shard for thread_ref, shard in self._shards]
+            _add_shard(totals, self._finished)
+        for shard in shards:
+            _add_shard(totals, shard)
+        return totals
+
+
+def _add_shard(totals, shard):
+    # items() copies the dictionary at once, under the GIL.
+    for key, value in shard.items():
+        if isinstance(value, list):
+            total = totals.get(key)
+            if total is None:
+                totals[key] = list(value)
+            else:
+                for i, v in enumerate(value):
+                    total[i] += v
+        else:
+            totals[key] = totals.get(key, 0) + value
+
+
+registry = Registry()
+
+# Time spent in queries and templates by the request of a thread
+_request = threading.local()
+
+
+def _add_request_time(name, seconds):
+    if getattr(_request, 'active', False):
+        setattr(_request, name, getattr(_request, name) + seconds)
+
+
+class TimedTemplate(Template):
+    """Template measuring the time its' render() takes.
+    Flask 0.10 has no signal before rendering, so the app uses this class.
+    Included and extended templates are rendered inside render().
+    """
+
+    def render(self, *args, **kwargs):
+        started = time.time()
+        db_before = getattr(_request, 'db_seconds', 0.0)
+        try:
+            return Template.render(self, *args, **kwargs)
+        finally:
+            # Lazy loads while rendering count as database time.
+            db_during = getattr(_request, 'db_seconds', 0.0) - db_before
+            _add_request_time('template_seconds',
+                              time.time() - started - db_during)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context,
+                           executemany):
+    if context is not None:
+        context._metrics_started = time.time()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context,
+                          executemany):
+    started = getattr(context, '_metrics_started', None)
+    if started is None:
+        return
+    _add_request_time('db_seconds', time.time() - started)
+    _add_request_time('db_queries', 1)
+
+
+def _endpoint():
+    # Unmatched URLs share one label, so they can not grow the series.
+    return request.endpoint or 'unmatched'
+
+
+def _start_request():
+    g.metrics_started = time.time()
+    g.metrics_status = None
+    _request.active = True
+    _request.db_seconds = 0.0
+    _request.db_queries = 0
+    _request.template_seconds = 0.0
+    registry.inc(IN_FLIGHT, ())
+
+
+def _counted(iterable, endpoint):
+    size = 0
+    try:
+        for chunk in iterable:
+            size += len(chunk)
+            yield chunk
+    finally:
+        registry.observe(SIZE, (endpoint,), size)
+        if hasattr(iterable, 'close'):
+            iterable.close()
+
+
+def _record_response(response):
+    endpoint = _endpoint()
+    g.metrics_status = response.status_code
+    if response.is_streamed:
+        response.response = _counted(response.response, endpoint)
+    else:
+        registry.observe(SIZE, (endpoint,),
+                         response.calculate_content_length() or 0)
+    return response
+
+
+def _finish_request(exception=None):
+    started = getattr(g, 'metrics_started', None)
+    if started is None:
+        return
+    endpoint = _endpoint()
+    status = g.metrics_status
+    if exception is not None or status is None:
+        status = 500
+    labels = (endpoint,)
+    registry.inc(REQUESTS, (endpoint, request.method, str(status)))
+    registry.observe(LATENCY, labels, time.time() - started)
+    registry.inc(DB_SECONDS, labels, _request.db_seconds)
+    registry.inc(DB_QUERIES, labels, _request.db_queries)
+    registry.inc(TEMPLATE_SECONDS, labels, _request.template_seconds)
+    registry.inc(IN_FLIGHT, (), -1)
+    _request.active = False
+    g.metrics_started = None
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"') \
+        .replace('\n', '\\n')
+
+
+def _label_text(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(n, _escape(v))
+                          for n, v in zip(names, values)) + '}'
+
+
+def _number(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+_LABELS = {
+    REQUESTS.name: ('endpoint', 'method', 'status'),
+    IN_FLIGHT.name: (),
+}
+
+
+def _cache_families():
+    # Imported here, the models import the app package.
+    from catalog_app.api.models import category_cache
+    from catalog_app.api.page_cache import page_cache
+    from catalog_app.api.util import verified_tokens
+    category = category_cache.stats()
+    page = page_cache.stats()
+    return [
+        ('catalog_category_cache_hits_total', 'counter',
+         "Category cache hits", category['hits']),
+        ('catalog_category_cache_misses_total', 'counter',
+         "Category cache misses", category['misses']),
+        ('catalog_page_cache_hits_total', 'counter',
+         "Page cache hits", page['hits']),
+        ('catalog_page_cache_misses_total', 'counter',
+         "Page cache misses", page['misses']),
+        ('catalog_page_cache_pages', 'gauge',
+         "Pages in the page cache", page['pages']),
+        ('catalog_page_cache_bytes', 'gauge',
+         "Size of the pages in the page cache", page['bytes']),
+        ('catalog_token_cache_entries', 'gauge',
+         "Tokens in the verified token cache", len(verified_tokens)),
+    ]
+
+
+def render():
+    """
+    :return: every metric of this process in the Prometheus text format
+    """
+    totals = registry.collect()
+    worker = ('worker',), (str(os.getpid()),)
+    lines = []
+    for family in FAMILIES:
+        lines.append('# HELP {} {}'.format(family.name, family.help))
+        lines.append('# TYPE {} {}'.format(family.name, family.type))
+        names = _LABELS.get(family.name, ('endpoint',)) + worker[0]
+        keys = sorted(key for key in totals if key[0] == family.name)
+        if family is IN_FLIGHT and not keys:
+            keys = [(family.name, ())]
+        for key in keys:
+            values = key[1] + worker[1]
+            value = totals.get(key, 0)
+            if family.buckets is None:
+                lines.append('{}{} {}'.format(
+                    family.name, _label_text(names, values), _number(value)))
+                continue
+            cumulative = 0
+            for bound, count in zip(family.buckets + ('+Inf',), value[:-1]):
+                cumulative += count
+                lines.append('{}_bucket{} {}'.format(
+                    family.name,
+                    _label_text(names + ('le',), values + (bound,)),
+                    cumulative))
+            lines.append('{}_sum{} {}'.format(
+                family.name, _label_text(names, values), _number(value[-1])))
+            lines.append('{}_count{} {}'.format(
+                family.name, _label_text(names, values), cumulative))
+    for name, type, help, value in _cache_families():
+        lines.append('# HELP {} {}'.format(name, help))
+        lines.append('# TYPE {} {}'.format(name, type))
+        lines.append('{}{} {}'.format(name, _label_text(*worker), value))
+    return '\n'.join(lines) + '\n'
+
+
+def metrics():
+    """
+        GET /metrics
+        Only answered to config.METRICS_ALLOWED_ADDRESSES
+    """
+    allowed = config.METRICS_ALLOWED_ADDRESSES
+    if allowed is not None and request.remote_addr not in allowed:
+        return Response('Not Found', status=404, mimetype='text/plain')
+    return Response(render(), mimetype='text/plain; version=0.0.4')
+
+
+def init_app(app, engine):
+    """
+    Measure every request of app, and the queries of engine,
+        and serve the measurements on /metrics.
+    :param app: Flask app
+    :param engine: database engine of the app
+    """
+    if not config.METRICS_ENABLED:
+        return
+    app.before_request_funcs.setdefault(None, []).insert(0, _start_request)
+    app.after_request(_record_response)
+    app.teardown_request(_finish_request)
+    app.jinja_env.template_class = TimedTemplate
+    init_engine(engine)
+    app.add_url_rule('/metrics', 'metrics', metrics)
+
+
+def init_engine(engine):
+    """
+    Count the queries of engine in the database time of requests.
+    :param engine: another database engine of the app
+    """
+    if not config.METRICS_ENABLED:
+        return
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
@@ -0,0 +1,364 @@
+"""query_log.py
+This module times every query of the database engine,
+    and aggregates the timings by fingerprint:
+    the statement with its' literals and parameters replaced by ?,
+    so the queries of one classmethod share one line whatever they ask for.
+Queries slower than config.SLOW_QUERY_THRESHOLD_MS are logged
+    with a redacted sample of their parameters,
+    and their plan is captured with EXPLAIN on another connection,
+    by a background thread, so the request does not wait for it.
+The aggregate is dumped to the log every config.SLOW_QUERY_LOG_INTERVAL
+    seconds and at exit, and served on GET /admin/queries.json.
+Every process aggregates its' own queries.
+
+Classes:
+    QueryStats: timings of every fingerprint
+    Explainer: background thread running EXPLAIN
+
+Attributes:
+    stats: QueryStats of the app
+
+Functions:
+    fingerprint(statement)
+    redact(parameters)
+    init_engine(engine)
+    dump(top=None)
+
+created on 18/October/2026
+"""
+
+
+import atexit
+import logging
+import os
+import Queue
+import re
+import threading
+import time
+
+from sqlalchemy import event
+
+from settings import config
+
+
+log = logging.getLogger(__name__)
+# Scripts which do not configure logging stay quiet.
+log.addHandler(logging.NullHandler())
+
+# Queries of fingerprints over config.SLOW_QUERY_MAX_FINGERPRINTS
+OTHER = '<other>'
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?:e[+-]?\d+)?\b", re.I)
+# pyformat and format of psycopg2, named and qmark of sqlite3
+_PARAMETER = re.compile(r"%\(\w+\)s|%s|(?<!:):\w+")
+_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_SPACE = re.compile(r"\s+")
+
+# Statements are compiled once by SQLAlchemy and sent over and over,
+#     so their fingerprints are remembered.
+_fingerprints = {}
+_FINGERPRINT_CACHE_SIZE = 2000
+
+
+def fingerprint(statement):
+    """
+    :param statement: SQL statement sent to the database
+    :return: the statement with literals, parameters and whitespace
+        normalized, lists of values are shown as (...)
+    """
+    result = _fingerprints.get(statement)
+    if result is not None:
+        return result
+    result = _STRING.sub('?', statement)
+    result = _PARAMETER.sub('?', result)
+    result = _NUMBER.sub('?', result)
+    result = _SPACE.sub(' ', result).strip()
+    result = _LIST.sub('(...)', result)
+    if len(_fingerprints) >= _FINGERPRINT_CACHE_SIZE:
+        _fingerprints.clear()
+    _fingerprints[statement] = result
+    return result
+
+
+def _redact_value(value):
+    if value is None or isinstance(value, (bool, int, long, float)):
+        return value
+    if isinstance(value, basestring):
+        # Emails, passwords and tokens are strings, only the length is kept.
+        return '<{} chars>'.format(len(value))
+    return '<{}>'.format(type(value).__name__)
+
+
+def redact(parameters):
+    """
+    :param parameters: parameters of a statement, a dictionary or a sequence
+    :return: copy of the parameters safe to log:
+        numbers and None are kept, others are replaced by their' type,
+        strings by their' length
+    """
+    if isinstance(parameters, dict):
+        return dict((k, _redact_value(v)) for k, v in parameters.items())
+    if isinstance(parameters, (list, tuple)):
+        return [_redact_value(v) for v in parameters]
+    return _redact_value(parameters)
+
+
+def _first_parameters(parameters, executemany):
+    if executemany:
+        return parameters[0] if parameters else None
+    return parameters
+
+
+class QueryStats(object):
+    """Count, total and max time of every fingerprint,
+        with the slowest sample and the last plan of slow ones.
+    The lock is only held to update one dictionary entry.
+    """
+
+    def __init__(self, max_fingerprints):
+        self.max_fingerprints = max_fingerprints
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._entries = {}
+            self.since = time.time()
+
+    def record(self, fingerprint, seconds, sample=None):
+        """
+        :param fingerprint: fingerprint of the statement
+        :param seconds: time the statement took
+        :param sample: dictionary describing a slow execution, or None
+        """
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            if entry is None:
+                if len(self._entries) >= self.max_fingerprints:
+                    fingerprint = OTHER
+                    entry = self._entries.get(OTHER)
+                if entry is None:
+                    entry = self._entries[fingerprint] = {
+                        'count': 0, 'total': 0.0, 'max': 0.0, 'slow': 0,
+                        'sample': None, 'plan': None
+                    }
+            entry['count'] += 1
+            entry['total'] += seconds
+            if seconds > entry['max']:
+                entry['max'] = seconds
+            if sample is not None:
+                entry['slow'] += 1
+                if entry['sample'] is None or \
+                        seconds >= entry['sample']['duration_ms'] / 1000.0:
+                    entry['sample'] = sample
+
+    def set_plan(self, fingerprint, plan):
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            if entry is not None:
+                entry['plan'] = plan
+
+    def last_plan(self, fingerprint):
+        """
+        :return: time the last plan of fingerprint was captured, or None
+        """
+        entry = self._entries.get(fingerprint)
+        if entry is None or entry['plan'] is None:
+            return None
+        return entry['plan']['at']
+
+    def report(self, order='total', limit=None):
+        """
+        :param order: 'total', 'max', 'mean' or 'count', largest first
+        :param limit: number of fingerprints, all of them if None
+        :return: a list of dictionaries, times in milliseconds
+        """
+        with self._lock:
+            entries = [(f, dict(e)) for f, e in self._entries.items()]
+        rows = []
+        for fingerprint, entry in entries:
+            rows.append({
+                'fingerprint': fingerprint,
+                'count': entry['count'],
+                'total_ms': round(entry['total'] * 1000, 3),
+                'mean_ms': round(entry['total'] * 1000 / entry['count'], 3),
+                'max_ms': round(entry['max'] * 1000, 3),
+                'slow': entry['slow'],
+                'sample': entry['sample'],
+                'plan': entry['plan']
+            })
+        rows.sort(key=lambda row: row[order + '_ms' if order != 'count'
+                                      else order], reverse=True)
+        return rows[:limit] if limit else rows
+
+
+stats = QueryStats(config.SLOW_QUERY_MAX_FINGERPRINTS)
+
+ORDERS = ('total', 'max', 'mean', 'count')
+
+# Statements with a plan
+EXPLAINED = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE')
+
+
+def _verb(statement):
+    words = statement.split(None, 1)
+    return words[0].upper() if words else ''
+
+
+class Explainer(object):
+    """Run EXPLAIN of slow queries on a thread of its' own,
+        with a connection of its' own, so a failing EXPLAIN can not
+        break the transaction of the request.
+    Queries waiting for their' plan are dropped when too many wait.
+    The thread is started again in a forked process.
+    """
+
+    def __init__(self, engine, analyze=False, max_waiting=100):
+        self.engine = engine
+        self.analyze = analyze
+        self._queue = Queue.Queue(max_waiting)
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def _ensure_thread(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            thread = threading.Thread(target=self._run,
+                                      name='query-explainer')
+            thread.daemon = True
+            thread.start()
+            self._pid = os.getpid()
+
+    def explain(self, fingerprint, statement, parameters):
+        """Capture the plan of statement later.
+        :return: False if statement has no plan,
+            or if too many statements wait already
+        """
+        if _verb(statement) not in EXPLAINED:
+            return False
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait((fingerprint, statement, parameters))
+        except Queue.Full:
+            return False
+        return True
+
+    def _prefix(self, statement):
+        dialect = self.engine.dialect.name
+        if dialect == 'sqlite':
+            return 'EXPLAIN QUERY PLAN '
+        # ANALYZE runs the statement, writes are only planned.
+        if self.analyze and dialect == 'postgresql' and \
+                _verb(statement) in ('SELECT', 'WITH'):
+            return 'EXPLAIN (ANALYZE, BUFFERS) '
+        return 'EXPLAIN '
+
+    def plan(self, statement, parameters):
+        """
+        :return: lines of the plan of statement
+        """
+        connection = self.engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            try:
+                if parameters:
+                    cursor.execute(self._prefix(statement) + statement,
+                                   parameters)
+                else:
+                    cursor.execute(self._prefix(statement) + statement)
+                # The plan is in the last column, a line per row.
+                return [unicode(row[-1]) for row in cursor.fetchall()]
+            finally:
+                cursor.close()
+                connection.rollback()
+        finally:
+            connection.close()
+
+    def _run(self):
+        while True:
+            fingerprint, statement, parameters = self._queue.get()
+            try:
+                lines = self.plan(statement, parameters)
+            except Exception as e:
+                log.info("EXPLAIN failed for %s: %s", fingerprint, e)
+                lines = ['EXPLAIN failed: {}'.format(e)]
+            stats.set_plan(fingerprint, {'at': time.time(), 'lines': lines})
+
+
+# Explainer of every engine
+_explainers = {}
+_next_dump = [0.0]
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context,
+                           executemany):
+    if context is not None:
+        context._query_log_started = time.time()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context,
+                          executemany):
+    started = getattr(context, '_query_log_started', None)
+    if started is None:
+        return
+    now = time.time()
+    seconds = now - started
+    key = fingerprint(statement)
+    sample = None
+    if seconds * 1000 >= config.SLOW_QUERY_THRESHOLD_MS:
+        first = _first_parameters(parameters, executemany)
+        sample = {
+            'duration_ms': round(seconds * 1000, 3),
+            'parameters': redact(first),
+            'at': now
+        }
+        log.warning("Slow query %.1fms: %s %r", seconds * 1000, key,
+                    sample['parameters'])
+        explainer = _explainers.get(conn.engine)
+        if explainer is not None:
+            last = stats.last_plan(key)
+            if last is None or \
+                    now - last >= config.SLOW_QUERY_EXPLAIN_INTERVAL:
+                explainer.explain(key, statement, first)
+    stats.record(key, seconds, sample)
+    if now >= _next_dump[0]:
+        _next_dump[0] = now + config.SLOW_QUERY_LOG_INTERVAL
+        dump()
+
+
+def dump(top=None):
+    """Write the slowest fingerprints by total time to the log.
+    :param top: number of fingerprints, config.SLOW_QUERY_LOG_TOP if None
+    """
+    rows = stats.report(limit=top or config.SLOW_QUERY_LOG_TOP)
+    if not rows:
+        return
+    lines = ["Queries of process {} by total time:".format(os.getpid())]
+    for row in rows:
+        lines.append("{total_ms:>12.1f}ms {count:>8} x {mean_ms:>9.2f}ms "
+                     "max {max_ms:>9.2f}ms  {fingerprint}".format(**row))
+    log.info('\n'.join(lines))
+
+
+def init_engine(engine):
+    """
+    Time every query of engine, and EXPLAIN the slow ones
+        if config.SLOW_QUERY_EXPLAIN is set.
+    Every engine of the app adds its' queries to the same stats.
+    :param engine: database engine of the app
+    """
+    if not config.QUERY_LOG_ENABLED:
+        return
+    if config.SLOW_QUERY_EXPLAIN:
+        _explainers[engine] = Explainer(engine,
+                                        analyze=config.SLOW_QUERY_ANALYZE)
+    if not _next_dump[0]:
+        # The first dump waits a whole interval.
+        _next_dump[0] = time.time() + config.SLOW_QUERY_LOG_INTERVAL
+        atexit.register(dump)
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
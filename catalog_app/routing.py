@@ -0,0 +1,227 @@
+"""routing.py
+This module sends the queries of read only requests to read replicas
+    of the database, and everything else to the primary.
+A request is read only if its' method is GET, HEAD or OPTIONS,
+    or its' view is marked with read_only,
+    and its' client did not write in the last
+    config.DATABASE_PRIMARY_STICKY_SECONDS: after a write, a cookie keeps
+    the client on the primary until the replicas have its' changes.
+Writes of a read only request still go to the primary,
+    and so do its' queries after them.
+For DATABASE_PRIMARY_STICKY_SECONDS after a write of this process,
+    what a replica returns may be older than the caches just invalidated,
+    so the page cache and the category cache are not filled from it.
+
+Classes:
+    ReplicaSet: replica engines, and the choice of one of them
+    RoutingSession: session reading from a replica when asked to
+
+Functions:
+    read_only(view)
+    sticky_request()
+    replica_may_lag()
+    init_app(app)
+
+created on 18/October/2026
+"""
+
+
+import itertools
+import threading
+import time
+
+from flask import request, current_app, has_request_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.expression import UpdateBase
+
+from settings import config
+
+
+SELECTIONS = ('round_robin', 'least_connections')
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# Time until which the client reads from the primary
+STICKY_COOKIE = 'db_primary'
+
+# Time of the last commit of a write in this process
+_last_write = {'time': 0.0}
+
+
+class ReplicaSet(object):
+    """Engines of the replicas.
+    round_robin: every session takes the next replica
+    least_connections: every session takes the replica with the fewest
+        connections in use by this process, ties in turn
+    """
+
+    def __init__(self, engines, selection='round_robin'):
+        if selection not in SELECTIONS:
+            raise ValueError("Unknown replica selection: {}".format(
+                selection))
+        self.engines = list(engines)
+        self.selection = selection
+        self._turn = itertools.count()
+        self._lock = threading.Lock()
+        self._in_use = dict((e, 0) for e in self.engines)
+        for e in self.engines:
+            event.listen(e, 'checkout', self._counter(e, 1))
+            event.listen(e, 'checkin', self._counter(e, -1))
+
+    def _counter(self, engine, amount):
+        def count(*args):
+            with self._lock:
+                self._in_use[engine] += amount
+        return count
+
+    def in_use(self):
+        """
+        :return: list of the connections in use of every replica
+        """
+        with self._lock:
+            return [self._in_use[e] for e in self.engines]
+
+    def choose(self):
+        """
+        :return: engine of the replica to read from
+        """
+        turn = next(self._turn) % len(self.engines)
+        if self.selection == 'round_robin':
+            return self.engines[turn]
+        ordered = self.engines[turn:] + self.engines[:turn]
+        with self._lock:
+            return min(ordered, key=self._in_use.get)
+
+    def dispose(self):
+        """Close the connections of every replica."""
+        for e in self.engines:
+            e.dispose()
+        with self._lock:
+            for e in self.engines:
+                self._in_use[e] = 0
+
+
+class RoutingSession(Session):
+    """Session of the primary, its' bind,
+        which reads from one replica after use_replica().
+    Flushes and INSERT, UPDATE and DELETE statements always go
+        to the primary, the queries after them too.
+    So does session.connection(): the statements sent on it
+        are not seen here, they count as writes.
+    """
+
+    def __init__(self, replicas=None, **kwargs):
+        Session.__init__(self, **kwargs)
+        self.replicas = replicas
+        self._reset_routing()
+
+    def _reset_routing(self):
+        self.read_only = False
+        self.wrote = False
+        self._replica = None
+
+    def use_replica(self):
+        """Read from a replica until the session writes,
+            if there are replicas.
+        """
+        self.read_only = bool(self.replicas and self.replicas.engines)
+
+    def get_bind(self, mapper=None, clause=None):
+        if self._flushing or isinstance(clause, UpdateBase):
+            self.wrote = True
+            self.read_only = False
+        if not self.read_only:
+            return Session.get_bind(self, mapper, clause)
+        # One replica for the whole session, so its' reads are consistent.
+        if self._replica is None:
+            self._replica = self.replicas.choose()
+        return self._replica
+
+    def connection(self, mapper=None, clause=None, bind=None, **kwargs):
+        # Queries name their mapper and statement,
+        #     a bare connection() is asked for to send statements directly.
+        if mapper is None and clause is None and bind is None:
+            self.wrote = True
+            self.read_only = False
+        return Session.connection(self, mapper=mapper, clause=clause,
+                                  bind=bind, **kwargs)
+
+    def close(self):
+        Session.close(self)
+        self._reset_routing()
+
+
+def _committed(session):
+    if session.wrote:
+        _last_write['time'] = time.time()
+
+
+event.listen(RoutingSession, 'after_commit', _committed)
+
+
+def read_only(view):
+    """Mark a view which never writes, whatever the method of its' request,
+        so it can read from a replica.
+    """
+    view.read_only = True
+    return view
+
+
+def _read_only_request():
+    if request.method in READ_METHODS:
+        return True
+    view = current_app.view_functions.get(request.endpoint)
+    return getattr(view, 'read_only', False)
+
+
+def sticky_request():
+    """
+    :return: True if the client of the request wrote lately,
+        so it reads from the primary
+    """
+    if not has_request_context():
+        return False
+    until = request.cookies.get(STICKY_COOKIE, type=float)
+    return until is not None and until > time.time()
+
+
+def replica_may_lag():
+    """
+    :return: True if the request reads from a replica, and this process
+        wrote in the last DATABASE_PRIMARY_STICKY_SECONDS:
+        the replica may not have the write yet, what it returns
+        must not be cached
+    """
+    # Imported here, the app package imports this module.
+    from catalog_app import session
+    if not has_request_context() or not session.registry.has():
+        return False
+    return session().read_only and \
+        time.time() - _last_write['time'] < \
+        config.DATABASE_PRIMARY_STICKY_SECONDS
+
+
+def _route_request():
+    from catalog_app import session
+    if not _read_only_request() or sticky_request():
+        return
+    session().use_replica()
+
+
+def _stick_to_primary(response):
+    from catalog_app import session
+    if not session.registry.has():
+        return response
+    if session().wrote or not _read_only_request():
+        seconds = config.DATABASE_PRIMARY_STICKY_SECONDS
+        response.set_cookie(STICKY_COOKIE, str(time.time() + seconds),
+                            max_age=seconds, httponly=True)
+    return response
+
+
+def init_app(app):
+    """
+    Route the read only requests of app to the replicas.
+    :param app: Flask app
+    """
+    app.before_request(_route_request)
+    app.after_request(_stick_to_primary)
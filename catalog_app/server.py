@@ -0,0 +1,355 @@
+"""server.py
+This module runs the Flask app on Tornado with several processes,
+    each of them running WSGI calls on a thread pool.
+A worker answers 503 at once when too many requests are waiting for
+    a thread, instead of queueing them without bound.
+See also: runserver.py
+
+Signals of the master process:
+    SIGTERM, SIGINT: stop accepting, finish requests in flight, then exit
+    SIGHUP: restart the workers one by one, gracefully:
+        the next one is stopped when the previous one was replaced
+
+Classes:
+    ThreadedWSGIContainer: WSGIContainer which does not block the IOLoop
+    Master: forks the worker processes and restarts them when they exit
+
+Functions:
+    serve(app, port, address='', workers=None, threads=16, queue=64, ...)
+
+created on 18/October/2026
+"""
+
+
+import errno
+import logging
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from tornado import escape, httputil
+from tornado.httpserver import HTTPServer
+from tornado.ioloop import IOLoop
+from tornado.netutil import bind_sockets
+from tornado.wsgi import WSGIContainer
+import tornado
+
+
+log = logging.getLogger(__name__)
+
+
+class ThreadedWSGIContainer(WSGIContainer):
+    """Run a WSGI application on a thread pool instead of the IOLoop.
+    A slow request only holds one thread,
+        the IOLoop keeps accepting and serving other connections.
+    Small bodies are sent with Content-Length,
+        bodies larger than buffer_size are streamed in chunks.
+    At most max_active requests are in flight, running or waiting for
+        a thread. More are answered 503 on the IOLoop, without a thread.
+    """
+
+    def __init__(self, wsgi_application, executor, io_loop=None,
+                 buffer_size=65536, max_active=None):
+        WSGIContainer.__init__(self, wsgi_application)
+        self.executor = executor
+        self.io_loop = io_loop or IOLoop.current()
+        self.buffer_size = buffer_size
+        self.max_active = max_active
+        # Requests in flight, only touched on the IOLoop thread.
+        self.active = 0
+        self.rejected = 0
+
+    def __call__(self, request):
+        if self.max_active is not None and self.active >= self.max_active:
+            self.rejected += 1
+            self._send_busy(request)
+            return
+        self.active += 1
+        future = self.executor.submit(self._handle, request)
+        self.io_loop.add_future(future, self._handled)
+
+    def _handled(self, future):
+        self.active -= 1
+        if future.exception() is not None:
+            log.error("Error serving a request",
+                      exc_info=future.exc_info())
+
+    def _on_loop(self, function, *args):
+        """
+        Call function on the IOLoop thread, and wait until
+            the write it starts is flushed.
+        Waiting keeps a slow client from filling memory with our output.
+        """
+        done = threading.Event()
+        errors = []
+
+        def run():
+            try:
+                future = function(*args)
+            except Exception as e:
+                errors.append(e)
+                future = None
+            if future is None:
+                done.set()
+                return
+
+            def flushed(f):
+                if f.exception() is not None:
+                    errors.append(f.exception())
+                done.set()
+            future.add_done_callback(flushed)
+
+        self.io_loop.add_callback(run)
+        done.wait()
+        if errors:
+            raise errors[0]
+
+    def _handle(self, request):
+        data = {}
+        buffered = []
+
+        def start_response(status, response_headers, exc_info=None):
+            data["status"] = status
+            data["headers"] = response_headers
+            return buffered.append
+
+        try:
+            app_response = self.wsgi_application(
+                WSGIContainer.environ(request), start_response)
+        except Exception:
+            self._on_loop(self._send_error, request)
+            raise
+        headers_sent = False
+        try:
+            chunks = iter(app_response)
+            size = 0
+            streaming = False
+            for chunk in chunks:
+                if chunk:
+                    buffered.append(escape.utf8(chunk))
+                    size += len(chunk)
+                if size >= self.buffer_size:
+                    streaming = True
+                    break
+            if not data:
+                raise Exception("WSGI app did not call start_response")
+
+            status_code, reason = data["status"].split(' ', 1)
+            status_code = int(status_code)
+            headers = data["headers"]
+            header_set = set(k.lower() for (k, v) in headers)
+            body = b"".join(buffered)
+            if status_code != 304:
+                if "content-length" not in header_set and not streaming:
+                    headers.append(("Content-Length", str(len(body))))
+                if "content-type" not in header_set:
+                    headers.append(
+                        ("Content-Type", "text/html; charset=UTF-8"))
+            if "server" not in header_set:
+                headers.append(
+                    ("Server", "TornadoServer/%s" % tornado.version))
+            start_line = httputil.ResponseStartLine(
+                "HTTP/1.1", status_code, reason)
+            header_obj = httputil.HTTPHeaders()
+            for key, value in headers:
+                header_obj.add(key, value)
+
+            headers_sent = True
+            self._on_loop(request.connection.write_headers,
+                          start_line, header_obj, body)
+            if streaming:
+                for chunk in chunks:
+                    if chunk:
+                        self._on_loop(request.connection.write,
+                                      escape.utf8(chunk))
+        except Exception:
+            if headers_sent:
+                self._on_loop(request.connection.stream.close)
+            else:
+                self._on_loop(self._send_error, request)
+            raise
+        finally:
+            if hasattr(app_response, "close"):
+                app_response.close()
+        self._on_loop(request.connection.finish)
+        self._log(status_code, request)
+
+    def _send_busy(self, request):
+        body = b"Service Unavailable"
+        header_obj = httputil.HTTPHeaders()
+        header_obj.add("Content-Type", "text/plain")
+        header_obj.add("Content-Length", str(len(body)))
+        header_obj.add("Retry-After", "1")
+        request.connection.write_headers(
+            httputil.ResponseStartLine("HTTP/1.1", 503,
+                                       "Service Unavailable"),
+            header_obj, body)
+        request.connection.finish()
+        self._log(503, request)
+
+    def _send_error(self, request):
+        body = b"Internal Server Error"
+        header_obj = httputil.HTTPHeaders()
+        header_obj.add("Content-Type", "text/plain")
+        header_obj.add("Content-Length", str(len(body)))
+        request.connection.write_headers(
+            httputil.ResponseStartLine("HTTP/1.1", 500,
+                                       "Internal Server Error"),
+            header_obj, body)
+        request.connection.finish()
+
+
+def _run_worker(app, sockets, threads, queue, shutdown_timeout, after_fork):
+    """Serve requests in a forked worker process until SIGTERM."""
+    for signum in (signal.SIGINT, signal.SIGHUP):
+        signal.signal(signum, signal.SIG_DFL)
+    if after_fork is not None:
+        after_fork()
+
+    io_loop = IOLoop.current()
+    executor = ThreadPoolExecutor(threads)
+    container = ThreadedWSGIContainer(app, executor, io_loop=io_loop,
+                                      max_active=threads + queue)
+    server = HTTPServer(container, io_loop=io_loop)
+    server.add_sockets(sockets)
+
+    def stop():
+        # Stop accepting, let the other workers take new connections,
+        #     and wait for the requests in flight.
+        server.stop()
+        deadline = time.time() + shutdown_timeout
+
+        def wait():
+            if container.active and time.time() < deadline:
+                io_loop.call_later(0.1, wait)
+            else:
+                io_loop.stop()
+        wait()
+
+    signal.signal(signal.SIGTERM,
+                  lambda signum, frame: io_loop.add_callback_from_signal(stop))
+    io_loop.start()
+    executor.shutdown(wait=False)
+
+
+class Master(object):
+    """Fork worker processes sharing the listening sockets,
+        and restart every worker which exits, until shutdown.
+    """
+
+    def __init__(self, app, sockets, workers, threads, queue=64,
+                 shutdown_timeout=30, after_fork=None):
+        self.app = app
+        self.sockets = sockets
+        self.workers = workers
+        self.threads = threads
+        self.queue = queue
+        self.shutdown_timeout = shutdown_timeout
+        self.after_fork = after_fork
+        self.children = {}
+        self.stopping = False
+        # Pids still to restart after SIGHUP, and the one being replaced.
+        self.restarting = []
+        self.replacing = None
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            status = 0
+            try:
+                _run_worker(self.app, self.sockets, self.threads, self.queue,
+                            self.shutdown_timeout, self.after_fork)
+            except Exception:
+                log.exception("Worker failed")
+                status = 1
+            finally:
+                os._exit(status)
+        self.children[pid] = time.time()
+        log.info("Started worker %d", pid)
+
+    def kill_all(self, signum):
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signum)
+            except OSError:
+                pass
+
+    def on_stop(self, signum, frame):
+        self.stopping = True
+        self.kill_all(signal.SIGTERM)
+
+    def on_restart(self, signum, frame):
+        # One worker at a time exits after its' requests in flight,
+        #     so the others keep serving while run() replaces it.
+        log.info("Restarting workers")
+        self.restarting = [pid for pid in self.children
+                           if pid != self.replacing]
+        if self.replacing is None:
+            self.restart_next()
+
+    def restart_next(self):
+        """Stop the next worker of a restart, if any is left."""
+        self.replacing = None
+        while self.restarting:
+            pid = self.restarting.pop(0)
+            if pid not in self.children:
+                continue
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:
+                continue
+            self.replacing = pid
+            return
+        log.info("Workers restarted")
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.on_stop)
+        signal.signal(signal.SIGINT, self.on_stop)
+        signal.signal(signal.SIGHUP, self.on_restart)
+        for i in range(self.workers):
+            self.spawn()
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except OSError as e:
+                if e.errno == errno.EINTR:
+                    continue
+                raise
+            started = self.children.pop(pid, None)
+            if started is None or self.stopping:
+                continue
+            if pid != self.replacing and \
+                    (os.WIFSIGNALED(status) or os.WEXITSTATUS(status)):
+                log.warning("Worker %d exited with status %d", pid, status)
+                # Do not fork in a tight loop if workers keep failing.
+                if time.time() - started < 1:
+                    time.sleep(1)
+            self.spawn()
+            if pid == self.replacing:
+                self.restart_next()
+
+
+def serve(app, port, address='', workers=None, threads=16, queue=64,
+          shutdown_timeout=30, after_fork=None):
+    """
+    Serve app with workers processes on a shared listening socket.
+    :param app: WSGI application
+    :param port:
+    :param address: address to listen on, all interfaces if ''
+    :param workers: number of processes, the number of CPUs if None
+    :param threads: size of the WSGI thread pool of each process
+    :param queue: requests of each process waiting for a thread,
+        more are answered 503
+    :param shutdown_timeout: seconds to wait for requests in flight
+    :param after_fork: function called in every new worker,
+        e.g. to dispose database connections inherited from the master
+    """
+    sockets = bind_sockets(port, address)
+    workers = workers or multiprocessing.cpu_count()
+    Master(app, sockets, workers, threads, queue, shutdown_timeout,
+           after_fork).run()
+    sys.exit(0)
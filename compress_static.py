@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+
+"""
+compress_static.py
+    Write a gzip copy, file.gz, of every compressible static file,
+    served instead of file to clients accepting gzip.
+    Run it after bower update, and after changing a static file.
+    See also: catalog_app/compression.py
+
+    python compress_static.py
+    python compress_static.py --level 6 --min-size 1024
+
+created on 18/October/2026
+
+"""
+
+
+import argparse
+import os
+import sys
+
+from catalog_app.compression import precompress
+from settings import config
+
+
+STATIC_FOLDER = os.path.join(config.BASE_DIR, 'catalog_app', 'static')
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        description="Precompress the static files")
+    parser.add_argument('--folder', default=STATIC_FOLDER)
+    parser.add_argument('--level', type=int, default=9, choices=range(1, 10))
+    parser.add_argument('--min-size', type=int,
+                        default=config.COMPRESS_MIN_SIZE,
+                        help="smaller files are not compressed")
+    parser.add_argument('--quiet', action='store_true')
+    args = parser.parse_args(argv)
+
+    def log(message):
+        if not args.quiet:
+            print message
+
+    written = precompress(args.folder, level=args.level,
+                          min_size=args.min_size, log=log)
+    print "{} files compressed".format(written)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
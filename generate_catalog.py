@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+
+"""
+generate_catalog.py
+    Generate synthetic users, categories and items
+    for load and capacity testing. See also: catalog_app/api/synthetic.py
+
+    python generate_catalog.py --items 1000000
+    python generate_catalog.py --database sqlite:////tmp/bench.db \
+        --users 1000 --categories 200 --items 2000000 \
+        --distribution zipf --description-mean 400 --seed 42
+
+created on 18/October/2026
+
+"""
+
+
+import argparse
+import datetime
+import sys
+
+from sqlalchemy.orm import sessionmaker
+
+from catalog_app import create_db_engine
+from catalog_app.api import migrations
+from catalog_app.api.synthetic import generate_catalog, DISTRIBUTIONS, \
+    LENGTH_DISTRIBUTIONS
+from catalog_app.api.util import utc
+from settings import config
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        description="Generate a synthetic catalog")
+    parser.add_argument('--database', default=config.DATABASE_URI,
+                        help="database uri, settings/config.py by default")
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--categories', type=int, default=50)
+    parser.add_argument('--items', type=int, default=100000)
+    parser.add_argument('--distribution', choices=DISTRIBUTIONS,
+                        default='zipf', help="items per category")
+    parser.add_argument('--zipf-exponent', type=float, default=1.1)
+    parser.add_argument('--description-length', choices=LENGTH_DISTRIBUTIONS,
+                        default='lognormal')
+    parser.add_argument('--description-mean', type=int, default=200,
+                        help="mean description length in characters")
+    parser.add_argument('--description-max', type=int, default=5000)
+    parser.add_argument('--days', type=int, default=365,
+                        help="items are created in the days before --end")
+    parser.add_argument('--end', default=None,
+                        help="latest created date, YYYY-MM-DD, "
+                             "fix it to get the same rows every day")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--password', default='password',
+                        help="password of every generated user")
+    parser.add_argument('--batch-size', type=int,
+                        default=config.BULK_IMPORT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    end = None
+    if args.end:
+        end = datetime.datetime.strptime(args.end, '%Y-%m-%d').replace(
+            tzinfo=utc)
+
+    def log(message):
+        print message
+
+    engine = create_db_engine(args.database)
+    migrations.upgrade(engine, log=log)
+    session = sessionmaker(bind=engine)()
+    try:
+        rows, seconds = generate_catalog(
+            session, args.users, args.categories, args.items,
+            distribution=args.distribution, exponent=args.zipf_exponent,
+            length_distribution=args.description_length,
+            description_mean=args.description_mean,
+            description_max=args.description_max,
+            days=args.days, end=end, seed=args.seed,
+            password=args.password, batch_size=args.batch_size, log=log)
+    finally:
+        session.close()
+    print "{} rows written in {:.1f}s, {} rows/s".format(
+        rows, seconds, int(rows / seconds) if seconds else rows)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+
+"""
+import_catalog.py
+    Import categories and items in bulk from CSV or NDJSON.
+    See also: catalog_app/api/bulk.py
+
+    python import_catalog.py catalog.ndjson
+    python import_catalog.py items.csv --user-id 1 --skip-invalid
+    curl http://localhost/catalog.ndjson | python import_catalog.py - \
+        --format ndjson
+
+created on 18/October/2026
+
+"""
+
+
+import argparse
+import sys
+
+from catalog_app import DBSession
+from catalog_app.api.bulk import import_catalog, read_records, \
+    BulkImportError, FORMATS
+from settings import config
+
+
+def print_report(report):
+    print "{} categories and {} items imported in {:.1f}s, {} rows/s".format(
+        report.categories, report.items, report.seconds,
+        report.rows_per_second)
+    if report.skipped:
+        print "{} records skipped, they exist already".format(report.skipped)
+    if report.rejected:
+        print "{} records rejected:".format(report.rejected)
+        for error in report.errors:
+            print "  line {line}: {message}".format(**error)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        description="Import categories and items in bulk")
+    parser.add_argument('path', help="CSV or NDJSON file, - for stdin")
+    parser.add_argument('--format', choices=FORMATS, default=None,
+                        help="format of the file, "
+                             "guessed from its' extension by default")
+    parser.add_argument('--user-id', type=int, default=None,
+                        help="owner of items without a user_id")
+    parser.add_argument('--batch-size', type=int,
+                        default=config.BULK_IMPORT_BATCH_SIZE,
+                        help="records written per statement")
+    parser.add_argument('--skip-invalid', action='store_true',
+                        help="import the valid records if some are not")
+    args = parser.parse_args(argv)
+
+    format = args.format or args.path.rsplit('.', 1)[-1].lower()
+    if format not in FORMATS:
+        parser.error("Unknown format, use --format")
+    stream = sys.stdin if args.path == '-' else open(args.path, 'rb')
+    session = DBSession()
+    try:
+        report = import_catalog(session, read_records(stream, format),
+                                user_id=args.user_id,
+                                skip_invalid=args.skip_invalid,
+                                batch_size=args.batch_size)
+    except BulkImportError as e:
+        print_report(e.report)
+        print e
+        return 1
+    finally:
+        session.close()
+        stream.close()
+    print_report(report)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+
+"""
+migrate.py
+    Upgrade the database schema. See also: catalog_app/api/migrations.py
+
+    python migrate.py upgrade [--to VERSION]
+    python migrate.py current
+    python migrate.py history
+
+created on 18/October/2026
+
+"""
+
+
+import argparse
+import sys
+
+from catalog_app import engine
+from catalog_app.api import migrations
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Catalog schema migrations")
+    commands = parser.add_subparsers(dest='command')
+    upgrade = commands.add_parser('upgrade', help="apply new migrations")
+    upgrade.add_argument('--to', type=int, default=None,
+                         help="version to stop at, the latest by default")
+    commands.add_parser('current', help="show the database version")
+    commands.add_parser('history', help="list every migration")
+    args = parser.parse_args(argv)
+
+    if args.command == 'upgrade':
+        def log(message):
+            print message
+        version = migrations.upgrade(engine, target=args.to, log=log)
+        print "Database is at version {}".format(version)
+    elif args.command == 'current':
+        connection = engine.connect()
+        try:
+            print migrations.current_version(connection)
+        finally:
+            connection.close()
+    elif args.command == 'history':
+        for version, description, function in migrations.MIGRATIONS:
+            print "{:>4}  {}".format(version, description)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -4,23 +4,58 @@
 runserver.py
     Run Flask web application on the web server Tornado.
 
+    python runserver.py
+        development: one process, debug mode
+    python runserver.py --production [--workers N] [--threads N] [--queue N]
+        production: N worker processes, the number of CPUs by default,
+        running WSGI calls on a thread pool, with at most --queue requests
+        waiting for a thread. See also: catalog_app/server.py
+
 created on 13/June/2014
 
 """
 
 
+import argparse
+import logging
+
 from tornado.wsgi import WSGIContainer
 from tornado.httpserver import HTTPServer
 from tornado.ioloop import IOLoop
 
 from settings import config
-from catalog_app import app
-
+from catalog_app import app, dispose_engines
+
+
+parser = argparse.ArgumentParser(description="Run the catalog app")
+parser.add_argument('--port', type=int, default=80)
+parser.add_argument('--address', default='')
+parser.add_argument('--production', action='store_true',
+                    help="fork worker processes, disable debug mode")
+parser.add_argument('--workers', type=int, default=config.SERVER_WORKERS,
+                    help="number of processes, the number of CPUs if 0")
+parser.add_argument('--threads', type=int, default=config.SERVER_THREADS,
+                    help="WSGI threads in every process")
+parser.add_argument('--queue', type=int, default=config.SERVER_QUEUE,
+                    help="requests waiting for a thread in every process, "
+                         "more are answered 503")
+args = parser.parse_args()
 
 app.secret_key = config.SECRET_KEY
-app.debug = True
-http_server = HTTPServer(WSGIContainer(app))
-http_server.listen(80)
-IOLoop.instance().start()
+
+if args.production:
+    from catalog_app import server
+    logging.basicConfig(level=logging.INFO)
+    # Connections opened before fork must not be shared by the workers.
+    server.serve(app, args.port, address=args.address,
+                 workers=args.workers or None, threads=args.threads,
+                 queue=args.queue,
+                 shutdown_timeout=config.SERVER_SHUTDOWN_TIMEOUT,
+                 after_fork=dispose_engines)
+else:
+    app.debug = True
+    http_server = HTTPServer(WSGIContainer(app))
+    http_server.listen(args.port, address=args.address)
+    IOLoop.instance().start()
 
 #app.run(host='0.0.0.0', port=8000)
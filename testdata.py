@@ -13,7 +13,8 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
 from catalog_app.api.util import encrypt_password, check_password
-from catalog_app.api.models import Base, User, Category, Item
+from catalog_app.api.models import User, Category, Item
+from catalog_app.api import migrations
 
 from settings import config
 
@@ -21,7 +22,7 @@ from settings import config
 engine = create_engine(
     config.DATABASE_URI
 )
-Base.metadata.create_all(engine)
+migrations.upgrade(engine)
 
 DBSession = sessionmaker(bind=engine)
 session = DBSession()
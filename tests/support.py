@@ -0,0 +1,120 @@
+"""support.py
+Shared set up of the tests.
+catalog_app builds its' engine and reads the Google client secrets
+    when it is imported, so this module points config at a SQLite
+    database and stub secrets in a temporary directory first.
+Every test module imports it before catalog_app.
+
+    python -m unittest discover -s tests -t .
+
+Attributes:
+    directory: temporary directory of the test database
+Functions:
+    clear_database()
+    seed(users, categories, items)
+    login(client, email, password)
+    count_queries(function, *args)
+
+created on 18/October/2026
+"""
+
+
+import atexit
+import json
+import os
+import re
+import shutil
+import tempfile
+
+from settings import config
+
+
+directory = tempfile.mkdtemp(prefix='catalog-tests-')
+atexit.register(shutil.rmtree, directory, True)
+
+config.DATABASE_URI = 'sqlite:///' + os.path.join(directory, 'catalog.db')
+config.DATABASE_REPLICA_URIS = []
+config.GOOGLE_CLIENT_SECRETS = os.path.join(directory, 'client_secret.json')
+with open(config.GOOGLE_CLIENT_SECRETS, 'w') as secrets:
+    json.dump({'web': {'client_id': 'test-client-id',
+                       'client_secret': 'test-client-secret',
+                       'auth_uri': 'https://localhost/auth',
+                       'token_uri': 'https://localhost/token',
+                       'redirect_uris': []}}, secrets)
+
+from sqlalchemy import event
+
+from catalog_app import app, engine, session
+from catalog_app.api import migrations
+from catalog_app.api.models import Base, category_cache
+from catalog_app.api.page_cache import page_cache
+from catalog_app.api.synthetic import generate_catalog
+
+app.secret_key = config.SECRET_KEY
+migrations.upgrade(engine)
+
+# SQLAlchemy 0.8 can not remove a listener of an engine,
+#     so it is added once and count_queries clears the list.
+_statements = []
+
+
+@event.listens_for(engine, 'before_cursor_execute')
+def _count(conn, cursor, statement, parameters, context, executemany):
+    _statements.append(statement)
+
+
+def clear_database():
+    """Delete every row, and the cached categories and pages."""
+    connection = engine.connect()
+    try:
+        with connection.begin():
+            for table in reversed(Base.metadata.sorted_tables):
+                connection.execute(table.delete())
+    finally:
+        connection.close()
+    category_cache.invalidate()
+    page_cache.clear()
+
+
+def seed(users=1, categories=1, items=0):
+    """
+    Replace the database with synthetic rows.
+    Users are synthetic<id>@example.com, their password is 'password'.
+    :param users: number of users
+    :param categories: number of categories
+    :param items: number of items
+    """
+    clear_database()
+    try:
+        generate_catalog(session, users, categories, items, seed=1)
+    finally:
+        session.remove()
+
+
+def login(client, email, password='password'):
+    """
+    Log in with the form of /auth/login/.
+    :param client: Flask test client
+    :param email: email of the user
+    :param password: password of the user
+    :return: the token, sent as the Authorization header by the pages
+    """
+    page = client.get('/auth/login/')
+    csrf = re.search(r'name=_csrf_token type=hidden value="([^"]*)"',
+                     page.data).group(1)
+    response = client.post('/auth/login/', data={
+        'email': email, 'password': password, '_csrf_token': csrf})
+    assert response.status_code == 302, response.data
+    for cookie in client.cookie_jar:
+        if cookie.name == 'token':
+            return cookie.value
+
+
+def count_queries(function, *args):
+    """
+    :return: the number of statements sent to the primary while
+        function(*args) ran, and its' return value
+    """
+    del _statements[:]
+    result = function(*args)
+    return len(_statements), result
@@ -0,0 +1,93 @@
+"""GET and POST /items/batch.json"""
+
+
+import json
+import unittest
+
+from tests import support
+from catalog_app import app, session
+from catalog_app.api.models import Item, CatalogVersion
+from settings import config
+
+
+class BatchTestCase(unittest.TestCase):
+
+    def setUp(self):
+        support.seed(users=1, categories=2, items=5)
+        self.ids = sorted(id for (id,) in session.query(Item.id))
+        session.remove()
+        self.client = app.test_client()
+
+    def tearDown(self):
+        session.remove()
+
+    def get(self, ids, **headers):
+        response = self.client.get('/items/batch.json?ids=' + ids,
+                                   headers=headers)
+        if response.status_code == 304:
+            return response, None
+        return response, json.loads(response.data)
+
+    def test_items_in_the_requested_order(self):
+        ids = [self.ids[3], 99999, self.ids[0], self.ids[3]]
+        response, body = self.get(','.join(str(id) for id in ids))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['id'] for item in body['items']], ids)
+        self.assertEqual([item['status'] for item in body['items']],
+                         ['found', 'not_found', 'found', 'found'])
+        self.assertEqual(body['not_found'], [99999])
+        found = body['items'][0]
+        self.assertEqual(found['item']['id'], self.ids[3])
+        self.assertEqual(found['category']['id'],
+                         found['item']['category_id'])
+
+    def test_post_and_repeated_fields(self):
+        response = self.client.post('/items/batch.json', data={
+            'ids': '{},{}'.format(self.ids[1], self.ids[2])})
+        body = json.loads(response.data)
+        self.assertEqual([item['id'] for item in body['items']],
+                         self.ids[1:3])
+        response = self.client.get('/items/batch.json?ids={}&ids={}'.format(
+            self.ids[1], self.ids[2]))
+        self.assertEqual(json.loads(response.data)['items'], body['items'])
+
+    def test_invalid_ids(self):
+        for ids in ('abc', '1,-2', '1.5', '1,x'):
+            response, body = self.get(ids)
+            self.assertEqual(response.status_code, 400, ids)
+            self.assertEqual(body['status'], 'fail')
+        response, body = self.get('')
+        self.assertEqual(body['items'], [])
+
+    def test_limit(self):
+        ids = ','.join(['1'] * config.BATCH_MAX_ITEMS)
+        self.assertEqual(self.get(ids)[0].status_code, 200)
+        response = self.client.post('/items/batch.json', data={
+            'ids': ids + ',1'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_not_modified(self):
+        ids = str(self.ids[0])
+        response, body = self.get(ids)
+        etag = response.headers['ETag']
+        response, body = self.get(ids, **{'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        item = session.query(Item).get(self.ids[0])
+        session.delete(item)
+        CatalogVersion.bump(session, [item.category_id])
+        session.commit()
+        response, body = self.get(ids, **{'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body['not_found'], [self.ids[0]])
+
+    def test_item_without_category(self):
+        session.query(Item).filter_by(id=self.ids[0]).update(
+            {'category_id': None})
+        session.commit()
+        response, body = self.get(str(self.ids[0]))
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(body['items'][0]['category'])
+
+
+if __name__ == '__main__':
+    unittest.main()
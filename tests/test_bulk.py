@@ -0,0 +1,130 @@
+"""Bulk import: unreadable uploads, and importing a dump again."""
+
+
+import io
+import json
+import unittest
+
+from tests import support
+from catalog_app import app, session
+from catalog_app.api.bulk import import_catalog, read_records, \
+    BulkImportError
+from catalog_app.api.models import Category, Item
+
+
+class BulkImportTestCase(unittest.TestCase):
+
+    def setUp(self):
+        support.seed(users=2, categories=3, items=20)
+        self.client = app.test_client()
+
+    def tearDown(self):
+        session.remove()
+
+    def dump(self):
+        response = self.client.get('/catalog.ndjson')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def rows(self):
+        session.remove()
+        return (sorted((c.id, c.name) for c in session.query(Category)),
+                sorted((i.id, i.title, i.category_id, i.user_id)
+                       for i in session.query(Item)))
+
+    def import_ndjson(self, data):
+        return import_catalog(session, read_records(io.BytesIO(data),
+                                                    'ndjson'))
+
+    def test_upload_not_in_utf8(self):
+        token = support.login(self.client, 'synthetic1@example.com')
+        csv = u'title,category_id\nCaf\xe9,1\n'.encode('latin-1')
+        response = self.client.post(
+            '/items/import', headers={'Authorization': token},
+            data={'file': (io.BytesIO(csv), 'items.csv')})
+        self.assertEqual(response.status_code, 400)
+        result = json.loads(response.data)
+        self.assertEqual(result['status'], 'fail')
+        self.assertEqual(result['errors'], [
+            {'line': 2, 'message': 'Unreadable record'}])
+
+    def upload(self, data, format):
+        # As an upload, CATEGORY is the id of a category.
+        category_id = session.query(Category.id).first()[0]
+        data = data.replace('CATEGORY', str(category_id))
+        report = import_catalog(
+            session, read_records(io.BytesIO(data), format),
+            user_id=1, trusted=False, skip_invalid=True)
+        session.remove()
+        return report
+
+    def test_csv_not_readable(self):
+        report = self.upload('title,category_id\nKite\x00,CATEGORY\n'
+                             'Ball,CATEGORY\n', 'csv')
+        self.assertEqual(report.items, 1)
+        self.assertEqual(report.errors, [
+            {'line': 2, 'message': 'Unreadable record'}])
+        report = self.upload('title\x00,category_id\nBall,CATEGORY\n',
+                             'csv')
+        self.assertEqual(report.items, 0)
+        self.assertEqual(report.errors, [
+            {'line': 1, 'message': 'Unreadable record'}])
+
+    def test_ndjson_fields_of_the_wrong_type(self):
+        records = [
+            {'title': ['Kite'], 'category_id': 'CATEGORY'},
+            {'title': {}, 'category_id': 'CATEGORY'},
+            {'title': 'Kite', 'description': [1], 'category_id': 'CATEGORY'},
+            {'title': 'Kite', 'price': {'eur': 1}, 'category_id': 'CATEGORY'},
+            {'title': 'Kite', 'category': ['Balls']},
+            {'title': 'Kite', 'category_id': 1e400},
+            {'title': 'Kite', 'category_id': 'CATEGORY', 'created': 1e400},
+            {'title': 'Kite', 'category_id': 'CATEGORY', 'created': 10 ** 30},
+            {'title': 'Ball', 'price': 5, 'category_id': 'CATEGORY'},
+        ]
+        data = ''.join(json.dumps(r) + '\n' for r in records)
+        report = self.upload(data, 'ndjson')
+        self.assertEqual(report.items, 1)
+        self.assertEqual([e['line'] for e in report.errors], range(1, 9))
+        self.assertEqual(session.query(Item).filter_by(
+            title='Ball', price='5').count(), 1)
+
+    def test_upload_of_the_wrong_type_is_rejected(self):
+        token = support.login(self.client, 'synthetic1@example.com')
+        response = self.client.post(
+            '/items/import', headers={'Authorization': token},
+            data={'file': (io.BytesIO('{"title": ["Kite"]}\n'),
+                           'items.ndjson')})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.data)['errors'], [
+            {'line': 1, 'message': 'title must be a string'}])
+
+    def test_dump_imported_again_is_skipped(self):
+        before = self.rows()
+        report = self.import_ndjson(self.dump())
+        self.assertEqual((report.categories, report.items), (0, 0))
+        self.assertEqual(report.skipped, 3 + 20)
+        self.assertEqual(self.rows(), before)
+
+    def test_dump_restored_into_an_empty_database(self):
+        before = self.rows()
+        dump = self.dump()
+        # The users stay, the dump does not have them.
+        session.query(Item).delete()
+        session.query(Category).delete()
+        session.commit()
+        report = self.import_ndjson(dump)
+        self.assertEqual((report.categories, report.items), (3, 20))
+        self.assertEqual(self.rows(), before)
+
+    def test_category_id_taken_by_another_name(self):
+        category = session.query(Category).first()
+        record = {'type': 'category', 'id': category.id, 'name': 'other'}
+        with self.assertRaises(BulkImportError) as raised:
+            self.import_ndjson(json.dumps(record) + '\n')
+        self.assertIn('exists as', raised.exception.report.errors[0][
+            'message'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+"""Queries of /catalog.json do not grow with the number of categories."""
+
+
+import json
+import unittest
+
+from tests import support
+from catalog_app import app
+
+
+class CatalogJsonTestCase(unittest.TestCase):
+
+    def _get_catalog(self, categories, items):
+        support.seed(users=2, categories=categories, items=items)
+        queries, response = support.count_queries(
+            app.test_client().get, '/catalog.json')
+        self.assertEqual(response.status_code, 200)
+        document = json.loads(response.data)
+        self.assertEqual(len(document['categories']), categories)
+        self.assertEqual(
+            sum(len(c['items']) for c in document['categories']), items)
+        return queries
+
+    def test_queries_do_not_depend_on_categories(self):
+        one = self._get_catalog(categories=1, items=5)
+        many = self._get_catalog(categories=40, items=200)
+        self.assertEqual(one, many)
+        # The validators, then the categories and their items.
+        self.assertEqual(one, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+"""The in-process category cache and its invalidation."""
+
+
+import time
+import unittest
+
+from tests import support
+from catalog_app import engine, session
+from catalog_app.api.models import Category, CategoryCache, category_cache
+
+
+class CategoryCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        support.seed(users=1, categories=3)
+
+    def tearDown(self):
+        session.remove()
+
+    def names(self):
+        return [c.name for c in Category.get_all_cached(session)]
+
+    def test_hit_sends_no_query(self):
+        self.names()
+        queries, names = support.count_queries(self.names)
+        self.assertEqual(queries, 0)
+        self.assertEqual(len(names), 3)
+
+    def test_committed_writes_invalidate(self):
+        self.names()
+        session.add(Category(name='added'))
+        session.commit()
+        self.assertIn('added', self.names())
+        category = session.query(Category).filter_by(name='added').one()
+        category.name = 'renamed'
+        session.commit()
+        self.assertIn('renamed', self.names())
+        session.delete(category)
+        session.commit()
+        self.assertEqual(len(self.names()), 3)
+
+    def test_rolled_back_write_keeps_the_snapshot(self):
+        self.names()
+        version = category_cache.version
+        session.add(Category(name='dropped'))
+        session.flush()
+        session.rollback()
+        self.assertEqual(category_cache.version, version)
+        queries, names = support.count_queries(self.names)
+        self.assertEqual(queries, 0)
+        self.assertNotIn('dropped', names)
+
+    def test_id_written_by_another_process(self):
+        self.names()
+        # Not through the session, so the cache is not told.
+        result = engine.execute(Category.__table__.insert().values(
+            name='elsewhere'))
+        id = result.inserted_primary_key[0]
+        self.assertEqual(Category.get_cached_by_id(session, id).name,
+                         'elsewhere')
+        self.assertIsNone(Category.get_cached_by_id(session, id + 1000))
+
+    def test_snapshot_expires(self):
+        cache = CategoryCache(ttl=0.05)
+        self.assertEqual(len(cache.get(session).by_id), 3)
+        engine.execute(Category.__table__.insert().values(name='late'))
+        self.assertEqual(len(cache.get(session).by_id), 3)
+        time.sleep(0.1)
+        self.assertEqual(len(cache.get(session).by_id), 4)
+        self.assertEqual(cache.stats()['misses'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
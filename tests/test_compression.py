@@ -0,0 +1,115 @@
+"""gzip of dynamic responses and precompressed static files."""
+
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import zlib
+
+from tests import support
+from catalog_app import app
+from catalog_app.compression import precompress
+
+GZIP = {'Accept-Encoding': 'gzip, deflate'}
+
+
+def gunzip(data):
+    return zlib.decompress(data, 16 + zlib.MAX_WBITS)
+
+
+class DynamicTestCase(unittest.TestCase):
+
+    def setUp(self):
+        support.seed(users=1, categories=2, items=30)
+        self.client = app.test_client()
+
+    def test_negotiation(self):
+        plain = self.client.get('/catalog.json')
+        self.assertNotIn('Content-Encoding', plain.headers)
+        self.assertIn('Accept-Encoding', plain.headers['Vary'])
+        response = self.client.get('/catalog.json', headers=GZIP)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertLess(len(response.data), len(plain.data))
+        self.assertEqual(gunzip(response.data), plain.data)
+        refused = self.client.get('/catalog.json', headers={
+            'Accept-Encoding': 'gzip;q=0, identity'})
+        self.assertNotIn('Content-Encoding', refused.headers)
+
+    def test_streamed_response(self):
+        plain = self.client.get('/catalog.ndjson')
+        response = self.client.get('/catalog.ndjson', headers=GZIP)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertNotIn('Content-Length', response.headers)
+        self.assertEqual(gunzip(response.data), plain.data)
+
+    def test_small_and_not_modified_responses(self):
+        support.seed(users=1, categories=0)
+        response = self.client.get('/catalog.json', headers=GZIP)
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        headers = dict(GZIP, **{'If-None-Match': response.headers['ETag']})
+        response = self.client.get('/catalog.json', headers=headers)
+        self.assertEqual(response.status_code, 304)
+        self.assertNotIn('Content-Encoding', response.headers)
+
+
+class StaticTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.static_folder = app.static_folder
+        self.folder = tempfile.mkdtemp()
+        app.static_folder = self.folder
+        self.css = 'body { color: red; }\n' * 100
+        self.write('site.css', self.css)
+        self.write('small.css', 'p { margin: 0; }\n')
+        self.client = app.test_client()
+
+    def tearDown(self):
+        app.static_folder = self.static_folder
+        shutil.rmtree(self.folder)
+
+    def write(self, name, data):
+        with open(os.path.join(self.folder, name), 'wb') as f:
+            f.write(data)
+
+    def get(self, name, headers=GZIP):
+        response = self.client.get('/static/' + name, headers=headers)
+        data = response.data
+        response.close()
+        return response, data
+
+    def test_precompressed_file(self):
+        self.assertEqual(precompress(self.folder), 1)
+        self.assertFalse(os.path.exists(
+            os.path.join(self.folder, 'small.css.gz')))
+        # Up to date files are not written again.
+        self.assertEqual(precompress(self.folder), 0)
+        response, data = self.get('site.css')
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(response.mimetype, 'text/css')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertEqual(gunzip(data), self.css)
+        response, data = self.get('site.css', headers={})
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertEqual(data, self.css)
+
+    def test_stale_precompressed_file(self):
+        precompress(self.folder)
+        path = os.path.join(self.folder, 'site.css')
+        later = time.time() + 10
+        os.utime(path, (later, later))
+        response, data = self.get('site.css')
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertEqual(data, self.css)
+
+    def test_missing_file(self):
+        self.assertEqual(self.get('missing.css')[0].status_code, 404)
+        self.assertEqual(self.get('../settings/config.py')[0].status_code,
+                         404)
+
+
+if __name__ == '__main__':
+    unittest.main()
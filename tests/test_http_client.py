@@ -0,0 +1,120 @@
+"""The pooled outbound client, against a stub server on localhost."""
+
+
+import json
+import threading
+import time
+import unittest
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+
+import requests
+
+from tests import support  # configures catalog_app, imported next
+from catalog_app.api import http_client
+from settings import config
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answers on a kept alive connection, and records its' client port."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.requests.append((self.path, self.client_address[1]))
+        if self.path.startswith('/slow'):
+            time.sleep(1)
+        if self.path.startswith('/error'):
+            self._send(500, 'text/plain', 'failed')
+        elif self.path.startswith('/text'):
+            self._send(200, 'text/plain', 'not json')
+        elif self.path.startswith('/oauth/access_token'):
+            self._send(200, 'text/plain', 'access_token=app-token')
+        else:
+            self._send(200, 'application/json', json.dumps({'ok': True}))
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # The client of a timed out request has closed the connection.
+        pass
+
+
+class HttpClientTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = StubServer(('127.0.0.1', 0), StubHandler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever)
+        cls.thread.daemon = True
+        cls.thread.start()
+        cls.url = 'http://127.0.0.1:{}'.format(cls.server.server_port)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.server.requests = []
+        self.read_timeout = config.HTTP_READ_TIMEOUT
+        self.graph_url = config.FACEBOOK_GRAPH_URL
+
+    def tearDown(self):
+        config.HTTP_READ_TIMEOUT = self.read_timeout
+        config.FACEBOOK_GRAPH_URL = self.graph_url
+        http_client._facebook_app_token.update(token=None, expires=0)
+
+    def test_connection_is_reused(self):
+        self.assertEqual(http_client.get_json(self.url + '/a'), {'ok': True})
+        self.assertEqual(http_client.get_json(self.url + '/b'), {'ok': True})
+        ports = [port for path, port in self.server.requests]
+        self.assertEqual(len(ports), 2)
+        self.assertEqual(ports[0], ports[1])
+
+    def test_read_timeout(self):
+        config.HTTP_READ_TIMEOUT = 0.2
+        started = time.time()
+        self.assertRaises(requests.Timeout, http_client.get,
+                          self.url + '/slow')
+        self.assertLess(time.time() - started, 0.9)
+
+    def test_connection_error(self):
+        server = StubServer(('127.0.0.1', 0), StubHandler)
+        url = 'http://127.0.0.1:{}/'.format(server.server_port)
+        server.server_close()
+        self.assertRaises(requests.ConnectionError, http_client.get, url)
+
+    def test_error_responses(self):
+        self.assertEqual(http_client.get(self.url + '/error').status_code,
+                         500)
+        self.assertRaises(ValueError, http_client.get_json,
+                          self.url + '/text')
+
+    def test_facebook_app_token_is_cached(self):
+        config.FACEBOOK_GRAPH_URL = self.url
+        self.assertEqual(http_client.get_facebook_app_token(), 'app-token')
+        self.assertEqual(http_client.get_facebook_app_token(), 'app-token')
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_facebook_app_token_error(self):
+        config.FACEBOOK_GRAPH_URL = self.url + '/error'
+        self.assertRaises(requests.HTTPError,
+                          http_client.get_facebook_app_token)
+        self.assertIsNone(http_client._facebook_app_token['token'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+"""ID tokens signed with a key pair generated by the test."""
+
+
+import base64
+import binascii
+import json
+import os
+import time
+import unittest
+
+import rsa
+
+from tests import support
+from catalog_app.api.id_token import verify_id_token, KeySet, \
+    InvalidIdToken, KeySetUnavailable
+
+
+AUDIENCE = 'test-client-id'
+ISSUER = 'https://accounts.google.com'
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip('=')
+
+
+def _b64int(number):
+    data = '{:x}'.format(number)
+    return _b64encode(binascii.unhexlify('0' * (len(data) % 2) + data))
+
+
+def sign(private_key, kid, claims, header=None):
+    """
+    :return: RS256 token of the claims
+    """
+    header = header if header is not None else {'alg': 'RS256', 'kid': kid}
+    signing_input = '.'.join([_b64encode(json.dumps(header)),
+                              _b64encode(json.dumps(claims))])
+    signature = rsa.sign(signing_input, private_key, 'SHA-256')
+    return signing_input + '.' + _b64encode(signature)
+
+
+class IdTokenTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # Small keys keep the test fast, the verification is the same.
+        cls.public, cls.private = rsa.newkeys(512)
+        cls.new_public, cls.new_private = rsa.newkeys(512)
+        cls.jwks = os.path.join(support.directory, 'jwks.json')
+
+    def setUp(self):
+        self.publish(('key-1', self.public))
+        self.key_set = KeySet('file://' + self.jwks, ttl=3600,
+                              min_refresh=0)
+
+    def publish(self, *keys):
+        with open(self.jwks, 'w') as f:
+            json.dump({'keys': [
+                {'kty': 'RSA', 'alg': 'RS256', 'use': 'sig', 'kid': kid,
+                 'n': _b64int(key.n), 'e': _b64int(key.e)}
+                for kid, key in keys]}, f)
+
+    def claims(self, **changes):
+        now = int(time.time())
+        claims = {'aud': AUDIENCE, 'iss': ISSUER, 'sub': '1234',
+                  'email': 'user@example.com', 'iat': now,
+                  'exp': now + 3600}
+        claims.update(changes)
+        return claims
+
+    def verify(self, token):
+        return verify_id_token(token, AUDIENCE, key_set=self.key_set)
+
+    def assertRejected(self, token):
+        self.assertRaises(InvalidIdToken, self.verify, token)
+
+    def test_valid_token(self):
+        claims = self.verify(sign(self.private, 'key-1', self.claims()))
+        self.assertEqual(claims['email'], 'user@example.com')
+
+    def test_expired_token(self):
+        past = int(time.time()) - 7200
+        self.assertRejected(sign(self.private, 'key-1', self.claims(
+            iat=past, exp=past + 3600)))
+
+    def test_wrong_audience(self):
+        self.assertRejected(sign(self.private, 'key-1', self.claims(
+            aud='another-client')))
+
+    def test_wrong_issuer(self):
+        self.assertRejected(sign(self.private, 'key-1', self.claims(
+            iss='https://accounts.example.com')))
+
+    def test_forged_signature(self):
+        self.assertRejected(sign(self.new_private, 'key-1', self.claims()))
+
+    def test_malformed_tokens(self):
+        self.assertRejected('not a token')
+        self.assertRejected(sign(self.private, 'key-1', self.claims(),
+                                 header=[]))
+        self.assertRejected(sign(self.private, 'key-1', ['claims']))
+        self.assertRejected(sign(self.private, 'key-1', self.claims(),
+                                 header={'alg': 'none', 'kid': 'key-1'}))
+
+    def test_unknown_key_refreshes_the_key_set(self):
+        token = sign(self.new_private, 'key-2', self.claims())
+        self.assertRejected(token)
+        # The provider rotates its' keys, the next unknown kid reloads them.
+        self.publish(('key-1', self.public), ('key-2', self.new_public))
+        self.assertEqual(self.verify(token)['sub'], '1234')
+
+    def test_unknown_key_refresh_is_limited(self):
+        self.key_set = KeySet('file://' + self.jwks, ttl=3600,
+                              min_refresh=60)
+        self.verify(sign(self.private, 'key-1', self.claims()))
+        self.publish(('key-1', self.public), ('key-2', self.new_public))
+        self.assertRejected(sign(self.new_private, 'key-2', self.claims()))
+
+    def test_key_set_unavailable(self):
+        self.key_set = KeySet('file://' + self.jwks + '.missing', ttl=3600,
+                              min_refresh=0)
+        self.assertRaises(KeySetUnavailable, self.verify,
+                          sign(self.private, 'key-1', self.claims()))
+
+
+if __name__ == '__main__':
+    unittest.main()
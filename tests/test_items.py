@@ -0,0 +1,100 @@
+"""Creating and editing items, and the validators of their JSON."""
+
+
+import json
+import unittest
+
+from tests import support
+from catalog_app import app, session
+from catalog_app.api.models import Category, Item
+
+
+class ItemsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        support.seed(users=1, categories=2)
+        self.first, self.second = [
+            c.id for c in Category.get_all(session, order_by='id')]
+        session.remove()
+        self.client = app.test_client()
+        self.token = support.login(self.client, 'synthetic1@example.com')
+
+    def post(self, url, **data):
+        response = self.client.post(url, data=data,
+                                    headers={'Authorization': self.token})
+        return response.status_code, json.loads(response.data)
+
+    def add_item(self, category):
+        status, body = self.post('/items/', title='Kite',
+                                 description='Red', category=category)
+        self.assertEqual(status, 200, body)
+        return session.query(Item).filter_by(title='Kite').one().id
+
+    def test_add_item_checks_the_category(self):
+        for category in ('abc', '', '-1', '99999'):
+            status, body = self.post('/items/', title='Kite',
+                                     category=category)
+            self.assertEqual(status, 400, category)
+            self.assertIn('redirect', body)
+        self.assertEqual(session.query(Item).count(), 0)
+
+    def test_edit_item_checks_the_category(self):
+        item_id = self.add_item(self.first)
+        status, body = self.post(
+            '/category/{}/item/{}/edit'.format(self.first, item_id),
+            title='Kite', category='abc')
+        self.assertEqual(status, 400)
+        session.remove()
+        self.assertEqual(Item.get_by_id(session, item_id).category_id,
+                         self.first)
+
+    def test_detail_validators_follow_the_category_of_the_item(self):
+        item_id = self.add_item(self.first)
+        # The URL names a category the item is not in.
+        url = '/category/{}/item/{}/detail.json'.format(self.second,
+                                                        item_id)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)['category']['id'],
+                         self.first)
+        etag = response.headers['ETag']
+        self.assertEqual(self.client.get(url, headers={
+            'If-None-Match': etag}).status_code, 304)
+
+        status, body = self.post(
+            '/category/{}/item/{}/edit'.format(self.first, item_id),
+            title='Edited kite', category=self.first)
+        self.assertEqual(status, 200, body)
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)['item']['title'],
+                         'Edited kite')
+
+    def test_detail_of_missing_item(self):
+        response = self.client.get(
+            '/category/{}/item/99999/detail.json'.format(self.first))
+        self.assertEqual(response.status_code, 404)
+
+    def test_detail_of_item_without_category(self):
+        item_id = self.add_item(self.first)
+        session.query(Item).filter_by(id=item_id).update(
+            {'category_id': None})
+        session.commit()
+        url = '/category/{}/item/{}/detail.json'.format(self.first,
+                                                        item_id)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(json.loads(response.data)['category'])
+        # Validated with the counter of the whole catalog.
+        etag = response.headers['ETag']
+        self.assertEqual(self.client.get(url, headers={
+            'If-None-Match': etag}).status_code, 304)
+        status, body = self.post('/items/', title='Ball',
+                                 category=self.second)
+        self.assertEqual(status, 200, body)
+        self.assertEqual(self.client.get(url, headers={
+            'If-None-Match': etag}).status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
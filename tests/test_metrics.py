@@ -0,0 +1,76 @@
+"""Request metrics and their thread sharded registry."""
+
+
+import re
+import threading
+import unittest
+
+from tests import support
+from catalog_app import app, metrics
+
+
+LOCAL = {'REMOTE_ADDR': '127.0.0.1'}
+
+
+class RegistryTestCase(unittest.TestCase):
+
+    def test_shards_of_finished_threads_are_folded(self):
+        registry = metrics.Registry()
+        registry.inc(metrics.REQUESTS, ('main',))
+
+        def record():
+            registry.inc(metrics.REQUESTS, ('main',))
+            registry.observe(metrics.LATENCY, ('main',), 0.003)
+
+        for i in range(3):
+            threads = [threading.Thread(target=record) for j in range(10)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        totals = registry.collect()
+        self.assertEqual(totals[('catalog_http_requests_total',
+                                 ('main',))], 31)
+        latency = totals[('catalog_http_request_duration_seconds',
+                          ('main',))]
+        self.assertEqual(latency[2], 30)
+        self.assertAlmostEqual(latency[-1], 0.09)
+        # Only the shard of this thread is left.
+        self.assertEqual(len(registry._shards), 1)
+        self.assertEqual(registry.collect(), totals)
+
+    def test_query_without_a_context(self):
+        metrics._before_cursor_execute(None, None, 'SELECT 1', (), None,
+                                       False)
+        metrics._after_cursor_execute(None, None, 'SELECT 1', (), None,
+                                      False)
+
+
+class MetricsEndpointTestCase(unittest.TestCase):
+
+    def setUp(self):
+        support.seed(users=1, categories=1)
+        self.client = app.test_client()
+
+    def requests(self):
+        response = self.client.get('/metrics', environ_base=LOCAL)
+        self.assertEqual(response.status_code, 200)
+        match = re.search(r'catalog_http_requests_total\{endpoint='
+                          r'"basic.getAllContent",method="GET",status="200",'
+                          r'worker="\d+"\} (\d+)', response.data)
+        return int(match.group(1)) if match else 0
+
+    def test_requests_are_counted(self):
+        before = self.requests()
+        self.client.get('/catalog.json')
+        self.client.get('/catalog.json')
+        self.assertEqual(self.requests(), before + 2)
+
+    def test_only_local_addresses(self):
+        response = self.client.get(
+            '/metrics', environ_base={'REMOTE_ADDR': '10.0.0.1'})
+        self.assertEqual(response.status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+"""The migration runner, on SQLite databases of their own."""
+
+
+import os
+import unittest
+
+from sqlalchemy import create_engine, inspect
+
+from tests import support
+from catalog_app.api import migrations
+from catalog_app.api.models import Base
+
+
+class MigrationsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.path = os.path.join(support.directory, 'migrations.db')
+        self.engine = create_engine('sqlite:///' + self.path)
+        self.latest = migrations.MIGRATIONS[-1][0]
+
+    def tearDown(self):
+        self.engine.dispose()
+        os.remove(self.path)
+
+    def version(self):
+        connection = self.engine.connect()
+        try:
+            return migrations.current_version(connection)
+        finally:
+            connection.close()
+
+    def tables(self):
+        return set(inspect(self.engine).get_table_names())
+
+    def test_upgrade_an_empty_database(self):
+        messages = []
+        self.assertEqual(migrations.upgrade(self.engine,
+                                            log=messages.append),
+                         self.latest)
+        self.assertEqual(len(messages), len(migrations.MIGRATIONS))
+        self.assertTrue(set(['user', 'category', 'item', 'catalog_version',
+                             'schema_version']) <= self.tables())
+        # Nothing is left to apply.
+        self.assertEqual(migrations.upgrade(self.engine,
+                                            log=messages.append),
+                         self.latest)
+        self.assertEqual(len(messages), len(migrations.MIGRATIONS))
+
+    def test_upgrade_to_a_target(self):
+        self.assertEqual(migrations.upgrade(self.engine, target=2), 2)
+        self.assertEqual(self.version(), 2)
+        self.assertNotIn('catalog_version', self.tables())
+        self.assertEqual(migrations.upgrade(self.engine), self.latest)
+
+    def test_database_made_by_create_all(self):
+        Base.metadata.create_all(self.engine, tables=[
+            Base.metadata.tables[name]
+            for name in ('user', 'category', 'item')])
+        self.assertEqual(migrations.upgrade(self.engine, target=1), 1)
+
+    def test_failed_migration_leaves_nothing_behind(self):
+        migrations.upgrade(self.engine)
+
+        def broken(connection):
+            connection.execute("CREATE TABLE half_done (id INTEGER)")
+            connection.execute("CREATE INDEX ix_half_done ON half_done (id)")
+            raise RuntimeError("failed halfway")
+
+        migrations.MIGRATIONS.append((self.latest + 1, "broken", broken))
+        try:
+            self.assertRaises(RuntimeError, migrations.upgrade, self.engine)
+            self.assertNotIn('half_done', self.tables())
+            self.assertEqual(self.version(), self.latest)
+            # Fixed, the migration runs again from the start.
+            migrations.MIGRATIONS[-1] = (
+                self.latest + 1, "fixed",
+                lambda connection: connection.execute(
+                    "CREATE TABLE half_done (id INTEGER)"))
+            self.assertEqual(migrations.upgrade(self.engine),
+                             self.latest + 1)
+            self.assertIn('half_done', self.tables())
+        finally:
+            migrations.MIGRATIONS.pop()
+
+
+if __name__ == '__main__':
+    unittest.main()
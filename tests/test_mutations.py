@@ -0,0 +1,135 @@
+"""POST /items/bulk.json, many item changes in one transaction."""
+
+
+import json
+import unittest
+
+from tests import support
+from catalog_app import app, session
+from catalog_app.api.models import Category, Item, User
+from catalog_app.api.mutations import apply_mutations
+from settings import config
+
+
+class MutationsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        support.seed(users=2, categories=2)
+        self.first, self.second = [
+            c.id for c in Category.get_all(session, order_by='id')]
+        self.user_id, self.other_id = [
+            u.id for u in session.query(User).order_by(User.id)]
+        session.remove()
+        self.client = app.test_client()
+        self.token = support.login(self.client, 'synthetic1@example.com')
+
+    def tearDown(self):
+        session.remove()
+
+    def post(self, operations, mode='atomic'):
+        response = self.client.post(
+            '/items/bulk.json', headers={'Authorization': self.token},
+            data=json.dumps({'mode': mode, 'operations': operations}))
+        return response.status_code, json.loads(response.data)
+
+    def create(self, title, category_id=None, user_id=None):
+        item = Item(title=title, category_id=category_id or self.first,
+                    user_id=user_id or self.user_id)
+        session.add(item)
+        session.commit()
+        id = item.id
+        session.remove()
+        return id
+
+    def titles(self):
+        session.remove()
+        return dict((i.id, (i.title, i.category_id, i.description))
+                    for i in session.query(Item))
+
+    def test_created_ids_are_the_new_rows(self):
+        # A gap left by a deleted item, and several statements per call.
+        self.create('Kept')
+        deleted = self.create('Deleted')
+        session.query(Item).filter_by(id=deleted).delete()
+        session.commit()
+        operations = [{'op': 'create', 'title': 'Item {}'.format(i),
+                       'category_id': self.first if i % 2 else self.second}
+                      for i in range(7)]
+        results, applied = apply_mutations(session, operations,
+                                           self.user_id, batch_size=3)
+        self.assertEqual(applied, 7)
+        rows = self.titles()
+        for i, result in enumerate(results):
+            self.assertEqual(result['status'], 'created')
+            self.assertEqual(rows[result['id']][:2],
+                             (operations[i]['title'],
+                              operations[i]['category_id']))
+        self.assertEqual(len(set(r['id'] for r in results)), 7)
+
+    def test_atomic_batch_with_an_invalid_operation(self):
+        kite = self.create('Kite')
+        ball = self.create('Ball')
+        before = self.titles()
+        status, body = self.post([
+            {'op': 'create', 'title': 'Bat', 'category_id': self.first},
+            {'op': 'update', 'id': kite, 'title': ''},
+            {'op': 'delete', 'id': ball}])
+        self.assertEqual(status, 400)
+        self.assertEqual(body['status'], 'fail')
+        self.assertEqual(body['applied'], 0)
+        self.assertEqual([r['status'] for r in body['results']],
+                         ['skipped', 'rejected', 'skipped'])
+        self.assertEqual(self.titles(), before)
+
+    def test_partial_batch(self):
+        kite = self.create('Kite')
+        ball = self.create('Ball')
+        others = self.create('Others', user_id=self.other_id)
+        status, body = self.post([
+            {'op': 'create', 'title': 'Bat', 'category_id': self.second},
+            {'op': 'update', 'id': kite, 'description': 'Red',
+             'category_id': self.second},
+            {'op': 'delete', 'id': ball},
+            {'op': 'delete', 'id': others},
+            {'op': 'update', 'id': 99999, 'title': 'Missing'},
+            {'op': 'create', 'title': 'Net', 'category_id': 99999},
+            {'op': 'create', 'title': ['Net'], 'category_id': self.first},
+            {'op': 'update', 'id': kite, 'title': 'Twice'},
+            {'op': 'rename', 'id': kite},
+            'not an object'], mode='partial')
+        self.assertEqual(status, 200)
+        self.assertEqual(body['status'], 'partial')
+        self.assertEqual(body['applied'], 3)
+        self.assertEqual([r['status'] for r in body['results']],
+                         ['created', 'updated', 'deleted'] +
+                         ['rejected'] * 7)
+        self.assertEqual([r.get('message') for r in body['results'][3:]], [
+            'You are not authorized', 'Item not found', 'Category not found',
+            'title must be a string',
+            'The item is changed by another operation of the batch',
+            'op must be one of create, update, delete',
+            'An operation must be an object'])
+        rows = self.titles()
+        self.assertEqual(rows[kite], ('Kite', self.second, 'Red'))
+        self.assertNotIn(ball, rows)
+        self.assertIn(others, rows)
+        self.assertEqual(rows[body['results'][0]['id']],
+                         ('Bat', self.second, None))
+
+    def test_body_is_checked(self):
+        for body in ('not json', '[]', '{"operations": {}}',
+                     '{"mode": "some", "operations": []}',
+                     json.dumps({'operations': [{'op': 'delete', 'id': 1}] *
+                                 (config.BULK_MUTATION_MAX_OPERATIONS + 1)})):
+            response = self.client.post(
+                '/items/bulk.json', headers={'Authorization': self.token},
+                data=body)
+            self.assertEqual(response.status_code, 400, body[:40])
+
+    def test_login_required(self):
+        response = self.client.post('/items/bulk.json', data='{}')
+        self.assertEqual(response.status_code, 401)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+"""The HTML pages: their queries and the cache of rendered pages."""
+
+
+import unittest
+
+from flask import g
+
+from tests import support
+from catalog_app import app, session
+from catalog_app.api.models import Category
+from catalog_app.api.page_cache import cached_page, invalidate_pages, \
+    page_cache
+from settings import config
+
+
+class PageQueriesTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.page_cache_enabled = config.PAGE_CACHE_ENABLED
+        config.PAGE_CACHE_ENABLED = False
+        self.client = app.test_client()
+
+    def tearDown(self):
+        config.PAGE_CACHE_ENABLED = self.page_cache_enabled
+
+    def queries(self, items):
+        support.seed(users=3, categories=5, items=items)
+        category_id = Category.get_all(session, order_by='id')[0].id
+        session.remove()
+        # Fill the category cache, it is shared by every page.
+        self.client.get('/')
+        counts = []
+        for url in ('/', '/category/{}/'.format(category_id)):
+            count, response = support.count_queries(self.client.get, url)
+            self.assertEqual(response.status_code, 200)
+            counts.append(count)
+        return counts
+
+    def test_queries_do_not_depend_on_items(self):
+        few = self.queries(items=5)
+        many = self.queries(items=200)
+        self.assertEqual(few, many)
+        # The latest items with their categories, and a page of items
+        #     with the count of the category.
+        self.assertEqual(few, [1, 1])
+
+
+class PageCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        support.seed(users=1, categories=1)
+        self.renders = []
+        self.write = False
+
+    def render(self):
+        self.renders.append(1)
+        if self.write:
+            # A write commits and invalidates while the page renders.
+            invalidate_pages('main')
+        return 'page {}'.format(len(self.renders))
+
+    def get(self, view):
+        with app.test_request_context('/'):
+            g.user_data = False
+            return cached_page('main')(view)()
+
+    def test_page_is_cached_until_invalidated(self):
+        self.assertEqual(self.get(self.render), 'page 1')
+        self.assertEqual(self.get(self.render), 'page 1')
+        invalidate_pages('main')
+        self.assertEqual(self.get(self.render), 'page 2')
+
+    def test_page_rendered_during_a_write_is_not_cached(self):
+        self.write = True
+        self.assertEqual(self.get(self.render), 'page 1')
+        self.write = False
+        self.assertEqual(self.get(self.render), 'page 2')
+        self.assertEqual(self.get(self.render), 'page 2')
+
+    def test_stale_generation_is_not_stored(self):
+        generation = page_cache.generation
+        page_cache.invalidate('main')
+        page_cache.set('key', 'old page', ['main'], generation)
+        self.assertIsNone(page_cache.get('key'))
+
+
+if __name__ == '__main__':
+    unittest.main()
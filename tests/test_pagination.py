@@ -0,0 +1,94 @@
+"""Keyset pagination of the items of a category."""
+
+
+import base64
+import datetime
+import json
+import unittest
+
+from tests import support
+from catalog_app import app, session
+from catalog_app.api.models import Category, Item
+from catalog_app.api.util import encode_cursor, utc
+
+
+class PaginationTestCase(unittest.TestCase):
+
+    def setUp(self):
+        support.seed(users=1, categories=1)
+        self.category_id = session.query(Category.id).scalar()
+        start = datetime.datetime(2026, 1, 1, tzinfo=utc)
+        # Pairs of items share their created time, the id breaks the tie.
+        for i in range(20):
+            session.add(Item(title='item{}'.format(i),
+                             category_id=self.category_id, user_id=None,
+                             created=start + datetime.timedelta(
+                                 seconds=i // 2)))
+        session.commit()
+        self.ordered = [id for (id,) in session.query(Item.id).order_by(
+            Item.created, Item.id)]
+        session.remove()
+        self.client = app.test_client()
+        self.url = '/category/{}/item.json'.format(self.category_id)
+
+    def get(self, **args):
+        response = self.client.get(self.url, query_string=args)
+        return response.status_code, json.loads(response.data)
+
+    def test_pages_cover_every_item_once(self):
+        ids = []
+        cursor = None
+        pages = 0
+        while True:
+            args = {'limit': 6}
+            if cursor:
+                args['cursor'] = cursor
+            status, page = self.get(**args)
+            self.assertEqual(status, 200)
+            self.assertEqual(page['total'], 20)
+            ids.extend(item['id'] for item in page['items'])
+            pages += 1
+            cursor = page['next']
+            if cursor is None:
+                break
+        self.assertEqual(ids, self.ordered)
+        self.assertEqual(pages, 4)
+
+    def test_last_page_ending_on_the_boundary(self):
+        status, first = self.get(limit=10)
+        self.assertIsNotNone(first['next'])
+        status, last = self.get(limit=10, cursor=first['next'])
+        self.assertEqual(len(last['items']), 10)
+        self.assertIsNone(last['next'])
+        self.assertIsNone(last['next_url'])
+
+    def test_cursor_past_the_last_page(self):
+        last = session.query(Item).get(self.ordered[-1])
+        cursor = encode_cursor(last.created, last.id)
+        session.remove()
+        status, page = self.get(cursor=cursor)
+        self.assertEqual(status, 200)
+        self.assertEqual(page['items'], [])
+        self.assertEqual(page['total'], 20)
+
+    def test_invalid_cursors(self):
+        for cursor in ('garbage', base64.urlsafe_b64encode('x|y'),
+                       base64.urlsafe_b64encode('2026-01-01'), u'\xe9'):
+            status, body = self.get(cursor=cursor)
+            self.assertEqual(status, 400, cursor)
+            self.assertEqual(body['message'], 'Invalid cursor')
+            # The HTML page shows the first page instead.
+            response = self.client.get(
+                '/category/{}/'.format(self.category_id),
+                query_string={'cursor': cursor})
+            self.assertEqual(response.status_code, 200)
+
+    def test_limit_is_clamped(self):
+        status, page = self.get(limit=0)
+        self.assertEqual(len(page['items']), 1)
+        status, page = self.get(limit=100000)
+        self.assertEqual(len(page['items']), 20)
+
+
+if __name__ == '__main__':
+    unittest.main()
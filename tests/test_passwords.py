@@ -0,0 +1,73 @@
+"""Password hashing and the bounded pool it runs on."""
+
+
+import threading
+import time
+import unittest
+
+from tests import support  # configures catalog_app, imported next
+from catalog_app.api import util
+
+
+class HashingPoolTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = util.HashingPool(1, 0, timeout=0.1)
+        self.started = threading.Event()
+        self.finish = threading.Event()
+
+    def tearDown(self):
+        self.finish.set()
+
+    def block(self, value):
+        self.started.set()
+        self.finish.wait(5)
+        return value
+
+    def fill(self):
+        thread = threading.Thread(target=self.pool.run,
+                                  args=(self.block, 'first'))
+        thread.start()
+        self.started.wait(5)
+        return thread
+
+    def test_full_pool_is_busy(self):
+        thread = self.fill()
+        self.assertRaises(util.HashingPoolBusy, self.pool.run, len, 'x')
+        self.finish.set()
+        thread.join(5)
+        self.assertEqual(self.pool.run(len, 'abc'), 3)
+
+    def test_timed_out_hash_keeps_its_slot(self):
+        self.assertRaises(util.HashingPoolBusy, self.pool.run,
+                          self.block, 'first')
+        # The hash is still running, so it still holds the slot.
+        self.assertFalse(self.pool._slots.acquire(False))
+        self.finish.set()
+        for i in range(50):
+            try:
+                self.assertEqual(self.pool.run(len, 'abc'), 3)
+                break
+            except util.HashingPoolBusy:
+                time.sleep(0.1)
+        else:
+            self.fail('the slot was not released')
+
+    def test_error_releases_the_slot(self):
+        self.assertRaises(ValueError, self.pool.run, int, 'abc')
+        self.assertEqual(self.pool.run(len, 'abc'), 3)
+
+
+class PasswordTestCase(unittest.TestCase):
+
+    def test_encrypt_and_check(self):
+        encrypted_password, salt = util.encrypt_password(u'secret')
+        self.assertTrue(util.check_password(u'secret', encrypted_password,
+                                            salt))
+        self.assertFalse(util.check_password(u'wrong', encrypted_password,
+                                             salt))
+        self.assertFalse(util.password_needs_rehash(encrypted_password))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+"""Query fingerprints, the slow query log and GET /admin/queries.json."""
+
+
+import json
+import time
+import unittest
+
+from tests import support
+from catalog_app import app, engine, query_log
+from catalog_app.query_log import fingerprint, redact, QueryStats
+from settings import config
+
+
+class FingerprintTestCase(unittest.TestCase):
+
+    def test_literals_and_parameters(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM item\n  WHERE id = 12 AND title = "
+                        "'it''s' AND price > -1.5e3"),
+            "SELECT * FROM item WHERE id = ? AND title = ? AND price > ?")
+        for statement in ("SELECT a FROM t WHERE b = %(b_1)s",
+                          "SELECT a FROM t WHERE b = %s",
+                          "SELECT a FROM t WHERE b = :b",
+                          "SELECT a FROM t WHERE b = ?"):
+            self.assertEqual(fingerprint(statement),
+                             "SELECT a FROM t WHERE b = ?")
+
+    def test_lists_of_any_length_are_one_fingerprint(self):
+        self.assertEqual(fingerprint("SELECT a FROM t WHERE id IN (?, ?)"),
+                         fingerprint("SELECT a FROM t WHERE id IN (1,2,3)"))
+        self.assertEqual(fingerprint("SELECT a FROM t WHERE id IN (?)"),
+                         "SELECT a FROM t WHERE id IN (...)")
+
+    def test_names_with_digits_are_kept(self):
+        self.assertEqual(fingerprint("SELECT t1.a FROM t1"),
+                         "SELECT t1.a FROM t1")
+
+    def test_redact(self):
+        self.assertEqual(redact({'email': u'a@example.com', 'id': 3,
+                                 'price': None}),
+                         {'email': '<13 chars>', 'id': 3, 'price': None})
+        self.assertEqual(redact(('secret', 1.5, object())),
+                         ['<6 chars>', 1.5, '<object>'])
+
+
+class QueryStatsTestCase(unittest.TestCase):
+
+    def test_report(self):
+        stats = QueryStats(max_fingerprints=2)
+        stats.record('a', 0.010)
+        stats.record('a', 0.030)
+        stats.record('b', 0.025, sample={'duration_ms': 25.0})
+        stats.record('c', 1.0)
+        stats.record('d', 1.0)
+        rows = dict((row['fingerprint'], row) for row in stats.report())
+        self.assertEqual(sorted(rows), ['<other>', 'a', 'b'])
+        self.assertEqual(rows['a']['count'], 2)
+        self.assertEqual(rows['a']['mean_ms'], 20.0)
+        self.assertEqual(rows['a']['max_ms'], 30.0)
+        self.assertEqual(rows['b']['slow'], 1)
+        self.assertEqual(rows['<other>']['count'], 2)
+        self.assertEqual([row['fingerprint'] for row in
+                          stats.report(order='count', limit=1)], ['a'])
+        self.assertEqual([row['fingerprint'] for row in
+                          stats.report(order='max')][0], '<other>')
+
+
+class SlowQueryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.threshold = config.SLOW_QUERY_THRESHOLD_MS
+        config.SLOW_QUERY_THRESHOLD_MS = 0
+        query_log.stats.reset()
+
+    def tearDown(self):
+        config.SLOW_QUERY_THRESHOLD_MS = self.threshold
+        query_log.stats.reset()
+
+    def test_slow_query_is_sampled_and_explained(self):
+        engine.execute("SELECT id FROM user WHERE email = ?",
+                       'someone@example.com').fetchall()
+        key = "SELECT id FROM user WHERE email = ?"
+        for i in range(50):
+            rows = dict((row['fingerprint'], row)
+                        for row in query_log.stats.report())
+            if rows[key]['plan'] is not None:
+                break
+            time.sleep(0.1)
+        self.assertEqual(rows[key]['sample']['parameters'], ['<19 chars>'])
+        self.assertTrue(rows[key]['plan']['lines'])
+
+
+class QueriesEndpointTestCase(unittest.TestCase):
+
+    def setUp(self):
+        support.seed(users=2, categories=1)
+        self.admin_emails = config.ADMIN_EMAILS
+        config.ADMIN_EMAILS = ['synthetic1@example.com']
+        self.client = app.test_client()
+
+    def tearDown(self):
+        config.ADMIN_EMAILS = self.admin_emails
+
+    def test_only_admins(self):
+        url = '/admin/queries.json?order=count&limit=3'
+        self.assertEqual(self.client.get(url).status_code, 401)
+        support.login(self.client, 'synthetic2@example.com')
+        self.assertEqual(self.client.get(url).status_code, 403)
+        support.login(self.client, 'synthetic1@example.com')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        result = json.loads(response.data)
+        self.assertEqual(result['order'], 'count')
+        self.assertLessEqual(len(result['queries']), 3)
+        counts = [row['count'] for row in result['queries']]
+        self.assertEqual(counts, sorted(counts, reverse=True))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+"""Routing between a primary and a replica, two SQLite files."""
+
+
+import json
+import os
+import shutil
+import unittest
+
+from sqlalchemy import create_engine
+
+from tests import support
+from catalog_app import DBSession, engine, session
+from catalog_app import app
+from catalog_app.api.models import Category, Item, CatalogVersion, \
+    category_cache
+from catalog_app.api.page_cache import page_cache
+from catalog_app.routing import ReplicaSet, STICKY_COOKIE
+
+
+class RoutingTestCase(unittest.TestCase):
+
+    def setUp(self):
+        support.seed(users=1, categories=2)
+        engine.dispose()
+        # The replica starts as a copy, then lags: it never gets a write.
+        self.replica_path = os.path.join(support.directory, 'replica.db')
+        shutil.copy(engine.url.database, self.replica_path)
+        self.replica = create_engine('sqlite:///' + self.replica_path)
+        self.replica.execute(Category.__table__.update().values(
+            name='replica'))
+        DBSession.configure(replicas=ReplicaSet([self.replica]))
+        self.category_id = session.query(Category.id).first()[0]
+        session.remove()
+        self.writer = app.test_client()
+        self.token = support.login(self.writer, 'synthetic1@example.com')
+        self.reader = app.test_client()
+
+    def tearDown(self):
+        session.remove()
+        DBSession.configure(replicas=ReplicaSet([]))
+        self.replica.dispose()
+        os.remove(self.replica_path)
+
+    def catalog(self, client):
+        document = json.loads(client.get('/catalog.json').data)
+        return (set(c['name'] for c in document['categories']),
+                [i['title'] for c in document['categories']
+                 for i in c['items']])
+
+    def add_item(self, title):
+        response = self.writer.post(
+            '/items/', headers={'Authorization': self.token},
+            data={'title': title, 'category': self.category_id})
+        self.assertEqual(response.status_code, 200, response.data)
+
+    def test_get_reads_from_the_replica(self):
+        self.assertEqual(self.catalog(self.reader)[0], set(['replica']))
+
+    def test_write_goes_to_the_primary(self):
+        self.add_item('Kite')
+        self.assertEqual(session.query(Item.title).all(), [('Kite',)])
+        self.assertEqual(self.replica.execute(
+            Item.__table__.count()).scalar(), 0)
+
+    def test_writer_is_pinned_to_the_primary(self):
+        self.add_item('Kite')
+        self.assertIn(STICKY_COOKIE, [c.name for c in
+                                      self.writer.cookie_jar])
+        names, titles = self.catalog(self.writer)
+        self.assertNotIn('replica', names)
+        self.assertEqual(titles, ['Kite'])
+        self.assertEqual(self.catalog(self.reader), (set(['replica']), []))
+
+    def test_connection_counts_as_a_write(self):
+        version = CatalogVersion.get(session, CatalogVersion.CATALOG)[0]
+        session.remove()
+        reading = session()
+        reading.use_replica()
+        self.assertEqual(reading.query(Category.name).first()[0], 'replica')
+        CatalogVersion.bump(reading)
+        self.assertTrue(reading.wrote)
+        reading.commit()
+        session.remove()
+        self.assertEqual(CatalogVersion.get(
+            session, CatalogVersion.CATALOG)[0], version + 1)
+        table = CatalogVersion.__table__
+        self.assertEqual(self.replica.execute(table.select().where(
+            table.c.scope == CatalogVersion.CATALOG)).first().version,
+            version)
+
+    def test_caches_are_not_filled_from_a_lagging_replica(self):
+        self.add_item('Kite')
+        page_cache.clear()
+        category_cache.invalidate()
+        stale = self.reader.get('/')
+        self.assertNotIn('Kite', stale.data)
+        self.assertIn('replica', stale.data)
+        self.assertEqual(page_cache.stats()['pages'], 0)
+        self.assertNotIn('replica', [
+            c.name for c in category_cache.get(session).by_name])
+        # The writer is not served a page cached by another client.
+        fresh = self.writer.get('/')
+        self.assertIn('Kite', fresh.data)
+        self.assertNotIn('replica', fresh.data)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+"""Full-text search of items, on the SQLite FTS5 index."""
+
+
+import json
+import unittest
+
+from tests import support
+from catalog_app import app, session
+from catalog_app.api.models import Category, Item
+from settings import config
+
+
+class SearchTestCase(unittest.TestCase):
+
+    def setUp(self):
+        support.seed(users=1, categories=1)
+        category_id = Category.get_all(session)[0].id
+        for title, description in [
+                ('Soccer ball', 'Round'),
+                ('Shin guards', 'Worn with a soccer ball'),
+                ('Kite', 'Red')]:
+            session.add(Item(title=title, description=description,
+                             category_id=category_id))
+        session.commit()
+        session.remove()
+        self.client = app.test_client()
+
+    def search(self, **args):
+        response = self.client.get('/search.json', query_string=args)
+        return response.status_code, json.loads(response.data)
+
+    def titles(self, q, **args):
+        status, body = self.search(q=q, **args)
+        self.assertEqual(status, 200, body)
+        return [item['title'] for item in body['items']]
+
+    def test_title_ranks_before_description(self):
+        self.assertEqual(self.titles('soccer'), ['Soccer ball', 'Shin guards'])
+        self.assertEqual(self.titles('kite'), ['Kite'])
+
+    def test_miss(self):
+        self.assertEqual(self.titles('tennis'), [])
+        self.assertEqual(self.titles(''), [])
+
+    def test_operators_are_plain_words(self):
+        for q in ('soccer OR kite', 'soccer -ball', '"soccer', 'NEAR(a b)',
+                  'title:kite', '*'):
+            self.titles(q)
+        self.assertEqual(self.titles('kite OR soccer'), [])
+
+    def test_pages(self):
+        status, body = self.search(q='soccer', limit=1)
+        self.assertEqual([i['title'] for i in body['items']], ['Soccer ball'])
+        self.assertEqual(self.client.get(body['next_url']).status_code, 200)
+        self.assertEqual(self.titles('soccer', limit=1, page=2),
+                         ['Shin guards'])
+        status, body = self.search(q='soccer', limit=1, page=2)
+        self.assertIsNone(body['next_url'])
+
+    def test_page_out_of_range(self):
+        status, body = self.search(q='soccer', limit=1,
+                                   page=config.SEARCH_MAX_RESULTS + 1)
+        self.assertEqual(status, 400)
+
+    def test_edit_and_delete_update_the_index(self):
+        item = session.query(Item).filter_by(title='Kite').one()
+        item.title = 'Frisbee'
+        session.commit()
+        self.assertEqual(self.titles('kite'), [])
+        self.assertEqual(self.titles('frisbee'), ['Frisbee'])
+        session.delete(item)
+        session.commit()
+        self.assertEqual(self.titles('frisbee'), [])
+
+    def test_html_page(self):
+        response = self.client.get('/search?q=soccer')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Shin guards', response.data)
+
+
+if __name__ == '__main__':
+    unittest.main()
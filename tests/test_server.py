@@ -0,0 +1,61 @@
+"""The WSGI container of the production server rejects overload."""
+
+
+import threading
+import unittest
+
+from concurrent.futures import ThreadPoolExecutor
+from tornado.httpserver import HTTPServer
+from tornado.testing import AsyncHTTPTestCase
+
+from tests import support  # configures catalog_app, imported next
+from catalog_app.server import ThreadedWSGIContainer
+
+
+class ThreadedWSGIContainerTestCase(AsyncHTTPTestCase):
+
+    def setUp(self):
+        self.release = threading.Event()
+        self.executor = ThreadPoolExecutor(1)
+        AsyncHTTPTestCase.setUp(self)
+
+    def tearDown(self):
+        self.release.set()
+        AsyncHTTPTestCase.tearDown(self)
+        self.executor.shutdown()
+
+    def _application(self, environ, start_response):
+        self.release.wait(5)
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return ['done']
+
+    def get_app(self):
+        self.container = ThreadedWSGIContainer(
+            self._application, self.executor, io_loop=self.io_loop,
+            max_active=2)
+        return self.container
+
+    def get_http_server(self):
+        return HTTPServer(self.container, io_loop=self.io_loop)
+
+    def test_rejects_requests_over_max_active(self):
+        responses = []
+
+        def fetched(response):
+            responses.append(response)
+            if len(responses) == 3:
+                self.stop()
+            elif len(responses) == 1:
+                # The rejected request is answered while the others wait.
+                self.release.set()
+
+        for i in range(3):
+            self.http_client.fetch(self.get_url('/'), fetched)
+        self.wait()
+        self.assertEqual([r.code for r in responses], [503, 200, 200])
+        self.assertEqual(responses[0].headers['Retry-After'], '1')
+        self.assertEqual(self.container.rejected, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
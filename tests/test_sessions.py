@@ -0,0 +1,58 @@
+"""Request scoped sessions, and the pool of the engine."""
+
+
+import os
+import unittest
+
+from sqlalchemy import exc
+
+from tests import support
+from catalog_app import app, session, create_db_engine
+from catalog_app.api.models import Category
+from settings import config
+
+
+class SessionTestCase(unittest.TestCase):
+
+    def setUp(self):
+        support.seed(users=1, categories=2)
+
+    def test_session_is_removed_after_a_request(self):
+        client = app.test_client()
+        self.assertEqual(client.get('/catalog.json').status_code, 200)
+        self.assertFalse(session.registry.has())
+
+    def test_failed_request_does_not_break_the_next_one(self):
+        with app.test_request_context('/'):
+            session.add(Category(name=None))
+            self.assertRaises(exc.IntegrityError, session.flush)
+            app.do_teardown_request(exc.IntegrityError(None, None, None))
+        self.assertFalse(session.registry.has())
+        # A shared session would still be in the failed transaction.
+        self.assertEqual(session.query(Category).count(), 2)
+        session.remove()
+
+    def test_pool_settings(self):
+        engine = create_db_engine('postgresql://localhost/catalog')
+        self.assertEqual(engine.pool.size(), config.DB_POOL_SIZE)
+        self.assertEqual(engine.pool._max_overflow, config.DB_MAX_OVERFLOW)
+        self.assertEqual(engine.pool._timeout, config.DB_POOL_TIMEOUT)
+        self.assertEqual(engine.pool._recycle, config.DB_POOL_RECYCLE)
+
+    def test_dead_connection_is_replaced_on_checkout(self):
+        path = os.path.join(support.directory, 'ping.db')
+        engine = create_db_engine('sqlite:///' + path)
+        connection = engine.connect()
+        dbapi_connection = connection.connection.connection
+        connection.close()
+        # The database closed the connection while it was in the pool.
+        dbapi_connection.close()
+        connection = engine.connect()
+        self.assertEqual(connection.execute('SELECT 1').scalar(), 1)
+        self.assertIsNot(connection.connection.connection, dbapi_connection)
+        connection.close()
+        engine.dispose()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+"""The streaming variants of /catalog.json."""
+
+
+import json
+import unittest
+
+from tests import support
+from catalog_app import app, session
+from catalog_app.api.models import Category
+from settings import config
+
+
+class StreamingTestCase(unittest.TestCase):
+
+    def setUp(self):
+        support.seed(users=2, categories=5, items=300)
+        # A category without items is written too.
+        session.add(Category(name='empty'))
+        session.commit()
+        session.remove()
+        self.batch_size = config.STREAM_BATCH_SIZE
+        # Batches end in the middle of categories.
+        config.STREAM_BATCH_SIZE = 7
+        self.client = app.test_client()
+
+    def tearDown(self):
+        config.STREAM_BATCH_SIZE = self.batch_size
+
+    def test_stream_is_the_same_document(self):
+        response = self.client.get('/catalog.stream.json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.headers.get('Content-Length'))
+        streamed = json.loads(response.data)
+        document = json.loads(self.client.get('/catalog.json').data)
+        by_id = lambda c: c['id']
+        self.assertEqual(sorted(streamed['categories'], key=by_id),
+                         sorted(document['categories'], key=by_id))
+        self.assertEqual(len(streamed['categories']), 6)
+
+    def test_ndjson_lines(self):
+        response = self.client.get('/catalog.ndjson')
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        lines = [json.loads(line) for line in response.data.splitlines()]
+        categories = [l for l in lines if l['type'] == 'category']
+        items = [l for l in lines if l['type'] == 'item']
+        self.assertEqual(len(categories), 6)
+        self.assertEqual(len(items), 300)
+        # Every item follows the line of its' category.
+        current = None
+        for line in lines:
+            if line['type'] == 'category':
+                current = line['id']
+            else:
+                self.assertEqual(line['category_id'], current)
+
+    def test_not_modified(self):
+        for url in ('/catalog.stream.json', '/catalog.ndjson'):
+            etag = self.client.get(url).headers['ETag']
+            response = self.client.get(url, headers={'If-None-Match': etag})
+            self.assertEqual(response.status_code, 304)
+
+
+if __name__ == '__main__':
+    unittest.main()
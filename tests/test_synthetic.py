@@ -0,0 +1,72 @@
+"""Synthetic catalogs for load testing."""
+
+
+import collections
+import datetime
+import random
+import unittest
+
+from tests import support
+from catalog_app import session
+from catalog_app.api.models import User, Category, Item
+from catalog_app.api.synthetic import category_sampler, \
+    description_lengths, generate_catalog
+from catalog_app.api.util import utc
+
+
+class SyntheticTestCase(unittest.TestCase):
+
+    def tearDown(self):
+        session.remove()
+
+    def generate(self, **options):
+        support.clear_database()
+        session.query(User).delete()
+        session.commit()
+        end = datetime.datetime(2026, 1, 1, tzinfo=utc)
+        rows, seconds = generate_catalog(session, 2, 4, 50, end=end,
+                                         days=10, **options)
+        session.remove()
+        return rows, sorted(
+            (i.title, i.description, i.price, i.category_id, i.user_id,
+             i.created.replace(tzinfo=None))
+            for i in session.query(Item))
+
+    def test_counts(self):
+        rows, items = self.generate(seed=1)
+        self.assertEqual(rows, 2 + 4 + 50)
+        self.assertEqual(session.query(User).count(), 2)
+        self.assertEqual(session.query(Category).count(), 4)
+        self.assertEqual(len(items), 50)
+        start = datetime.datetime(2025, 12, 22)
+        for item in items:
+            self.assertTrue(start <= item[5] <= datetime.datetime(2026, 1, 1))
+
+    def test_same_seed_same_catalog(self):
+        self.assertEqual(self.generate(seed=1)[1], self.generate(seed=1)[1])
+        self.assertNotEqual(self.generate(seed=1)[1],
+                            self.generate(seed=2)[1])
+
+    def test_zipf_categories(self):
+        rng = random.Random(1)
+        sample = category_sampler(range(1, 11), 'zipf', 1.1, rng)
+        counts = sorted(collections.Counter(
+            sample() for i in range(10000)).values(), reverse=True)
+        # The largest category has about three times the third.
+        self.assertGreater(counts[0], 2.5 * counts[2])
+        self.assertEqual(len(counts), 10)
+        sample = category_sampler(range(1, 11), 'uniform', 1.1, rng)
+        counts = collections.Counter(sample() for i in range(10000))
+        self.assertLess(max(counts.values()), 1.3 * min(counts.values()))
+
+    def test_description_lengths(self):
+        rng = random.Random(1)
+        self.assertEqual(description_lengths('fixed', 200, 100, rng)(), 100)
+        lengths = description_lengths('lognormal', 200, 5000, rng)
+        lengths = [lengths() for i in range(10000)]
+        self.assertLessEqual(max(lengths), 5000)
+        self.assertAlmostEqual(sum(lengths) / len(lengths), 200, delta=20)
+
+
+if __name__ == '__main__':
+    unittest.main()
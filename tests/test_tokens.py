@@ -0,0 +1,117 @@
+"""The verified-token cache and the authentication of each request."""
+
+
+import time
+import unittest
+
+from tests import support
+from catalog_app import app, session
+from catalog_app.api import util
+from catalog_app.api.models import User
+
+
+class VerifiedTokensTestCase(unittest.TestCase):
+
+    def setUp(self):
+        support.seed(users=1, categories=1)
+        self.user = session.query(User).one()
+        self.expire_time, self.token = util.generate_token(self.user)
+        util.verified_tokens.clear()
+        self.decoded = []
+        self.loaded = []
+        self.decode = util.jwt.decode
+
+        def decode(*args, **kwargs):
+            self.decoded.append(1)
+            return self.decode(*args, **kwargs)
+        util.jwt.decode = decode
+
+    def tearDown(self):
+        util.jwt.decode = self.decode
+        util.verified_tokens.clear()
+        session.remove()
+
+    def load_user(self, user_id):
+        self.loaded.append(user_id)
+        return User.get_row_by_id(session, user_id)
+
+    def authenticate(self, token=None, expire_time=None):
+        return util.authenticate_token(token or self.token,
+                                       expire_time or self.expire_time,
+                                       self.load_user)
+
+    def test_repeat_token_is_not_decoded_again(self):
+        user_data, user = self.authenticate()
+        self.assertEqual(user_data['id'], self.user.id)
+        self.assertEqual(user.id, self.user.id)
+        self.assertEqual(self.authenticate(), (user_data, user))
+        self.assertEqual(len(self.decoded), 1)
+        self.assertEqual(self.loaded, [self.user.id])
+
+    def test_expired_token(self):
+        self.authenticate()
+        past = int(time.time()) - 1
+        self.assertEqual(self.authenticate(expire_time=past), (False, None))
+        self.assertEqual(self.authenticate(expire_time='abc'), (False, None))
+
+    def test_invalid_token_is_not_cached(self):
+        for i in range(2):
+            self.assertEqual(self.authenticate(token=self.token + 'x'),
+                             (False, None))
+        self.assertEqual(len(self.decoded), 2)
+        self.assertEqual(len(util.verified_tokens), 0)
+
+    def test_token_of_a_deleted_user_is_not_cached(self):
+        session.query(User).delete()
+        session.commit()
+        self.assertEqual(self.authenticate(), (False, None))
+        self.assertEqual(len(util.verified_tokens), 0)
+
+
+class LRUCacheTestCase(unittest.TestCase):
+
+    def test_least_recently_used_is_evicted(self):
+        cache = util.LRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(len(cache), 2)
+
+    def test_expired_entry(self):
+        cache = util.LRUCache(2)
+        cache.set('a', 1, expires=time.time() - 1)
+        self.assertEqual(cache.get('a', 'missing'), 'missing')
+
+
+class AuthenticateRequestTestCase(unittest.TestCase):
+
+    def setUp(self):
+        support.seed(users=1, categories=1)
+        util.verified_tokens.clear()
+        self.client = app.test_client()
+        self.token = support.login(self.client, 'synthetic1@example.com')
+
+    def tearDown(self):
+        util.verified_tokens.clear()
+        session.remove()
+
+    def test_repeat_request_does_not_query_the_user(self):
+        self.client.get('/items/')
+        queries, response = support.count_queries(self.client.get, '/items/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(queries, 0)
+
+    def test_post_reads_the_authorization_header(self):
+        # The cookie alone does not authenticate a POST.
+        response = self.client.post('/items/', data={'title': 'Kite'})
+        self.assertEqual(response.status_code, 401)
+        response = self.client.post('/items/', data={'title': 'Kite'},
+                                    headers={'Authorization': self.token})
+        self.assertEqual(response.status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
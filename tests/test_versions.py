@@ -0,0 +1,49 @@
+"""Write counters of the catalog and its categories."""
+
+
+import datetime
+import unittest
+
+from sqlalchemy.orm import sessionmaker
+
+from tests import support
+from catalog_app import engine, session
+from catalog_app.api import models
+from catalog_app.api.models import Category, CatalogVersion
+from catalog_app.api.util import utc
+
+
+class CatalogVersionTestCase(unittest.TestCase):
+
+    def setUp(self):
+        support.seed(users=1, categories=1)
+        self.other = sessionmaker(bind=engine)()
+
+    def tearDown(self):
+        self.other.close()
+        session.remove()
+
+    def test_new_category_gets_its_counter(self):
+        category = Category(name='new')
+        session.add(category)
+        session.commit()
+        scope = CatalogVersion.category_scope(category.id)
+        self.assertEqual(CatalogVersion.get(session, scope)[0], 1)
+        CatalogVersion.bump(session, [category.id])
+        session.commit()
+        self.assertEqual(CatalogVersion.get(session, scope)[0], 2)
+
+    def test_concurrent_first_writes_of_a_scope(self):
+        scope = CatalogVersion.category_scope(999)
+        self.assertEqual(CatalogVersion.get(session, scope), (0, None))
+        # Both sessions found no row, the other one inserted it first.
+        CatalogVersion.bump(self.other, [999])
+        self.other.commit()
+        models._insert_scope(session.connection(), scope,
+                             datetime.datetime.now(utc))
+        session.commit()
+        self.assertEqual(CatalogVersion.get(session, scope)[0], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()